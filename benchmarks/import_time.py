@@ -0,0 +1,75 @@
+# file: import_time.py
+#
+'''
+This benchmark measures what importing the tgdhstruct entry points costs a fresh interpreter.
+Every module is imported in a new process a number of times; the median import time, the peak resident
+memory and the optional stacks that were pulled in (osbrain, the anytree exporter) are reported.
+
+    python3 import_time.py [--runs 10] [module ...]
+'''
+
+# import modules
+#
+import sys
+import json
+import argparse
+import statistics
+import subprocess
+
+# the probe runs in the fresh interpreter and reports on its own import
+#
+PROBE = '''
+import sys, time, json, resource
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter()-start
+peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print(json.dumps({{
+    'ms': elapsed*1000,
+    'rss_mb': peak/(1024*1024 if sys.platform == 'darwin' else 1024),
+    'osbrain': 'osbrain' in sys.modules,
+    'exporter': 'anytree.exporter' in sys.modules,
+}}))
+'''
+
+# function: measure
+#
+def measure(module: str, runs: int) -> dict:
+    '''This function imports a module in <runs> fresh interpreters and summarizes the measurements.'''
+
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run([sys.executable, '-c', PROBE.format(module=module)], capture_output=True, text=True, check=True)
+        samples.append(json.loads(out.stdout))
+    return {
+        'module': module,
+        'median_ms': round(statistics.median(sample['ms'] for sample in samples), 1),
+        'min_ms': round(min(sample['ms'] for sample in samples), 1),
+        'peak_rss_mb': round(max(sample['rss_mb'] for sample in samples), 1),
+        'loads_osbrain': samples[0]['osbrain'],
+        'loads_exporter': samples[0]['exporter'],
+    }
+#
+# end function: measure
+
+# function: main
+#
+def main(argv: list[str]) -> None:
+    '''This is the main function.'''
+
+    parser = argparse.ArgumentParser(description='Measure the import cost of tgdhstruct entry points.')
+    parser.add_argument('modules', nargs='*', default=['tgdhstruct', 'tgdhstruct.binary_tree', 'tgdhstruct.member_agent'],
+        help='modules to import')
+    parser.add_argument('--runs', type=int, default=10, help='fresh interpreters per module')
+    args = parser.parse_args(argv)
+
+    for module in args.modules:
+        print(json.dumps(measure(module, args.runs)))
+
+# begin gracefully
+#
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+#
+# end file: import_time.py
@@ -0,0 +1,124 @@
+# file: tree_arity.py
+#
+'''
+This benchmark compares the binary tree with 3-ary and 4-ary trees (Burmester-Desmedt at nodes with more than
+two children). For every group size and arity the initial group key is seeded and random joins and leaves are
+applied; the tree height, the public values a member stores for its co-path, the broadcast rounds of the initial
+exchange and of a rekey, and the exponentiations and time per event are reported.
+
+    python3 tree_arity.py [--sizes 64 256 1024] [--arities 2 3 4] [--events 200] [--bits 127] [--seed 1]
+'''
+
+# import modules
+#
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.nary_tree import NaryTree
+from tgdhstruct.random_pool import seed_pool
+
+# the 2048-bit MODP group (RFC 3526, group 14) and a small prime for quick runs
+#
+MODP_2048 = int(
+    'FFFFFFFFFFFFFFFFC90FDAA22168C234C4C6628B80DC1CD129024E088A67CC74020BBEA63B139B22514A08798E3404DD'
+    'EF9519B3CD3A431B302B0A6DF25F14374FE1356D6D51C245E485B576625E7EC6F44C42E9A637ED6B0BFF5CB6F406B7ED'
+    'EE386BFB5A899FA5AE9F24117C4B1FE649286651ECE45B3DC2007CB8A163BF0598DA48361C55D39A69163FA8FD24CF5F'
+    '83655D23DCA3AD961C62F356208552BB9ED529077096966D670C354E4ABC9804F1746C08CA18217C32905E462E36CE3B'
+    'E39E772C180E86039B2783A2EC07A28FB5C55DF06F4C52C9DE2BCBF6955817183995497CEA956AE515D2261898FA0510'
+    '15728E5A8AACAA68FFFFFFFFFFFFFFFF', 16)
+PRIMES = {2048: (MODP_2048, 2), 127: (2**127-1, 3)}
+
+# function: rounds
+#
+def rounds(node: DataNode) -> int:
+    '''This function returns the broadcast rounds needed to calculate the key path of a node.'''
+
+    return sum(1 if len(parent.children) == 2 else 2 for parent in node.get_key_path()[1:])
+#
+# end function: rounds
+
+# function: stored_values
+#
+def stored_values(node: DataNode) -> int:
+    '''This function returns the number of public values (blind keys and X values) a member keeps for its co-path.'''
+
+    return sum(len(parent.children)-1 if len(parent.children) == 2 else 2*(len(parent.children)-1)
+        for parent in node.get_key_path()[1:])
+#
+# end function: stored_values
+
+# function: measure
+#
+def measure(size: int, arity: int, events: int, seed: int) -> dict:
+    '''This function seeds a group of <size> members and applies random churn to it.'''
+
+    seed_pool(f'{seed}'.encode())
+    rng = random.Random(seed)
+    tree = BinaryTree(size, 1, verbose=False) if arity == 2 else NaryTree(size, 1, arity=arity, verbose=False)
+    exps = DataNode.exps
+    start = time.perf_counter()
+    tree.seed_group_key()
+    seed_ms = (time.perf_counter()-start)*1000
+    seed_exps = DataNode.exps-exps
+    leaves = tree.get_leaves()
+    result = {
+        'size': size,
+        'arity': arity,
+        'height': tree.root.height,
+        'mean_stored': round(statistics.mean(stored_values(node) for node in leaves), 2),
+        'initial_rounds': max(rounds(node) for node in leaves),
+        'seed_exps': seed_exps,
+        'seed_ms': round(seed_ms, 1),
+    }
+
+    # the same random churn for every arity: joins and leaves with equal probability
+    #
+    samples = []
+    for _ in range(events):
+        members = [node.mid for node in tree.get_leaves()]
+        exps = DataNode.exps
+        start = time.perf_counter()
+        if len(members) <= 2 or rng.random() < 0.5:
+            tree.simulate_join()
+        else:
+            tree.simulate_leave(rng.choice(members))
+        samples.append(((time.perf_counter()-start)*1000, DataNode.exps-exps, rounds(tree.my_node)))
+    if samples:
+        result['mean_event_ms'] = round(statistics.mean(sample[0] for sample in samples), 3)
+        result['mean_event_exps'] = round(statistics.mean(sample[1] for sample in samples), 2)
+        result['mean_rekey_rounds'] = round(statistics.mean(sample[2] for sample in samples), 2)
+        result['final_height'] = tree.root.height
+    return result
+#
+# end function: measure
+
+# function: main
+#
+def main(argv: list[str]) -> None:
+    '''This is the main function.'''
+
+    parser = argparse.ArgumentParser(description='Compare binary and n-ary TGDH trees.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[64, 256, 1024], help='initial group sizes')
+    parser.add_argument('--arities', type=int, nargs='+', default=[2, 3, 4], help='branching factors (2 is the binary tree)')
+    parser.add_argument('--events', type=int, default=200, help='random joins and leaves per group')
+    parser.add_argument('--bits', type=int, choices=sorted(PRIMES), default=127, help='size of the Diffie-Hellman modulus (2048 for realistic timings)')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the churn and of the keys')
+    args = parser.parse_args(argv)
+
+    DataNode.p, DataNode.g = PRIMES[args.bits]
+    for size in args.sizes:
+        for arity in args.arities:
+            print(json.dumps(measure(size, arity, args.events, args.seed)))
+
+# begin gracefully
+#
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+#
+# end file: tree_arity.py
@@ -0,0 +1,100 @@
+# file: tree_layout.py
+#
+'''
+This benchmark compares the balanced and the skinny (STR) tree layouts under churn with a varying share of joins.
+For every group size and join share, the same random joins and leaves are applied to a group in either layout;
+the rounds (levels the sponsor sends), exponentiations, time and planning time per join and per leave are
+reported, with the mean over all events, so the join share at which the skinny layout starts to pay off can be read off.
+
+    python3 tree_layout.py [--sizes 32 128 512] [--join-shares 0.5 0.8 0.95 1.0] [--events 200] [--seed 1]
+'''
+
+# import modules
+#
+import sys
+import json
+import time
+import random
+import argparse
+import statistics
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.schedule_planner import SchedulePlanner
+from tgdhstruct.random_pool import seed_pool
+
+# function: measure
+#
+def measure(size: int, layout: str, join_share: float, events: int, seed: int) -> dict:
+    '''This function applies random churn with the given share of joins to a group in one layout.'''
+
+    seed_pool(f'{seed}'.encode())
+    rng = random.Random(seed)
+    tree = BinaryTree(size, 1, verbose=False, layout=layout)
+    tree.seed_group_key()
+    samples = {'join': [], 'leave': []}
+    for _ in range(events):
+        members = [node.mid for node in tree.get_leaves()]
+        kind = 'join' if len(members) <= 2 or rng.random() < join_share else 'leave'
+        exps = DataNode.exps
+        start = time.perf_counter()
+        if kind == 'join':
+            mid = tree.simulate_join()
+        else:
+            mid = tree.simulate_leave(rng.choice(members))
+        elapsed = (time.perf_counter()-start)*1000
+
+        # the messages the sponsor would send, planned (and timed) apart from the tree update
+        #
+        if kind == 'join':
+            sponsor = next(node.mid for node in tree.get_leaves() if node.ntype == 'spon')
+            start = time.perf_counter()
+            schedule = SchedulePlanner.plan(tree, 'join', sponsor, mid)
+        else:
+            start = time.perf_counter()
+            schedule = SchedulePlanner.plan(tree, 'leave', mid)
+        planning = (time.perf_counter()-start)*1000
+
+        # the new member's blind key is one more round in both layouts
+        #
+        rounds = len(schedule)+(1 if kind == 'join' else 0)
+        samples[kind].append((elapsed, DataNode.exps-exps, rounds, planning))
+
+    result = {'size': size, 'layout': layout, 'join_share': join_share, 'final_height': tree.root.height}
+    for kind, values in samples.items():
+        if values:
+            result[f'{kind}_ms'] = round(statistics.mean(value[0] for value in values), 3)
+            result[f'{kind}_exps'] = round(statistics.mean(value[1] for value in values), 2)
+            result[f'{kind}_rounds'] = round(statistics.mean(value[2] for value in values), 2)
+            result[f'{kind}_plan_ms'] = round(statistics.mean(value[3] for value in values), 3)
+    every = samples['join']+samples['leave']
+    result['mean_exps'] = round(statistics.mean(value[1] for value in every), 2)
+    result['mean_rounds'] = round(statistics.mean(value[2] for value in every), 2)
+    return result
+#
+# end function: measure
+
+# function: main
+#
+def main(argv: list[str]) -> None:
+    '''This is the main function.'''
+
+    parser = argparse.ArgumentParser(description='Compare the balanced and skinny (STR) TGDH tree layouts.')
+    parser.add_argument('--sizes', type=int, nargs='+', default=[32, 128, 512], help='initial group sizes')
+    parser.add_argument('--join-shares', type=float, nargs='+', default=[0.5, 0.8, 0.95, 1.0], help='fractions of events that are joins')
+    parser.add_argument('--events', type=int, default=200, help='random joins and leaves per group')
+    parser.add_argument('--seed', type=int, default=1, help='seed of the churn and of the keys')
+    args = parser.parse_args(argv)
+
+    DataNode.p, DataNode.g = 2**127-1, 3
+    for size in args.sizes:
+        for join_share in args.join_shares:
+            for layout in ('balanced', 'str'):
+                print(json.dumps(measure(size, layout, join_share, args.events, args.seed)))
+
+# begin gracefully
+#
+if __name__ == '__main__':
+    main(sys.argv[1:])
+
+#
+# end file: tree_layout.py
@@ -12,6 +12,14 @@ setup(
     install_requires=[
         'anytree',
         'pycryptodome',
-        'osbrain',
-    ]
+    ],
+    extras_require={
+        'agents': ['osbrain'],
+    },
+    entry_points={
+        'console_scripts': [
+            'tgdh-replay=tgdhstruct.trace_replay:main',
+            'tgdh-load=tgdhstruct.load_harness:main',
+        ],
+    }
 )
@@ -0,0 +1,26 @@
+# file: conftest.py
+#
+'''This file contains the fixtures shared by the tests.'''
+
+# import modules
+#
+import pytest
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.random_pool import seed_pool
+
+# fixture: modulus
+#
+@pytest.fixture(autouse=True)
+def modulus():
+    '''This fixture runs every test with a 127-bit modulus (the default p=23 makes keys collide) and seeded keys.'''
+
+    p, g = DataNode.p, DataNode.g
+    DataNode.p, DataNode.g = 2**127-1, 3
+    seed_pool(b'tests')
+    yield
+    DataNode.p, DataNode.g = p, g
+    seed_pool(None)
+#
+# end fixture: modulus
+#
+# end file: conftest.py
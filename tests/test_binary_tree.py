@@ -0,0 +1,138 @@
+# file: test_binary_tree.py
+#
+'''This file contains the tests of the BinaryTree class.'''
+
+# import modules
+#
+import pickle
+import random
+import pytest
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.epoch_stream import get_stream
+
+# function: member_trees
+#
+def member_trees(size: int, layout: str) -> tuple[BinaryTree, dict[int, BinaryTree]]:
+    '''This helper function returns a reference tree holding every key and the trees of the members, each holding only its own keys.'''
+
+    whole = BinaryTree(size, 1, verbose=False, layout=layout)
+    whole.seed_group_key()
+    node_keys = {node.name: (node.key, node.b_key) for node in whole.walk_pre_order(whole.root)}
+    trees = {}
+    for mid in range(1, size+1):
+        trees[mid] = BinaryTree(size, mid, verbose=False, layout=layout)
+        trees[mid].seed_path(node_keys)
+    return whole, trees
+#
+# end function: member_trees
+
+# function: pickled_int
+#
+def pickled_int(value: int) -> bytes:
+    '''This helper function returns the bytes pickle stores for a large integer.'''
+
+    return value.to_bytes((value.bit_length()+8)//8, 'little', signed=True)
+#
+# end function: pickled_int
+
+# function: test_stripped_tree_holds_no_private_material
+#
+@pytest.mark.parametrize('layout', ['balanced', 'str'])
+def test_stripped_tree_holds_no_private_material(layout):
+    '''The sponsor's stripped tree pickles without node keys, traffic keys or membership history.'''
+
+    # a subscriber makes every member derive (and cache) its traffic keys
+    #
+    unsubscribe = get_stream().subscribe(lambda *update: None)
+    try:
+        _, trees = member_trees(4, layout)
+        old_key = trees[1].root.key
+        old_cipher = trees[1].get_cipher()
+        for tree in trees.values():
+            tree.join_event()
+        sponsor = next(tree for tree in trees.values() if tree.my_node.ntype == 'spon')
+        private = [node.key for node in sponsor.walk_pre_order(sponsor.root) if node.key is not None]
+
+        stripped = sponsor.strip_private_keys()
+        try:
+            data = pickle.dumps(sponsor)
+        finally:
+            sponsor.restore_private_keys(stripped)
+    finally:
+        unsubscribe()
+
+    # nothing private is in the pickle ...
+    #
+    joiner = pickle.loads(data)
+    assert all(node.key is None for node in joiner.walk_pre_order(joiner.root))
+    assert joiner.cipher is None and joiner.cipher_key is None
+    assert joiner.delta == {'joined': [], 'left': []}
+    for key in private+[old_key]:
+        assert pickled_int(key) not in data
+    assert old_cipher.key not in data and old_cipher.iv not in data
+
+    # ... and the sponsor gets its keys and delta back
+    #
+    assert [node.key for node in sponsor.walk_pre_order(sponsor.root) if node.key is not None] == private
+    assert sponsor.delta == {'joined': [5], 'left': []}
+#
+# end function: test_stripped_tree_holds_no_private_material
+
+# function: test_members_converge_after_batches_of_events
+#
+@pytest.mark.parametrize('layout', ['balanced', 'str'])
+@pytest.mark.parametrize('size', [5, 16])
+def test_members_converge_after_batches_of_events(size, layout):
+    '''Every member reaches the reference group key after random batches of one to three joins and leaves.'''
+
+    # batches of one event exercise the partial key-path calculation, longer batches the whole path
+    #
+    rng = random.Random(size)
+    whole, trees = member_trees(size, layout)
+    for batch in range(100):
+        events = []
+        for _ in range(rng.randint(1, 3)):
+            members = [node.mid for node in whole.get_leaves()]
+            if len(members) <= 3 or rng.random() < 0.5:
+                events.append(('join', whole.simulate_join()))
+            else:
+                eid = rng.choice(members)
+                whole.simulate_leave(eid)
+                events.append(('leave', eid))
+
+        # the members apply the same events; a member joining in the batch receives a remaining member's tree
+        # afterwards, stripped like the tree a sponsor sends
+        #
+        for kind, eid in events:
+            for tree in trees.values():
+                if kind == 'join':
+                    tree.join_event()
+                elif tree.uid != eid:
+                    tree.leave_event(eid)
+            trees.pop(eid, None)
+        sender = next(iter(trees.values()))
+        stripped = sender.strip_private_keys()
+        try:
+            data = pickle.dumps(sender)
+        finally:
+            sender.restore_private_keys(stripped)
+        for node in whole.get_leaves():
+            if node.mid not in trees:
+                tree = pickle.loads(data)
+                assert all(other.key is None for other in tree.walk_pre_order(tree.root))
+                tree.uid = node.mid
+                tree.find_me()
+                trees[node.mid] = tree
+
+        # every member takes its own (possibly refreshed) key and its co-path blind keys from the reference
+        #
+        bkeys = {node.name: node.b_key for node in whole.walk_pre_order(whole.root) if node.b_key is not None}
+        for mid, tree in trees.items():
+            tree.my_node.key = whole.find_node(mid, True).key
+            tree.set_blind_keys(bkeys)
+            tree.calculate_group_key()
+            assert tree.root.key == whole.root.key, f"member {mid} diverged after batch {batch}: {events}"
+#
+# end function: test_members_converge_after_batches_of_events
+#
+# end file: test_binary_tree.py
@@ -0,0 +1,149 @@
+# file: test_epoch_stream.py
+#
+'''This file contains the tests of the EpochStream class.'''
+
+# import modules
+#
+import time
+import asyncio
+import logging
+import threading
+from tgdhstruct.epoch_stream import EpochStream
+
+# define an empty membership delta
+#
+DELTA = {'joined': [], 'left': []}
+
+# function: wait_for
+#
+def wait_for(condition, timeout: float=5.0) -> None:
+    '''This helper function waits until a condition holds (an iterator registered by another thread).'''
+
+    end = time.monotonic()+timeout
+    while not condition():
+        assert time.monotonic() < end, "timed out"
+        time.sleep(0.001)
+#
+# end function: wait_for
+
+# function: test_failing_callback_does_not_block_other_subscribers
+#
+def test_failing_callback_does_not_block_other_subscribers(caplog):
+    '''A callback that raises is logged, and the callbacks after it still get the update.'''
+
+    stream = EpochStream()
+    received = []
+
+    # function: broken
+    #
+    def broken(*update):
+        '''This helper function fails on every update.'''
+
+        raise RuntimeError("broken subscriber")
+    #
+    # end function: broken
+
+    stream.subscribe(broken)
+    stream.subscribe(lambda *update: received.append(update))
+    stream.subscribe(lambda *update: received.append(('member 2',)+update), member=2)
+    with caplog.at_level(logging.ERROR, logger='tgdhstruct.epoch_stream'):
+        stream.publish(1, 1, b'key-1', DELTA)
+        stream.publish(2, 2, b'key-2', DELTA)
+    assert received == [(1, 1, b'key-1', DELTA), (2, 2, b'key-2', DELTA), ('member 2', 2, 2, b'key-2', DELTA)]
+    assert len(caplog.records) == 2 and 'broken subscriber' in caplog.text
+#
+# end function: test_failing_callback_does_not_block_other_subscribers
+
+# function: test_iterators_see_only_later_epochs
+#
+def test_iterators_see_only_later_epochs():
+    '''An iterator holds no queue until it starts, and then sees the updates announced from then on.'''
+
+    stream = EpochStream()
+    updates = stream.updates(member=2, timeout=5)
+    assert not stream.active()
+    stream.publish(1, 2, b'key-1', DELTA)
+
+    # the consumer registers its queue on its first next()
+    #
+    received = []
+    consumer = threading.Thread(target=lambda: received.extend(updates))
+    consumer.start()
+    wait_for(stream.active)
+    stream.publish(2, 1, b'key-2', DELTA)
+    stream.publish(2, 2, b'key-2', DELTA)
+    stream.close()
+    consumer.join(5)
+    assert received == [(2, 2, b'key-2', DELTA)]
+    assert not stream.active()
+#
+# end function: test_iterators_see_only_later_epochs
+
+# function: test_async_iterators_see_only_later_epochs
+#
+def test_async_iterators_see_only_later_epochs():
+    '''An async iterator registers when its iteration starts and ends when the stream closes.'''
+
+    stream = EpochStream()
+
+    # function: main
+    #
+    async def main() -> list:
+        '''This helper function consumes the async iterator while updates are announced.'''
+
+        updates = stream.aupdates()
+        stream.publish(1, 1, b'key-1', DELTA)
+        assert not stream.active()
+
+        # function: consume
+        #
+        async def consume() -> list:
+            '''This helper function collects the updates until the stream closes.'''
+
+            return [update async for update in updates]
+        #
+        # end function: consume
+
+        task = asyncio.create_task(consume())
+        while not stream.active():
+            await asyncio.sleep(0)
+        stream.publish(2, 1, b'key-2', DELTA)
+        stream.close()
+        return await asyncio.wait_for(task, 5)
+    #
+    # end function: main
+
+    assert asyncio.run(main()) == [(2, 1, b'key-2', DELTA)]
+    assert not stream.active()
+#
+# end function: test_async_iterators_see_only_later_epochs
+
+# function: test_unsubscribe_and_close_end_delivery
+#
+def test_unsubscribe_and_close_end_delivery():
+    '''An unsubscribed callback gets nothing more, and a closed stream ends its iterators and goes inactive.'''
+
+    stream = EpochStream()
+    received = []
+    unsubscribe = stream.subscribe(lambda *update: received.append(update[0]))
+    stream.publish(1, 1, b'key-1', DELTA)
+    unsubscribe()
+    unsubscribe()
+    stream.publish(2, 1, b'key-2', DELTA)
+    assert received == [1] and not stream.active()
+
+    # an iterator waiting for its first update ends on close
+    #
+    updates = stream.updates()
+    done = threading.Event()
+    consumer = threading.Thread(target=lambda: (list(updates), done.set()))
+    consumer.start()
+    wait_for(stream.active)
+    stream.close()
+    assert done.wait(5)
+    consumer.join(5)
+    assert not stream.active()
+#
+# end function: test_unsubscribe_and_close_end_delivery
+#
+# end file: test_epoch_stream.py
@@ -0,0 +1,208 @@
+# file: test_event_intake.py
+#
+'''This file contains the tests of the EventIntake class.'''
+
+# import modules
+#
+import pytest
+from tgdhstruct.event_intake import EventIntake
+
+# class: StubGroup
+#
+class StubGroup:
+    '''
+    Description
+    -----------
+    This class stands in for a MemberAgent group: it keeps the member IDs and records the events applied.
+
+    Attributes
+    ----------
+    agents : dict[int, None]
+        The members by member ID
+    max_size : int
+        The largest group the transport has room for
+    applied : list[tuple[str, int]]
+        The events applied, in order
+    spon_id : int
+        The sponsor of the last leave
+    new_id : int
+        The member ID of the last joiner
+    '''
+
+    # constructor
+    #
+    def __init__(self, size: int, max_size: int=32) -> None:
+        '''This is the constructor.'''
+
+        self.agents = dict.fromkeys(range(1, size+1))
+        self.max_size = max_size
+        self.applied = []
+        self.spon_id = None
+        self.new_id = size
+    #
+    # end constructor
+
+    # method: check_room
+    #
+    def check_room(self, size: int) -> None:
+        '''This method raises a ValueError if the transport has no room for a group of <size> members.'''
+
+        if size > self.max_size:
+            raise ValueError(f"No room for {size} members")
+    #
+    # end method: check_room
+
+    # method: apply_leave
+    #
+    def apply_leave(self, eid: int) -> None:
+        '''This method removes a member; the lowest remaining member ID sponsors.'''
+
+        del self.agents[eid]
+        self.spon_id = min(self.agents)
+        self.applied.append(('leave', eid))
+    #
+    # end method: apply_leave
+
+    # method: apply_join
+    #
+    def apply_join(self) -> None:
+        '''This method adds a member with the next member ID.'''
+
+        self.new_id = self.new_id+1
+        self.agents[self.new_id] = None
+        self.applied.append(('join', self.new_id))
+    #
+    # end method: apply_join
+#
+# end class: StubGroup
+
+# class: StubScheduler
+#
+class StubScheduler:
+    '''
+    Description
+    -----------
+    This class stands in for an EventScheduler and records the sponsors of every refresh.
+
+    Attributes
+    ----------
+    refreshes : list[dict[int, bool]]
+        The sponsors of each refresh (True if the sponsor generated a new key)
+    '''
+
+    # constructor
+    #
+    def __init__(self) -> None:
+        '''This is the constructor.'''
+
+        self.refreshes = []
+    #
+    # end constructor
+
+    # method: refresh
+    #
+    def refresh(self, fresh: dict[int, bool]) -> None:
+        '''This method records a refresh.'''
+
+        self.refreshes.append(dict(fresh))
+    #
+    # end method: refresh
+#
+# end class: StubScheduler
+
+# fixture: intake
+#
+@pytest.fixture
+def intake() -> EventIntake:
+    '''This fixture returns an intake over a stub group of 5 members and a stub scheduler.'''
+
+    return EventIntake(StubGroup(5), window=1.0, max_delay=5.0, scheduler=StubScheduler())
+#
+# end fixture: intake
+
+# function: test_leave_and_rejoin_cancel_out
+#
+def test_leave_and_rejoin_cancel_out(intake):
+    '''A member that leaves and comes back within a window keeps its leaf, and nothing is rekeyed.'''
+
+    intake.submit_leave(3)
+    intake.submit_join(3)
+    assert (intake.pending(), intake.cancelled) == (0, 2)
+
+    # the window closes after a quiet second
+    #
+    assert not intake.poll(intake.last+0.5)
+    assert intake.poll(intake.last+1.0)
+    assert intake.group.applied == [] and intake.scheduler.refreshes == []
+    assert intake.first is None and intake.rekeys_saved() == 2
+#
+# end function: test_leave_and_rejoin_cancel_out
+
+# function: test_duplicate_leaves_collapse
+#
+def test_duplicate_leaves_collapse(intake):
+    '''Repeated leaves of a member count as cancelled and are applied once; a rejoin only cancels one of them.'''
+
+    intake.submit_leave(3)
+    intake.submit_leave(3)
+    assert intake.leaves == {3: 2} and intake.cancelled == 1
+    intake.submit_join(3)
+    assert intake.leaves == {3: 1} and intake.cancelled == 3 and intake.pending() == 1
+
+    assert intake.flush() == []
+    assert intake.group.applied == [('leave', 3)]
+    assert intake.scheduler.refreshes == [{1: True}]
+    assert intake.rekeys_saved() == 2
+#
+# end function: test_duplicate_leaves_collapse
+
+# function: test_leaves_of_non_members_are_dropped
+#
+def test_leaves_of_non_members_are_dropped(intake):
+    '''A leave of a member not in the group is dropped and not counted as a saved rekey.'''
+
+    intake.submit_leave(99)
+    intake.submit_leave(2)
+    intake.submit_join()
+    assert intake.flush() == [6]
+    assert intake.dropped == 1
+    assert intake.group.applied == [('leave', 2), ('join', 6)]
+    assert intake.scheduler.refreshes == [{1: True, 6: False}]
+    assert intake.rekeys_saved() == 1
+#
+# end function: test_leaves_of_non_members_are_dropped
+
+# function: test_refused_flush_keeps_the_window_pending
+#
+def test_refused_flush_keeps_the_window_pending():
+    '''A flush that would leave a single member, or exceed the transport's room, changes nothing and can be retried.'''
+
+    # leaves are applied before joins, so the joiners do not count toward the two remaining members
+    #
+    intake = EventIntake(StubGroup(3, max_size=4), scheduler=StubScheduler())
+    intake.submit_leave(2)
+    intake.submit_leave(3)
+    intake.submit_join()
+    with pytest.raises(ValueError, match='single member'):
+        intake.flush()
+    assert intake.pending() == 3 and intake.first is not None
+    assert intake.group.applied == [] and intake.scheduler.refreshes == []
+
+    # a rejoin cancels a leave; with three joins the group outgrows the transport until it has more room
+    #
+    intake.submit_join(2)
+    intake.submit_join()
+    assert intake.leaves == {3: 1} and len(intake.joins) == 2
+    intake.submit_join()
+    with pytest.raises(ValueError, match='No room'):
+        intake.flush()
+    assert intake.pending() == 4 and intake.group.applied == []
+    intake.group.max_size = 5
+    assert intake.flush() == [4, 5, 6]
+    assert intake.group.applied == [('leave', 3), ('join', 4), ('join', 5), ('join', 6)]
+    assert len(intake.scheduler.refreshes) == 1 and intake.pending() == 0
+    assert intake.rekeys_saved() == intake.received-1
+#
+# end function: test_refused_flush_keeps_the_window_pending
+#
+# end file: test_event_intake.py
@@ -0,0 +1,57 @@
+# file: test_event_journal.py
+#
+'''This file contains the tests of the EventJournal class.'''
+
+# import modules
+#
+import shutil
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.event_journal import EventJournal
+
+# function: test_recover_replays_records_after_snapshot
+#
+def test_recover_replays_records_after_snapshot(tmp_path):
+    '''A reopened journal rebuilds the tree from its snapshot and the records appended after it.'''
+
+    tree = BinaryTree(4, 2, verbose=False)
+    journal = EventJournal(str(tmp_path/'member'))
+    journal.snapshot(tree)
+    tree.join_event()
+    journal.append('join')
+    journal.close()
+
+    journal = EventJournal(str(tmp_path/'member'))
+    recovered = journal.recover()
+    journal.close()
+    assert recovered.nextmemb == tree.nextmemb
+    assert recovered.my_node.name == tree.my_node.name
+    assert recovered.my_node.key == tree.my_node.key
+#
+# end function: test_recover_replays_records_after_snapshot
+
+# function: test_stale_records_do_not_count_toward_the_next_snapshot
+#
+def test_stale_records_do_not_count_toward_the_next_snapshot(tmp_path):
+    '''Records left in the journal by a crash right after a snapshot are not counted as new records.'''
+
+    path = str(tmp_path/'member')
+    journal = EventJournal(path)
+    for i in range(3):
+        journal.append('bkeys', {f'<1,{i % 2}>': i})
+    journal.sync()
+    shutil.copy(f'{path}.wal', f'{path}.wal.old')
+    journal.snapshot(BinaryTree(4, 2, verbose=False))
+    journal.close()
+
+    # the crash: the snapshot was swapped in, the journal not truncated
+    #
+    shutil.copy(f'{path}.wal.old', f'{path}.wal')
+    journal = EventJournal(path)
+    assert (journal.seq, journal.since_snapshot) == (3, 0)
+    assert journal.append('calculate') == 4
+    assert journal.since_snapshot == 1
+    journal.close()
+#
+# end function: test_stale_records_do_not_count_toward_the_next_snapshot
+#
+# end file: test_event_journal.py
@@ -0,0 +1,72 @@
+# file: test_group_cipher.py
+#
+'''This file contains the tests of the GroupCipher class and the traffic-key cache of BinaryTree.'''
+
+# import modules
+#
+import pickle
+import pytest
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.group_cipher import GroupCipher
+
+# function: test_decrypt_into_round_trip
+#
+def test_decrypt_into_round_trip():
+    '''A buffer encrypted with encrypt_into decrypts back in place with decrypt_into.'''
+
+    cipher = GroupCipher.derive(12345, 1, 16)
+    src = bytes(range(256))*40
+    ct = bytearray(len(src))
+    tag = cipher.encrypt_into(3, 7, src, ct, chunk_size=1000)
+    dst = bytearray(len(src))
+    cipher.decrypt_into(3, 7, ct, dst, tag, chunk_size=1000)
+    assert bytes(dst) == src
+#
+# end function: test_decrypt_into_round_trip
+
+# function: test_decrypt_into_wipes_unauthenticated_plaintext
+#
+def test_decrypt_into_wipes_unauthenticated_plaintext():
+    '''A wrong tag raises ValueError and leaves no plaintext in the output buffer.'''
+
+    cipher = GroupCipher.derive(12345, 1, 16)
+    src = b'secret payload '*100
+    ct = bytearray(len(src))
+    tag = cipher.encrypt_into(3, 7, src, ct)
+    dst = bytearray(len(src))
+    with pytest.raises(ValueError):
+        cipher.decrypt_into(3, 7, ct, dst, bytes([tag[0] ^ 1])+tag[1:])
+    assert dst == bytearray(len(src))
+#
+# end function: test_decrypt_into_wipes_unauthenticated_plaintext
+
+# function: test_encrypt_stream_checks_output_buffer
+#
+def test_encrypt_stream_checks_output_buffer():
+    '''An output buffer smaller than a chunk is rejected instead of truncating the ciphertext.'''
+
+    cipher = GroupCipher.derive(12345, 1, 16)
+    chunks = [b'a'*8, b'b'*32]
+    stream = cipher.encrypt_stream(1, 1, chunks, out=bytearray(16))
+    assert len(next(stream)) == 8
+    with pytest.raises(ValueError):
+        next(stream)
+#
+# end function: test_encrypt_stream_checks_output_buffer
+
+# function: test_traffic_keys_are_not_pickled
+#
+def test_traffic_keys_are_not_pickled():
+    '''The traffic-key cache stays with the tree that derived it.'''
+
+    tree = BinaryTree(4, 1, verbose=False)
+    tree.seed_group_key()
+    cipher = tree.get_cipher()
+    copy = pickle.loads(pickle.dumps(tree))
+    assert copy.cipher is None and copy.cipher_key is None
+    assert cipher.key not in pickle.dumps(tree)
+    assert copy.get_cipher().key == cipher.key
+#
+# end function: test_traffic_keys_are_not_pickled
+#
+# end file: test_group_cipher.py
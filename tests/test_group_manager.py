@@ -0,0 +1,82 @@
+# file: test_group_manager.py
+#
+'''This file contains the tests of the GroupManager class.'''
+
+# import modules
+#
+import pytest
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.epoch_stream import get_stream
+from tgdhstruct.group_manager import GroupManager
+
+# fixture: manager
+#
+@pytest.fixture
+def manager():
+    '''This fixture returns a GroupManager hosting the groups 'a' and 'b' of four members each.'''
+
+    manager = GroupManager(workers=2)
+    manager.create_group('a', 4)
+    manager.create_group('b', 4)
+    yield manager
+    manager.close()
+#
+# end fixture: manager
+
+# function: test_updates_go_to_the_group_stream
+#
+def test_updates_go_to_the_group_stream(manager):
+    '''An event of one group is announced on that group's stream only.'''
+
+    updates = {gid: [] for gid in ('a', 'b')}
+    unsubscribe = [manager.stream(gid).subscribe(lambda *update, gid=gid: updates[gid].append(update)) for gid in updates]
+    process = []
+    unsubscribe.append(get_stream().subscribe(lambda *update: process.append(update)))
+    try:
+        manager.submit_join('a')
+        assert manager.run_pending() == [('a', 'join', 5, None)]
+    finally:
+        for stop in unsubscribe:
+            stop()
+    assert sorted(member for _, member, _, _ in updates['a']) == [1, 2, 3, 4, 5]
+    assert {key for _, _, key, _ in updates['a']} == {manager.get_cipher('a').key}
+    assert not updates['b'] and not process
+#
+# end function: test_updates_go_to_the_group_stream
+
+# function: test_joiner_gets_no_old_keys
+#
+def test_joiner_gets_no_old_keys(manager, monkeypatch):
+    '''With a subscriber on the group's stream, a joining member's tree holds no key of the epoch before the join.'''
+
+    # the new member's tree is inspected as it arrives, before it calculates anything
+    #
+    received = []
+    new_member_protocol = BinaryTree.new_member_protocol
+
+    # function: inspect
+    #
+    def inspect(tree: BinaryTree) -> None:
+        '''This helper function records the private material of the tree a joining member received.'''
+
+        received.append((tree.cipher, tree.cipher_key, [node.key for node in tree.walk_pre_order(tree.root) if node.key is not None]))
+        new_member_protocol(tree)
+    #
+    # end function: inspect
+
+    monkeypatch.setattr(BinaryTree, 'new_member_protocol', inspect)
+    unsubscribe = manager.stream('a').subscribe(lambda *update: None)
+    try:
+        old_key = manager.groups['a'][1].root.key
+        manager.groups['a'][1].get_cipher()
+        manager.submit_join('a')
+        assert manager.run_pending() == [('a', 'join', 5, None)]
+    finally:
+        unsubscribe()
+    assert received == [(None, None, [])]
+    assert manager.groups['a'][5].root.key != old_key
+    assert manager.groups['a'][5].root.key == manager.groups['a'][1].root.key
+#
+# end function: test_joiner_gets_no_old_keys
+#
+# end file: test_group_manager.py
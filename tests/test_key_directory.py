@@ -0,0 +1,65 @@
+# file: test_key_directory.py
+#
+'''This file contains the tests of the KeyDirectory class.'''
+
+# import modules
+#
+import sys
+import importlib
+import pytest
+from tgdhstruct.key_directory import KeyDirectory
+
+# function: test_directory_imports_without_osbrain
+#
+def test_directory_imports_without_osbrain(monkeypatch):
+    '''The in-process board imports without osbrain; only the service needs it.'''
+
+    monkeypatch.setitem(sys.modules, 'osbrain', None)
+    monkeypatch.delitem(sys.modules, 'tgdhstruct.key_directory')
+    module = importlib.import_module('tgdhstruct.key_directory')
+    assert module.KeyDirectory().read(['<1,0>']) == {}
+    with pytest.raises(ImportError):
+        module.KeyDirectoryService()
+#
+# end function: test_directory_imports_without_osbrain
+
+# function: test_posts_are_fetched_per_epoch
+#
+def test_posts_are_fetched_per_epoch():
+    '''A read returns the current epoch's posts, or the latest post of every name since an epoch.'''
+
+    directory = KeyDirectory()
+    directory.handle(('write', {'<1,0>': 10, '<1,1>': 11}))
+    assert directory.advance() == 1
+    directory.write({'<1,0>': 20, '<2,3>': 23})
+
+    assert directory.handle(('epoch',)) == 1
+    assert directory.read(['<1,0>', '<1,1>', '<2,3>']) == {'<1,0>': 20, '<2,3>': 23}
+    assert directory.handle(('read', ['<1,0>', '<1,1>', '<2,3>'], 0)) == {'<1,0>': 20, '<1,1>': 11, '<2,3>': 23}
+    assert directory.read(['<1,1>'], 1) == {}
+    with pytest.raises(ValueError):
+        directory.handle(('delete', ['<1,0>']))
+#
+# end function: test_posts_are_fetched_per_epoch
+
+# function: test_stale_epochs_are_rejected
+#
+def test_stale_epochs_are_rejected():
+    '''A member asking for the posts since an epoch the board no longer keeps gets an error, not a partial answer.'''
+
+    directory = KeyDirectory(history=2)
+    for epoch in range(5):
+        directory.write({'<1,0>': epoch, f'<2,{epoch % 4}>': epoch})
+        directory.advance()
+
+    # epochs 3 to 5 are kept: 0 to 2 are dropped
+    #
+    assert sorted(directory.posts) == [3, 4, 5]
+    assert directory.read(['<1,0>', '<2,0>', '<2,3>'], 3) == {'<1,0>': 4, '<2,0>': 4, '<2,3>': 3}
+    for since in (0, 2):
+        with pytest.raises(ValueError, match=f'Epoch {since}'):
+            directory.read(['<1,0>'], since)
+#
+# end function: test_stale_epochs_are_rejected
+#
+# end file: test_key_directory.py
@@ -0,0 +1,45 @@
+# file: test_key_pool.py
+#
+'''This file contains the tests of the KeyPairPool class.'''
+
+# import modules
+#
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.key_pool import KeyPairPool
+from tgdhstruct.random_pool import seed_pool
+
+# function: test_take_leaves_refill_to_replenish
+#
+def test_take_leaves_refill_to_replenish():
+    '''Taking pairs during a rekey starts no refill; replenish refills the pool afterwards.'''
+
+    seed_pool(None)
+    pool = KeyPairPool(capacity=2)
+    pool.fill()
+    key, b_key = pool.take()
+    assert b_key == pow(DataNode.g, key, DataNode.p)
+    pool.take()
+    pool.take()
+    assert pool.thread is None
+    assert (pool.hits, pool.misses) == (2, 1)
+
+    pool.replenish()
+    while len(pool.pairs) < pool.capacity:
+        pool.thread.join(0.01)
+    assert len(pool.pairs) == pool.capacity
+#
+# end function: test_take_leaves_refill_to_replenish
+
+# function: test_replenish_is_a_no_op_when_deterministic
+#
+def test_replenish_is_a_no_op_when_deterministic():
+    '''A seeded random pool keeps its draws in order: no refill thread is started.'''
+
+    pool = KeyPairPool(capacity=2)
+    pool.take()
+    pool.replenish()
+    assert pool.thread is None and not pool.pairs
+#
+# end function: test_replenish_is_a_no_op_when_deterministic
+#
+# end file: test_key_pool.py
@@ -0,0 +1,101 @@
+# file: test_nary_tree.py
+#
+'''This file contains the tests of the NaryTree class.'''
+
+# import modules
+#
+import pickle
+import random
+import pytest
+from tgdhstruct.nary_tree import NaryTree
+from tgdhstruct.tree_storage import MappedKeyStore
+
+# function: test_members_converge_after_batches_of_events
+#
+@pytest.mark.parametrize('arity', [3, 4])
+@pytest.mark.parametrize('size', [5, 16])
+def test_members_converge_after_batches_of_events(size, arity):
+    '''Every member reaches the reference group key after random batches of one to three joins and leaves.'''
+
+    # the members' own keys and the public values (blind keys and second-round X values) come from a reference
+    # tree holding every key
+    #
+    rng = random.Random(size*arity)
+    whole = NaryTree(size, 1, arity, verbose=False)
+    whole.seed_group_key()
+    trees = {mid: NaryTree(size, mid, arity, verbose=False) for mid in range(1, size+1)}
+    for batch in range(60):
+        events = []
+        for _ in range(rng.randint(1, 3)):
+            members = [node.mid for node in whole.get_leaves()]
+            if len(members) <= 3 or rng.random() < 0.5:
+                events.append(('join', whole.simulate_join()))
+            else:
+                eid = rng.choice(members)
+                whole.simulate_leave(eid)
+                events.append(('leave', eid))
+
+        # the members apply the same events; a member joining in the batch receives a remaining member's tree
+        # afterwards, stripped like the tree a sponsor sends
+        #
+        for kind, eid in events:
+            for tree in trees.values():
+                if kind == 'join':
+                    tree.join_event()
+                elif tree.uid != eid:
+                    tree.leave_event(eid)
+            trees.pop(eid, None)
+        sender = next(iter(trees.values()))
+        stripped = sender.strip_private_keys()
+        try:
+            data = pickle.dumps(sender)
+        finally:
+            sender.restore_private_keys(stripped)
+        for node in whole.get_leaves():
+            if node.mid not in trees:
+                tree = pickle.loads(data)
+                tree.uid = node.mid
+                tree.find_me()
+                trees[node.mid] = tree
+
+        # every member calculates its key path from its own key and the reference's public values
+        #
+        public = {node.name: (node.b_key, node.x_key) for node in whole.walk_pre_order(whole.root)}
+        for mid, tree in trees.items():
+            assert tree.root.name == whole.root.name and len(public) == len(list(tree.walk_pre_order(tree.root)))
+            for node in tree.walk_pre_order(tree.root):
+                node.b_key, node.x_key = public[node.name]
+            tree.my_node.key = whole.find_node(mid, True).key
+            tree.calculate_group_key()
+            assert tree.root.key == whole.root.key, f"member {mid} diverged after batch {batch}: {events}"
+
+    # the events reached full nodes and leaves on several levels
+    #
+    assert max(len(node.children) for node in whole.walk_pre_order(whole.root)) == arity
+    assert len({node.l for node in whole.get_leaves()}) > 1
+#
+# end function: test_members_converge_after_batches_of_events
+
+# function: test_binary_only_methods_raise
+#
+def test_binary_only_methods_raise(tmp_path):
+    '''The methods that combine one co-path blind key per level, and a key store, are rejected.'''
+
+    tree = NaryTree(7, 1, verbose=False)
+    tree.seed_group_key()
+    calls = [tree.initial_calculate_group_key, tree.calculate_partial_group_key, tree.compute_node_keys,
+        tree.seed_path, tree.load_storage]
+    for call in calls:
+        with pytest.raises(TypeError, match='3-ary'):
+            call(1)
+    store = MappedKeyStore(str(tmp_path/'keys.bin'), 7)
+    try:
+        with pytest.raises(TypeError):
+            tree.storage = store
+        assert tree.storage is None
+    finally:
+        store.close()
+#
+# end function: test_binary_only_methods_raise
+#
+# end file: test_nary_tree.py
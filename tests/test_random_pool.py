@@ -0,0 +1,134 @@
+# file: test_random_pool.py
+#
+'''This file contains the tests of the RandomPool class.'''
+
+# import modules
+#
+import os
+import pytest
+from Crypto.Hash import SHAKE256
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.key_pool import KeyPairPool
+from tgdhstruct.random_pool import RandomPool, get_pool, seed_pool
+
+# function: test_randint_stays_in_range_by_rejection
+#
+def test_randint_stays_in_range_by_rejection():
+    '''Candidates of the range's bit length that fall outside the range are discarded, not folded back.'''
+
+    # 21 values (1 to p-2 for p=23) need 5-bit candidates: 0 to 31, of which 21 to 31 are rejected
+    #
+    pool = RandomPool(block_size=64, seed=b'range')
+    stream = SHAKE256.new(b'range')
+    buffer = stream.read(64)
+    expected = []
+    while len(expected) < 2000:
+        if not buffer:
+            buffer = stream.read(64)
+        candidate, buffer = buffer[0] >> 3, buffer[1:]
+        if candidate < 21:
+            expected.append(1+candidate)
+    drawn = [pool.randint(1, 21) for _ in range(2000)]
+    assert drawn == expected
+    assert set(drawn) == set(range(1, 22))
+
+    # private keys (of nodes and of pooled pairs) are drawn from [1, p-2]: p-1 would make the blind key 1
+    #
+    DataNode.p = 23
+    keys = set()
+    for _ in range(500):
+        node = DataNode()
+        node.gen_private_key()
+        keys.add(node.key)
+    assert keys == set(range(1, 22))
+    assert {KeyPairPool.generate((23, 5))[0] for _ in range(500)} == set(range(1, 22))
+    with pytest.raises(ValueError):
+        pool.randbelow(0)
+#
+# end function: test_randint_stays_in_range_by_rejection
+
+# function: test_seeded_pools_are_reproducible
+#
+def test_seeded_pools_are_reproducible():
+    '''Pools with the same seed draw the same integers across block boundaries; other seeds and OS entropy differ.'''
+
+    pool, again = RandomPool(block_size=24, seed=b'bench'), RandomPool(block_size=24, seed=b'bench')
+    draws = [pool.randint(1, 2**127-3) for _ in range(50)]
+    assert draws == [again.randint(1, 2**127-3) for _ in range(50)]
+    assert draws != [RandomPool(seed=b'other').randint(1, 2**127-3) for _ in range(50)]
+    assert not RandomPool().deterministic
+
+    # the process pool reproduces the members' private keys
+    #
+    keys = []
+    for _ in range(2):
+        seed_pool(b'bench')
+        keys.append([DataNode.exp(DataNode.g, get_pool().randint(1, DataNode.p-2)) for _ in range(5)])
+    assert keys[0] == keys[1]
+#
+# end function: test_seeded_pools_are_reproducible
+
+# function: forked_draws
+#
+def forked_draws() -> dict[bytes, int]:
+    '''This helper function forks two children (the first forking a grandchild) and returns every process's fork path and first draw.'''
+
+    # function: child
+    #
+    def child(write: int, depth: int) -> None:
+        '''This helper function reports a child's fork path and draw (after forking its own child).'''
+
+        try:
+            if depth:
+                draws = run(depth-1)
+                os.write(write, b''.join(b'%s=%d\n' % item for item in draws.items()))
+            os.write(write, b'%s=%d\n' % (get_pool().label, get_pool().randint(1, 2**64)))
+        finally:
+            os._exit(0)
+    #
+    # end function: child
+
+    # function: run
+    #
+    def run(depth: int) -> dict[bytes, int]:
+        '''This helper function forks the children of one process and collects their reports.'''
+
+        draws = {}
+        for i in range(2):
+            read, write = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read)
+                child(write, depth if i == 0 else 0)
+            os.close(write)
+            with os.fdopen(read, 'rb') as out:
+                for line in out.read().splitlines():
+                    label, value = line.rsplit(b'=', 1)
+                    draws[label] = int(value)
+            os.waitpid(pid, 0)
+        return draws
+    #
+    # end function: run
+
+    seed_pool(b'fork')
+    get_pool().randint(1, 2**64)
+    draws = run(1)
+    draws[get_pool().label] = get_pool().randint(1, 2**64)
+    return draws
+#
+# end function: forked_draws
+
+# function: test_forked_children_rekey_their_streams
+#
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason='needs os.fork')
+def test_forked_children_rekey_their_streams():
+    '''Every forked process draws from its own stream, keyed by its fork path, so reruns draw the same values.'''
+
+    draws = forked_draws()
+    assert set(draws) == {b'', b'/1', b'/1/1', b'/1/2', b'/2'}
+    assert len(set(draws.values())) == len(draws)
+    assert forked_draws() == draws
+#
+# end function: test_forked_children_rekey_their_streams
+#
+# end file: test_random_pool.py
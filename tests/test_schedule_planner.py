@@ -0,0 +1,121 @@
+# file: test_schedule_planner.py
+#
+'''This file contains the tests of the SchedulePlanner class.'''
+
+# import modules
+#
+import pickle
+import random
+import pytest
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.schedule_planner import SchedulePlanner
+
+# function: planned
+#
+def planned(schedule: list) -> list[list[tuple[int, str, list[int]]]]:
+    '''This helper function returns the sender, node name and receivers of every message, round by round.'''
+
+    for rnd, transmissions in enumerate(schedule):
+        assert transmissions and all(message.rnd == rnd for message in transmissions)
+    return [sorted((message.sender, message.name, sorted(message.receivers)) for message in transmissions)
+        for transmissions in schedule]
+#
+# end function: planned
+
+# function: initial_exchange
+#
+def initial_exchange(trees: dict[int, BinaryTree]) -> list[list[tuple[int, str, list[int]]]]:
+    '''This helper function works out the initial exchange round by round from every member's own tree (the exchange the planner replaced).'''
+
+    # every member pads its co-path to the height and, per round, subscribes to the first member below its
+    # co-path node of that round
+    #
+    height = max(tree.my_node.l for tree in trees.values())
+    messages = [{} for _ in range(height)]
+    for mid, tree in trees.items():
+        co_path = tree.my_node.get_co_path()
+        for i, node in enumerate(co_path):
+            rnd = height-len(co_path)+i
+            messages[rnd].setdefault((node.leaves[0].mid, node.name), []).append(mid)
+    return [sorted((sender, name, sorted(receivers)) for (sender, name), receivers in level.items())
+        for level in messages]
+#
+# end function: initial_exchange
+
+# function: rekey_exchange
+#
+def rekey_exchange(trees: dict[int, BinaryTree], spon_id: int, skip: int, exclude: tuple[int, ...]) -> list[list[tuple[int, str, list[int]]]]:
+    '''This helper function works out a rekey round by round from every member's update path (the exchange the planner replaced).'''
+
+    # the sponsor sends its key path (without the leaf after a join) one node per round to the members whose
+    # update path holds the node; the planner leaves out rounds nobody listens to
+    #
+    update_paths = {mid: {node.name for node in tree.get_update_path()} for mid, tree in trees.items() if mid not in exclude}
+    rounds = []
+    for node in trees[spon_id].my_node.get_key_path()[skip:-1]:
+        receivers = sorted(mid for mid, names in update_paths.items() if node.name in names)
+        if receivers:
+            rounds.append([(spon_id, node.name, receivers)])
+    return rounds
+#
+# end function: rekey_exchange
+
+# function: test_plans_match_the_per_round_exchange
+#
+@pytest.mark.parametrize('layout', ['balanced', 'str'])
+@pytest.mark.parametrize('size', [2, 5, 16])
+def test_plans_match_the_per_round_exchange(size, layout):
+    '''The planned senders and receivers of the initial exchange, joins and leaves are those of the per-round exchange, with or without the full-tree pass.'''
+
+    trees = {mid: BinaryTree(size, mid, verbose=False, layout=layout) for mid in range(1, size+1)}
+    assert planned(SchedulePlanner(trees[1]).initial()) == initial_exchange(trees)
+
+    rng = random.Random(size)
+    for _ in range(40):
+        if len(trees) <= 2 or rng.random() < 0.5:
+            for tree in trees.values():
+                tree.join_event()
+            spon_id = next(mid for mid, tree in trees.items() if tree.my_node.ntype == 'spon')
+            new_id = trees[spon_id].nextmemb-1
+            expected = rekey_exchange(trees, spon_id, 1, (spon_id, new_id))
+            schedule = SchedulePlanner(trees[spon_id]).join(spon_id, new_id)
+            assert planned(SchedulePlanner.plan(trees[spon_id], 'join', spon_id, new_id)) == planned(schedule)
+
+            # the new member starts from the sponsor's tree and sends its blind key to the members below its sibling
+            #
+            trees[new_id] = pickle.loads(pickle.dumps(trees[spon_id]))
+            trees[new_id].uid = new_id
+            trees[new_id].find_me()
+            share = SchedulePlanner(trees[new_id]).send(0, trees[new_id].my_node, new_id)
+            assert planned([[SchedulePlanner.share(trees[new_id])]]) == planned([[share]])
+            if layout == 'str':
+                assert sorted(share.receivers) == sorted(mid for mid in trees if mid != new_id)
+        else:
+            eid = rng.choice(list(trees))
+            del trees[eid]
+            for tree in trees.values():
+                tree.leave_event(eid)
+            spon_id = next(mid for mid, tree in trees.items() if tree.my_node.ntype == 'spon')
+            expected = rekey_exchange(trees, spon_id, 0, (spon_id,))
+            schedule = SchedulePlanner(trees[spon_id]).leave(spon_id)
+            assert planned(SchedulePlanner.plan(trees[spon_id], 'leave', spon_id)) == planned(schedule)
+        assert planned(schedule) == expected
+#
+# end function: test_plans_match_the_per_round_exchange
+
+# function: test_members_below_a_node_are_a_range
+#
+@pytest.mark.parametrize('layout', ['balanced', 'str'])
+def test_members_below_a_node_are_a_range(layout):
+    '''Every node's members are one contiguous range of the member list, so the planner stores two integers per node.'''
+
+    tree = BinaryTree(33, 1, verbose=False, layout=layout)
+    planner = SchedulePlanner(tree)
+    assert sorted(planner.leaves) == list(range(1, 34))
+    for node in tree.walk_pre_order(tree.root):
+        assert planner.members(node) == [leaf.mid for leaf in node.leaves]
+        assert len(planner.spans[node.name]) == 2
+#
+# end function: test_members_below_a_node_are_a_range
+#
+# end file: test_schedule_planner.py
@@ -0,0 +1,51 @@
+# file: test_shm_transport.py
+#
+'''This file contains the tests of the SharedKeyTable class.'''
+
+# import modules
+#
+import random
+import pytest
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.shm_transport import SharedKeyTable
+
+# function: test_table_holds_every_node_up_to_max_size
+#
+@pytest.mark.parametrize('max_size', [3, 5, 16, 33])
+def test_table_holds_every_node_up_to_max_size(max_size):
+    '''A table sized with levels_for takes the blind keys of every node while churn keeps the group within max_size.'''
+
+    rng = random.Random(max_size)
+    tree = BinaryTree(2, 1, verbose=False)
+    tree.seed_group_key()
+    table = SharedKeyTable(SharedKeyTable.levels_for(max_size))
+    try:
+        for _ in range(500):
+            members = [node.mid for node in tree.get_leaves()]
+            if len(members) < max_size and (len(members) <= 2 or rng.random() < 0.6):
+                tree.simulate_join()
+            else:
+                tree.simulate_leave(rng.choice([mid for mid in members if mid != tree.uid]))
+            bkeys = {node.name: node.b_key for node in tree.walk_pre_order(tree.root) if node.b_key is not None}
+            table.write(bkeys)
+            assert table.read(list(bkeys)) == bkeys
+    finally:
+        table.close()
+#
+# end function: test_table_holds_every_node_up_to_max_size
+
+# function: test_table_rejects_nodes_beyond_its_levels
+#
+def test_table_rejects_nodes_beyond_its_levels():
+    '''A node below the table's last level is refused with a ValueError.'''
+
+    table = SharedKeyTable(SharedKeyTable.levels_for(4))
+    try:
+        with pytest.raises(ValueError):
+            table.write({'<3,0>': 5})
+    finally:
+        table.close()
+#
+# end function: test_table_rejects_nodes_beyond_its_levels
+#
+# end file: test_shm_transport.py
@@ -0,0 +1,62 @@
+# file: test_trace_replay.py
+#
+'''This file contains the tests of the TraceReplay class.'''
+
+# import modules
+#
+import io
+import json
+import pytest
+from tgdhstruct.trace_replay import TraceReplay
+
+# function: replay
+#
+def replay(lines: list[str], size: int=4) -> tuple[TraceReplay, list[dict]]:
+    '''This helper function replays trace lines through a tree-backend engine and returns it with the result records.'''
+
+    engine = TraceReplay('tree')
+    engine.start(size)
+    out = io.StringIO()
+    assert engine.replay(lines, out) == len([line for line in lines if line.strip()])
+    return engine, [json.loads(line) for line in out.getvalue().splitlines()]
+#
+# end function: replay
+
+# function: test_trace_replays_to_expected_membership
+#
+def test_trace_replays_to_expected_membership():
+    '''A valid trace adds and removes the members it names, one epoch and one new group key per event.'''
+
+    trace = ['{"event": "join"}', '', '{"event": "leave", "member": 2}', '{"event": "merge", "size": 2}',
+        '{"event": "leave", "member": 5}']
+    engine, records = replay(trace)
+
+    assert [record['seq'] for record in records] == [0, 1, 2, 3]
+    assert all('error' not in record for record in records)
+    assert records[0]['member'] == 5 and records[2]['members'] == [6, 7]
+    assert [record['epoch'] for record in records] == [1, 2, 3, 4]
+    assert [record['size'] for record in records] == [5, 4, 6, 5]
+    assert sorted(engine.members()) == [1, 3, 4, 6, 7]
+    assert len({record['fingerprint'] for record in records}) == 4
+#
+# end function: test_trace_replays_to_expected_membership
+
+# function: test_malformed_lines_produce_error_records
+#
+@pytest.mark.parametrize('line', ['not json', 'null', '[1, 2]', '{"event": "explode"}', '{"event": "leave"}',
+    '{"event": "leave", "member": null}', '{"event": "leave", "member": 99}', '{"event": "merge"}',
+    '{"event": "merge", "size": null}', '{"event": "merge", "size": 0}', '{"event": "merge", "size": -2}'])
+def test_malformed_lines_produce_error_records(line):
+    '''A malformed or inapplicable line gets an error record and leaves the group and the epoch unchanged.'''
+
+    engine, records = replay(['{"event": "join"}', line, '{"event": "join"}'])
+
+    assert 'error' in records[1]
+    assert records[1]['epoch'] == 1 and records[1]['size'] == 5
+    assert records[1]['fingerprint'] == records[0]['fingerprint']
+    assert records[2]['epoch'] == 2 and records[2]['member'] == 6
+    assert sorted(engine.members()) == [1, 2, 3, 4, 5, 6]
+#
+# end function: test_malformed_lines_produce_error_records
+#
+# end file: test_trace_replay.py
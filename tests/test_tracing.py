@@ -0,0 +1,93 @@
+# file: test_tracing.py
+#
+'''This file contains the tests of the Tracer class and the traced decorator.'''
+
+# import modules
+#
+import os
+import json
+import threading
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.tracing import Tracer, get_tracer
+
+# function: load_trace
+#
+def load_trace(path: str) -> list[dict]:
+    '''This helper function loads an exported trace and checks the fields every trace event needs.'''
+
+    with open(path, encoding='utf-8') as trace:
+        events = json.load(trace)['traceEvents']
+    assert isinstance(events, list)
+    for event in events:
+        assert event['ph'] in ('X', 'i')
+        assert isinstance(event['ts'], float) and event['ts'] >= 0
+        assert event['pid'] == os.getpid() and event['tid'] == threading.get_ident()
+        if event['ph'] == 'X':
+            assert isinstance(event['dur'], float) and event['dur'] >= 0
+    return events
+#
+# end function: load_trace
+
+# function: test_nested_spans_export_to_a_bounded_trace
+#
+def test_nested_spans_export_to_a_bounded_trace(tmp_path):
+    '''Nested spans are recorded inside each other, and a full ring buffer keeps only the newest events.'''
+
+    tracer = Tracer(capacity=4)
+    with tracer.span('ignored'):
+        pass
+    assert not tracer.events
+
+    tracer.enable()
+    with tracer.span('outer', level=1):
+        with tracer.span('inner', level=2):
+            tracer.instant('mark')
+    assert tracer.export(str(tmp_path/'nested.json')) == 3
+    events = load_trace(str(tmp_path/'nested.json'))
+    assert [event['name'] for event in events] == ['mark', 'inner', 'outer']
+    mark, inner, outer = events
+    # (timestamps and durations are rounded to 0.1 us each)
+    #
+    assert outer['ts'] <= inner['ts'] <= mark['ts'] <= inner['ts']+inner['dur']+0.1
+    assert inner['ts']+inner['dur'] <= outer['ts']+outer['dur']+0.2
+    assert outer['args'] == {'level': 1, 'exps': 0}
+
+    # the buffer holds four events: the oldest go first
+    #
+    for i in range(5):
+        tracer.sleep(0, round=i)
+    assert tracer.export(str(tmp_path/'full.json')) == 4
+    events = load_trace(str(tmp_path/'full.json'))
+    assert [event['args']['round'] for event in events] == [1, 2, 3, 4]
+    assert all(event['name'] == 'sleep' and event['cat'] == 'wait' for event in events)
+    tracer.clear()
+    assert tracer.export(str(tmp_path/'empty.json')) == 0
+#
+# end function: test_nested_spans_export_to_a_bounded_trace
+
+# function: test_traced_tree_methods_are_tagged
+#
+def test_traced_tree_methods_are_tagged(tmp_path):
+    '''The traced tree methods record the member, its level, the epoch and the exponentiations they ran.'''
+
+    tree = BinaryTree(4, 2, verbose=False)
+    tree.seed_group_key()
+    tracer = get_tracer()
+    tracer.clear()
+    tracer.enable()
+    try:
+        tree.simulate_join()
+    finally:
+        tracer.disable()
+    tracer.export(str(tmp_path/'tree.json'))
+    tracer.clear()
+
+    events = {event['name']: event for event in load_trace(str(tmp_path/'tree.json'))}
+    assert {'tree.simulate_join', 'tree.join_event', 'tree.sponsor_rekey'} <= set(events)
+    join = events['tree.simulate_join']
+    assert join['args']['member'] == 2 and 'level' in join['args'] and 'epoch' in join['args']
+    assert join['args']['exps'] >= events['tree.sponsor_rekey']['args']['exps'] > 0
+#
+# end function: test_traced_tree_methods_are_tagged
+#
+# end file: test_tracing.py
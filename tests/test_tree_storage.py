@@ -0,0 +1,74 @@
+# file: test_tree_storage.py
+#
+'''This file contains the tests of the MappedKeyStore class.'''
+
+# import modules
+#
+import random
+import pytest
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.tree_storage import MappedKeyStore
+
+# function: test_store_matches_tree_under_churn
+#
+@pytest.mark.parametrize('size', [2, 5, 16])
+def test_store_matches_tree_under_churn(size, tmp_path):
+    '''A store and an in-memory tree agree on every position and on the member index after every event.'''
+
+    # small stores reach their last level quickly (where a leave moves subtrees up), and then grow
+    #
+    rng = random.Random(size)
+    tree = BinaryTree(size, 1, verbose=False)
+    tree.seed_group_key()
+    store = MappedKeyStore(str(tmp_path/'keys.bin'), size, levels=max(5, tree.root.height+1))
+    try:
+        for event in range(2000):
+            members = [node.mid for node in tree.get_leaves()]
+            if len(members) <= 2 or rng.random() < 0.5:
+                tree.simulate_join()
+                store.join()
+            else:
+                eid = rng.choice([mid for mid in members if mid != tree.uid])
+                tree.simulate_leave(eid)
+                store.leave(eid)
+            slots = store.compare(tree)
+            assert not slots, f"store differs after event {event}: {slots[:8]}"
+    finally:
+        store.close()
+#
+# end function: test_store_matches_tree_under_churn
+
+# function: test_reopened_store_checks_its_member_index
+#
+@pytest.mark.parametrize('damage', ['none', 'truncated', 'capacity'])
+def test_reopened_store_checks_its_member_index(damage, tmp_path):
+    '''A store reopens with its members, and a member index that does not match the header is rejected.'''
+
+    path = str(tmp_path/'keys.bin')
+    store = MappedKeyStore(path, 5)
+    store.join()
+    store.leave(2)
+    store.close()
+
+    # damage the file: cut off the end of the index, or shrink its capacity in the header below the member IDs
+    #
+    with open(path, 'r+b') as file:
+        if damage == 'truncated':
+            file.truncate(file.seek(0, 2)-8)
+        elif damage == 'capacity':
+            file.seek(MappedKeyStore.HEADER.size-8)
+            file.write((3).to_bytes(8, 'little'))
+    if damage != 'none':
+        with pytest.raises(ValueError, match='member index'):
+            MappedKeyStore(path)
+        return
+    store = MappedKeyStore(path)
+    try:
+        assert store.nextmemb == 7
+        assert sorted(store.get_mid(store.find_member(mid)) for mid in (1, 3, 4, 5, 6)) == [1, 3, 4, 5, 6]
+    finally:
+        store.close()
+#
+# end function: test_reopened_store_checks_its_member_index
+#
+# end file: test_tree_storage.py
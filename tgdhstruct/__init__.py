@@ -1,2 +1,47 @@
 from tgdhstruct.binary_tree import BinaryTree
-from tgdhstruct.member_agent import MemberAgent
+from tgdhstruct.nary_tree import NaryTree
+from tgdhstruct.group_cipher import GroupCipher
+from tgdhstruct.group_manager import GroupManager
+from tgdhstruct.shm_transport import SharedKeyTable
+from tgdhstruct.tree_storage import MappedKeyStore
+from tgdhstruct.schedule_planner import SchedulePlanner
+from tgdhstruct.epoch_stream import EpochStream
+from tgdhstruct.event_journal import EventJournal
+from tgdhstruct.key_directory import KeyDirectory
+
+# the multi-agent classes need osbrain (the 'agents' extra); they are imported on first use so that the
+# tree and crypto core loads without osbrain and its Pyro/ZeroMQ stack
+#
+_AGENT_MODULES = {
+    'MemberAgent': 'tgdhstruct.member_agent',
+    'ShardedMemberAgent': 'tgdhstruct.member_shard',
+    'EventScheduler': 'tgdhstruct.event_scheduler',
+    'EventIntake': 'tgdhstruct.event_intake',
+    'KeyDirectoryService': 'tgdhstruct.key_directory',
+}
+
+# function: __getattr__
+#
+def __getattr__(name: str):
+    '''This function imports a multi-agent class the first time it is used.'''
+
+    if name not in _AGENT_MODULES:
+        raise AttributeError(f"module 'tgdhstruct' has no attribute '{name}'")
+    import importlib
+    try:
+        module = importlib.import_module(_AGENT_MODULES[name])
+    except ImportError as err:
+        raise ImportError(f"{name} requires the 'agents' extra: pip install tgdhstruct[agents]") from err
+    globals()[name] = getattr(module, name)
+    return globals()[name]
+#
+# end function: __getattr__
+
+# function: __dir__
+#
+def __dir__() -> list[str]:
+    '''This function lists the core and multi-agent names of the package.'''
+
+    return sorted(list(globals())+list(_AGENT_MODULES))
+#
+# end function: __dir__
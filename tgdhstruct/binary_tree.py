@@ -5,15 +5,31 @@
 # import modules
 #
 import sys
-import gc
-from typing import Union
+import hashlib
+from typing import Iterator, Optional, Union, TYPE_CHECKING
 import math
 import itertools
-from anytree.exporter import DotExporter
-from anytree import RenderTree
-from anytree import search
-from anytree import PreOrderIter
+from concurrent.futures import ProcessPoolExecutor
 from tgdhstruct.data_node import DataNode
+from tgdhstruct.group_cipher import GroupCipher
+from tgdhstruct.tracing import traced
+from tgdhstruct.key_pool import get_key_pool
+from tgdhstruct.epoch_stream import get_stream
+if TYPE_CHECKING:
+    from tgdhstruct.tree_storage import MappedKeyStore
+    from tgdhstruct.epoch_stream import EpochStream
+
+# function: compute_node
+#
+def compute_node(task: tuple[Optional[int], int, int, int, bool]) -> tuple[int, Optional[int]]:
+    '''This helper function calculates a node key (if a base is given) and its blind key, e.g. in a worker process.'''
+
+    base, key, p, g, blind = task
+    if base is not None:
+        key = pow(base, key, p)
+    return key, pow(g, key, p) if blind else None
+#
+# end function: compute_node
 
 # class: BinaryTree
 #
@@ -23,6 +39,12 @@ class BinaryTree:
     -----------
     This class manages the binary tree data structure used to faciliate the TGDH scheme.
 
+    Two layouts are supported. The 'balanced' layout keeps the tree as shallow as possible: a joining member
+    splits the shallowest leaf and the sponsor rekeys O(log n) levels. The 'str' (skinny tree) layout keeps a
+    member as the right child of every intermediate node: a joining member goes above the old root, so a join
+    costs a constant number of rounds and exponentiations, while a leave rekeys up to O(n) levels. The skinny
+    layout suits groups that mostly grow; it is as deep as the group is large.
+
     Attributes
     ----------
     size : int
@@ -43,17 +65,42 @@ class BinaryTree:
         The root of the tree
     refresh_path :
         The path of the keys that need to be updated after a join or leave event
+    verbose : bool
+        Whether events print their progress and export/print the tree automatically
+    epoch : int
+        The number of join and leave events applied to the tree
+    cipher : GroupCipher
+        The traffic keys derived for the current epoch (a local cache: never pickled)
+    cipher_key : int
+        The group key the cached traffic keys were derived from (never pickled)
+    storage : MappedKeyStore
+        The key store holding the whole tree; if set, only my key path and co-path are materialized and
+        events go through simulate_join/simulate_leave
+    delta : dict[str, list[int]]
+        The members that joined and left since my last group key
+    layout : str
+        The shape of the tree: 'balanced' or 'str' (skinny)
+    stream : EpochStream
+        The stream my group keys are announced on (None for the stream of this process; never pickled)
 
     Methods
     -------
+    __getstate__(self) -> dict
+        This method returns the state to pickle, with the nodes flattened into a list (without the traffic-key cache and stream).
+    __setstate__(self, state: dict) -> None
+        This method restores a pickled tree and relinks its nodes (with an empty traffic-key cache, announcing on the process stream).
     add_nodes(self, curr_n: DataNode) -> None
         This method adds two children nodes to a specified parent node.
     get_leaves(self) -> tuple[DataNode]
         This method returns all of the leaves in the tree.
     walk_tree_build(self, curr_n: DataNode) -> None
         This method is called recursively to build the tree.
-    walk_pre_order(self, root: DataNode) -> PreOrderIter
+    build_skinny(self) -> None
+        This method builds the initial skinny tree (every intermediate node has a member as its right child).
+    walk_pre_order(self, root: DataNode) -> Iterator[DataNode]
         This method returns the pre-order traversal of the tree.
+    walk_post_order(self, root: DataNode) -> Iterator[DataNode]
+        This method returns the post-order traversal of the tree.
     type_assign(self) -> None
         This method assigns the 'ntype' attribute for the nodes in the tree.
     id_assign(self) -> None
@@ -61,11 +108,31 @@ class BinaryTree:
     find_me(self) -> None:
         This function finds the node in the tree that corresponds to this user.
     key_generation(self) -> None
-        This method generates keys only for my node.
+        This method generates keys only for my node (taking a pair prepared by the key pair pool).
     initial_calculate_group_key(self, max_iters: int) -> None:
         This method calculates the group key iteratively.
     calculate_group_key(self) -> None
-        This method calculates the group key.
+        This method calculates the group key (from the lowest node of my key path that the last event changed).
+    announce_key(self) -> None
+        This method announces my new group key on the epoch stream, starts a new membership delta and lets the key pair pool refill.
+    load_storage(self) -> None
+        This method materializes my key path and co-path from the key store (keeping my private key).
+    seed_group_key(self, workers: int=1) -> None
+        This method generates keys for every member and calculates every node key (simulation only).
+    compute_node_keys(self, workers: int=1) -> dict[str, tuple[int, Optional[int]]]
+        This method calculates every node key and blind key from the leaf keys, level by level (simulation only).
+    seed_path(self, node_keys: dict[str, tuple[int, Optional[int]]]) -> None
+        This method takes my key path and co-path keys from keys calculated for the whole tree (simulation only).
+    sponsor_rekey(self, mid: int) -> None
+        This method lets a member refresh its key and recalculate its key path (simulation only).
+    simulate_join(self) -> int
+        This method adds a member and refreshes the group key; the new member ID is returned (simulation only).
+    simulate_leave(self, eid: int) -> int
+        This method removes a member and refreshes the group key; the sponsor ID is returned (simulation only).
+    clear_path_keys(self) -> None
+        This method discards the (stale) keys of the intermediate nodes and root on my key path.
+    calculate_partial_group_key(self, pending: set[str]) -> dict[str, int]
+        This method calculates my key path upward until a co-path blind key is still pending.
     build_tree(self) -> None
         This method builds the initial tree from the constructor.
     find_node(self, iden: Union[int, str], memflag: bool) -> DataNode
@@ -74,8 +141,22 @@ class BinaryTree:
         This method recalculates the names (position indices) for each node.
     find_insertion(self) -> DataNode
         This method finds the point of insertion for a joining node.
+    grow_root(self) -> tuple[DataNode, DataNode]
+        This method puts a new root above the tree and returns the sponsor and new member nodes (skinny layout).
     get_update_path(self) -> set[DataNode]
         This method determines which keys need to be updated and receives them.
+    get_cipher(self) -> GroupCipher
+        This method returns the traffic keys of the current epoch, deriving them only once per epoch.
+    key_commitment(self) -> str
+        This method returns a short commitment to my group key, bound to the epoch.
+    get_refreshed_blind_keys(self) -> dict[str, int]
+        This method returns the blind keys on my key path (except the root) by node name.
+    strip_private_keys(self) -> tuple[list[tuple[DataNode, int]], dict[str, list[int]]]
+        This method removes every private node key, the traffic-key cache and the membership delta from the tree and returns the keys and delta (to be put back).
+    restore_private_keys(self, stripped: tuple[list[tuple[DataNode, int]], dict[str, list[int]]]) -> None
+        This method puts back the node keys and membership delta removed by strip_private_keys.
+    set_blind_keys(self, bkeys: dict[str, int]) -> None
+        This method stores the received blind keys that lie on my co-path.
     empty_check(self) -> None
         This method determines if I am the only member left in the group and exits if so.
     tree_refresh(self) -> None
@@ -96,18 +177,30 @@ class BinaryTree:
 
     # constructor
     #
-    def __init__(self, size: int, uid: int) -> None:
+    def __init__(self, size: int, uid: int, verbose: bool=True, storage: Optional['MappedKeyStore']=None, layout: str='balanced') -> None:
         '''This is the constructor.'''
 
+        if layout not in ('balanced', 'str'):
+            raise ValueError(f"Unknown layout: {layout}")
+        if storage is not None and layout != 'balanced':
+            raise ValueError("A key store holds a balanced tree")
+        self.layout = layout
         self.size = size
         self.uid = uid
+        self.verbose = verbose
+        self.storage = storage
+        self.epoch = 0
+        self.cipher = None
+        self.cipher_key = None
         self.my_node = None
         self.nodetrack = 1
         self.nodemax = (2*size)-1
         self.nextmemb = size+1
-        self.height = math.floor(math.log(self.nodemax,2))
+        self.height = math.floor(math.log(self.nodemax,2)) if layout == 'balanced' else size-1
         self.root = DataNode()
         self.refresh_path = None
+        self.delta = {'joined': [], 'left': []}
+        self.stream = None
 
         # build the initial tree
         #
@@ -115,6 +208,69 @@ class BinaryTree:
     #
     # end constructor
 
+    # method: __getstate__
+    #
+    def __getstate__(self) -> dict:
+        '''This method returns the state to pickle, with the nodes flattened into a list (without the traffic-key cache and stream).'''
+
+        # pickle would follow the node references recursively (several C frames per level), which overflows
+        # the stack for a deep skinny tree: the nodes are saved in pre-order and refer to each other by index
+        #
+        nodes = list(self.walk_pre_order(self.root))
+        index = {id(node): i for i, node in enumerate(nodes)}
+        links = ('_NodeMixin__parent', '_NodeMixin__children', 'lchild', 'rchild', '_key_path', '_co_path')
+        state = dict(self.__dict__)
+        del state['root']
+
+        # the traffic keys are derived from a group key, so they stay with the member that derived them (a tree
+        # sent to a joining member would otherwise carry the keys of an epoch before the join)
+        #
+        del state['cipher']
+        del state['cipher_key']
+        del state['stream']
+        state['nodes'] = [({name: value for name, value in vars(node).items() if name not in links},
+            [index[id(child)] for child in node.children], index.get(id(node.lchild)), index.get(id(node.rchild)))
+            for node in nodes]
+        state['my_node'] = index.get(id(self.my_node))
+        if self.refresh_path is not None:
+            state['refresh_path'] = [index[id(node)] for node in self.refresh_path if id(node) in index]
+        return state
+    #
+    # end method: __getstate__
+
+    # method: __setstate__
+    #
+    def __setstate__(self, state: dict) -> None:
+        '''This method restores a pickled tree and relinks its nodes (with an empty traffic-key cache, announcing on the process stream).'''
+
+        records = state.pop('nodes')
+        nodes = []
+        for data, _, _, _ in records:
+            node = DataNode.__new__(DataNode)
+            node.__dict__.update(data)
+            node._key_path = None
+            node._co_path = None
+            nodes.append(node)
+
+        # children are attached from the bottom up: anytree checks every new parent's ancestors for a loop, and
+        # a parent not yet attached itself has none (from the top down this costs the depth of the tree per node)
+        #
+        for node, (_, children, lchild, rchild) in zip(reversed(nodes), reversed(records)):
+            node.lchild = None if lchild is None else nodes[lchild]
+            node.rchild = None if rchild is None else nodes[rchild]
+            if children:
+                node.children = [nodes[i] for i in children]
+        self.__dict__.update(state)
+        self.cipher = None
+        self.cipher_key = None
+        self.stream = None
+        self.root = nodes[0]
+        self.my_node = None if state['my_node'] is None else nodes[state['my_node']]
+        if state['refresh_path'] is not None:
+            self.refresh_path = [nodes[i] for i in state['refresh_path']]
+    #
+    # end method: __setstate__
+
     # method: add_nodes
     #
     def add_nodes(self, curr_n: DataNode) -> None:
@@ -132,7 +288,7 @@ class BinaryTree:
     def get_leaves(self) -> tuple[DataNode]:
         '''This method returns all of the leaves in the tree.'''
 
-        return self.root.leaves
+        return tuple(node for node in self.walk_pre_order(self.root) if node.is_leaf)
     #
     # end method: get_leaves
 
@@ -143,7 +299,7 @@ class BinaryTree:
 
         if not curr_n.is_leaf:
             self.walk_tree_build(curr_n.rchild)
-            if self.nodetrack is not self.nodemax:
+            if self.nodetrack != self.nodemax:
                 self.walk_tree_build(curr_n.lchild)
         else:
             self.add_nodes(curr_n)
@@ -151,15 +307,52 @@ class BinaryTree:
     #
     # end method: walk_tree_build
 
+    # method: build_skinny
+    #
+    def build_skinny(self) -> None:
+        '''This method builds the initial skinny tree (every intermediate node has a member as its right child).'''
+
+        curr_n = self.root
+        for _ in range(self.size-2):
+            self.add_nodes(curr_n)
+            curr_n = curr_n.lchild
+        self.add_nodes(curr_n)
+        self.nodetrack = self.nodemax
+    #
+    # end method: build_skinny
+
     # method: walk_pre_order
     #
-    def walk_pre_order(self, root: DataNode) -> PreOrderIter:
+    def walk_pre_order(self, root: DataNode) -> Iterator[DataNode]:
         '''This method returns the pre-order traversal of the tree.'''
 
-        return PreOrderIter(root)
+        # an explicit stack: the nested generators of anytree's iterators cost O(depth) per node in a skinny tree
+        #
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
     #
     # end method: WalkPreOrer
 
+    # method: walk_post_order
+    #
+    def walk_post_order(self, root: DataNode) -> Iterator[DataNode]:
+        '''This method returns the post-order traversal of the tree.'''
+
+        # the reverse of a pre-order walk that visits the right subtree first
+        #
+        nodes = []
+        stack = [root]
+        while stack:
+            node = stack.pop()
+            nodes.append(node)
+            stack.extend(node.children)
+        return reversed(nodes)
+    #
+    # end method: walk_post_order
+
     # method: type_assign
     #
     def type_assign(self) -> None:
@@ -175,29 +368,39 @@ class BinaryTree:
     def id_assign(self) -> None:
         '''This method assigns the 'mid' attribute for the nodes in the initial tree.'''
 
+        # the leaves of a skinny tree hold the members in order of seniority, from the bottom up
+        #
+        if self.layout == 'str':
+            mids = range(1, self.size+1)
+        else:
+            mids = BinaryTree.member_ids(self.size, self.height)
+        for node, mid in zip(self.get_leaves(), mids):
+            node.mid = mid
+    #
+    # end method: id_assign
+
+    # method: member_ids
+    #
+    @staticmethod
+    def member_ids(size: int, height: int) -> list[int]:
+        '''This method returns the member IDs of the leaves of the initial tree from left to right.'''
+
         # generate member ID lists
         #
         baselist = [1,2]
-        if self.height >= 1:
-            for i in range(0, self.height-1):
+        if height >= 1:
+            for i in range(0, height-1):
                 templist = list(reversed(range(pow(2,i+2)+1)))
                 newlist = templist[0:pow(2,i+1)]
                 baselist = list(itertools.chain(*zip(baselist, newlist)))
-        max_size = pow(2,self.height)
-        hlist = list(reversed(range(max_size+1)))
-        rm_nodes = hlist[0:max_size-self.size]
-        for num in rm_nodes:
-            baselist.remove(num)
 
-        # assign the ID numbers
+        # drop the IDs of the leaves that the tree does not have
         #
-        idlist = list(reversed(baselist))
-        count = len(baselist)-1
-        for node in self.get_leaves():
-            node.mid = idlist[count]
-            count = count-1
+        max_size = pow(2,height)
+        rm_nodes = set(range(size+1, max_size+1))
+        return [num for num in baselist if num not in rm_nodes]
     #
-    # end method: id_assign
+    # end method: member_ids
 
     # method: find_me
     #
@@ -216,22 +419,23 @@ class BinaryTree:
 
         # find the node that matches this members's unique ID
         #
-        self.my_node = search.find(self.root, me_finder)
+        self.my_node = next(filter(me_finder, self.walk_pre_order(self.root)), None)
     #
     # end method: find_me
 
     # method: key_generation
     #
+    @traced('tree.key_generation')
     def key_generation(self) -> None:
-        '''This method generates keys only for my node.'''
+        '''This method generates keys only for my node (taking a pair prepared by the key pair pool).'''
 
-        self.my_node.gen_private_key()
-        self.my_node.gen_blind_key()
+        self.my_node.key, self.my_node.b_key = get_key_pool().take()
     #
     # end method: key_generation
 
     # method: initial_calculate_group_key
     #
+    @traced('tree.initial_calculate_group_key')
     def initial_calculate_group_key(self, max_iters: int) -> None:
         '''This method calculates the group key iteratively.'''
 
@@ -239,38 +443,274 @@ class BinaryTree:
         key_path = self.my_node.get_key_path()
         co_path = self.my_node.get_co_path()
         for i, node in enumerate(co_path):
-            key_path[i+1].key = pow(int(node.b_key), key_path[i].key, DataNode.p)
+            key_path[i+1].key = DataNode.exp(int(node.b_key), key_path[i].key)
             if key_path[i+1].ntype != 'root':
                 key_path[i+1].gen_blind_key()
             iters = iters+1
             if iters > max_iters:
                 break
+        if key_path[-1].key is not None and iters == len(co_path):
+            self.announce_key()
     #
     # end method: initial_calculate_group_key
 
     # method: calculate_group_key
     #
+    @traced('tree.calculate_group_key')
     def calculate_group_key(self) -> None:
-        '''This method calculates the group key.'''
+        '''This method calculates the group key (from the lowest node of my key path that the last event changed).'''
 
+        # the keys below the first node on the refresh path are unchanged (without a refresh path, after more
+        # than one event since my last key, or for the member whose own key is new, the whole path is calculated)
+        #
         key_path = self.my_node.get_key_path()
         co_path = self.my_node.get_co_path()
-        for i, node in enumerate(co_path):
-            key_path[i+1].key = pow(int(node.b_key), key_path[i].key, DataNode.p)
+        start = 0
+        if self.refresh_path is not None and len(self.delta['joined'])+len(self.delta['left']) == 1:
+            changed = set(self.refresh_path)
+            start = next((max(i-1, 0) for i, node in enumerate(key_path) if node in changed), 0)
+        for i, node in enumerate(co_path[start:], start):
+            key_path[i+1].key = DataNode.exp(int(node.b_key), key_path[i].key)
             if key_path[i+1].ntype != 'root':
                 key_path[i+1].gen_blind_key()
+        self.announce_key()
     #
     # end method: calculate_group_key
 
+    # method: announce_key
+    #
+    def announce_key(self) -> None:
+        '''This method announces my new group key on the epoch stream, starts a new membership delta and lets the key pair pool refill.'''
+
+        # the traffic key is only derived if someone listens
+        #
+        stream = self.stream if self.stream is not None else get_stream()
+        if stream.active() and self.root.key is not None:
+            stream.publish(self.epoch, self.uid, self.get_cipher().key, self.delta)
+        self.delta = {'joined': [], 'left': []}
+
+        # the rekey is done: key pairs taken for it are made again now, not while it runs
+        #
+        get_key_pool().replenish()
+    #
+    # end method: announce_key
+
+    # method: load_storage
+    #
+    def load_storage(self) -> None:
+        '''This method materializes my key path and co-path from the key store (keeping my private key).'''
+
+        key = self.my_node.key if self.my_node is not None and self.my_node.mid == self.uid else None
+        self.root, self.my_node = self.storage.load_path(self.uid)
+        self.my_node.key = key
+        self.nextmemb = self.storage.nextmemb
+        self.epoch = self.storage.epoch
+    #
+    # end method: load_storage
+
+    # method: seed_group_key
+    #
+    @traced('tree.seed_group_key')
+    def seed_group_key(self, workers: int=1) -> None:
+        '''This method generates keys for every member and calculates every node key (simulation only).'''
+
+        # the key store seeds itself; I refresh my own key so that my key path is complete
+        #
+        if self.storage is not None:
+            self.storage.seed_group_key()
+            self.sponsor_rekey(self.uid)
+            return
+        for node in self.get_leaves():
+            node.gen_private_key()
+        self.compute_node_keys(workers)
+        self.announce_key()
+    #
+    # end method: seed_group_key
+
+    # method: compute_node_keys
+    #
+    @traced('tree.compute_node_keys')
+    def compute_node_keys(self, workers: int=1) -> dict[str, tuple[int, Optional[int]]]:
+        '''This method calculates every node key and blind key from the leaf keys, level by level (simulation only).'''
+
+        # every node is calculated once, from the deepest level up; the nodes of a level are independent, so a
+        # level is one batch for the worker pool (an internal node costs two exponentiations, a leaf one)
+        #
+        levels = {}
+        for node in self.walk_pre_order(self.root):
+            levels.setdefault(node.l, []).append(node)
+        pool = ProcessPoolExecutor(workers) if workers > 1 else None
+        try:
+            for level in sorted(levels, reverse=True):
+                nodes = levels[level]
+                tasks = [(None if node.is_leaf else int(node.rchild.b_key), node.key if node.is_leaf else node.lchild.key,
+                    DataNode.p, DataNode.g, node.ntype != 'root') for node in nodes]
+                if pool is not None:
+                    results = pool.map(compute_node, tasks, chunksize=max(1, len(tasks)//(4*workers)))
+                else:
+                    results = map(compute_node, tasks)
+                for node, (key, b_key) in zip(nodes, results):
+                    node.key = key
+                    if b_key is not None:
+                        node.b_key = b_key
+                DataNode.exps = DataNode.exps+sum((task[0] is not None)+task[4] for task in tasks)
+        finally:
+            if pool is not None:
+                pool.shutdown()
+        return {node.name: (node.key, node.b_key) for nodes in levels.values() for node in nodes}
+    #
+    # end method: compute_node_keys
+
+    # method: seed_path
+    #
+    def seed_path(self, node_keys: dict[str, tuple[int, Optional[int]]]) -> None:
+        '''This method takes my key path and co-path keys from keys calculated for the whole tree (simulation only).'''
+
+        for node in self.my_node.get_key_path():
+            node.key, b_key = node_keys[node.name]
+            if node.ntype != 'root':
+                node.b_key = b_key
+        for node in self.my_node.get_co_path():
+            node.b_key = node_keys[node.name][1]
+        self.announce_key()
+    #
+    # end method: seed_path
+
+    # method: sponsor_rekey
+    #
+    @traced('tree.sponsor_rekey')
+    def sponsor_rekey(self, mid: int) -> None:
+        '''This method lets a member refresh its key and recalculate its key path (simulation only).'''
+
+        uid, own = self.uid, self.my_node
+        self.uid = mid
+        if self.storage is not None:
+            self.load_storage()
+        else:
+            self.find_me()
+        self.key_generation()
+        self.calculate_group_key()
+        if self.storage is not None:
+            self.storage.publish(self.get_refreshed_blind_keys())
+        if mid == uid:
+            return
+
+        # I stay the member the tree was built for: with a key store, my own key path is loaded again (with my
+        # private key) and calculated from the new blind keys; a whole tree already holds every key
+        #
+        self.uid = uid
+        self.my_node = own
+        if self.storage is not None:
+            self.load_storage()
+            self.calculate_group_key()
+        else:
+            self.find_me()
+    #
+    # end method: sponsor_rekey
+
+    # method: simulate_join
+    #
+    @traced('tree.simulate_join')
+    def simulate_join(self) -> int:
+        '''This method adds a member and refreshes the group key; the new member ID is returned (simulation only).'''
+
+        if self.storage is not None:
+            mid = self.storage.join()[0]
+            self.delta['joined'].append(mid)
+        else:
+            self.join_event()
+            mid = self.nextmemb-1
+        self.sponsor_rekey(mid)
+        return mid
+    #
+    # end method: simulate_join
+
+    # method: simulate_leave
+    #
+    @traced('tree.simulate_leave')
+    def simulate_leave(self, eid: int) -> int:
+        '''This method removes a member and refreshes the group key; the sponsor ID is returned (simulation only).'''
+
+        if self.storage is not None:
+            sponsor = self.storage.leave(eid)
+            self.delta['left'].append(eid)
+            if self.uid == eid:
+                self.uid = sponsor
+            self.sponsor_rekey(sponsor)
+            return sponsor
+
+        # view the tree as a remaining member, then let the sponsor refresh its key
+        #
+        if self.uid == eid:
+            self.uid = next(node.mid for node in self.get_leaves() if node.mid != eid)
+            self.find_me()
+        self.leave_event(eid)
+        sponsor = next(node for node in self.walk_pre_order(self.root) if node.ntype == 'spon')
+        self.sponsor_rekey(sponsor.mid)
+        return sponsor.mid
+    #
+    # end method: simulate_leave
+
+    # method: clear_path_keys
+    #
+    def clear_path_keys(self) -> None:
+        '''This method discards the (stale) keys of the intermediate nodes and root on my key path.'''
+
+        for node in self.my_node.get_key_path()[1:]:
+            node.key = None
+    #
+    # end method: clear_path_keys
+
+    # method: calculate_partial_group_key
+    #
+    @traced('tree.calculate_partial_group_key')
+    def calculate_partial_group_key(self, pending: set[str]) -> dict[str, int]:
+        '''This method calculates my key path upward until a co-path blind key is still pending.'''
+
+        # my own blind key has to be published first if it is still pending
+        #
+        bkeys = {}
+        if self.my_node.name in pending:
+            bkeys[self.my_node.name] = self.my_node.b_key
+
+        # continue from the last computed node; stop at the first unknown co-path blind key
+        #
+        key_path = self.my_node.get_key_path()
+        co_path = self.my_node.get_co_path()
+        for i, node in enumerate(co_path):
+            if key_path[i+1].key is not None:
+                continue
+            if node.name in pending:
+                break
+            key_path[i+1].key = DataNode.exp(int(node.b_key), key_path[i].key)
+            if key_path[i+1].ntype != 'root':
+                key_path[i+1].gen_blind_key()
+                bkeys[key_path[i+1].name] = key_path[i+1].b_key
+            else:
+                self.announce_key()
+        return bkeys
+    #
+    # end method: calculate_partial_group_key
+
     # method: build_tree
     #
     def build_tree(self) -> None:
         '''This method builds the initial tree from the constructor.'''
 
+        # with a key store, only my key path and co-path are materialized
+        #
+        if self.storage is not None:
+            self.load_storage()
+            self.key_generation()
+            return
+
         # recursively build the tree
         #
-        print(f"\nMEM {self.uid}: Generating Tree with {str(self.size).rjust(2)} members ...")
-        while self.nodetrack is not self.nodemax:
+        if self.verbose:
+            print(f"\nMEM {self.uid}: Generating Tree with {str(self.size).rjust(2)} members ...")
+        if self.layout == 'str':
+            self.build_skinny()
+        while self.nodetrack != self.nodemax:
             self.walk_tree_build(self.root)
 
         # set node attributes
@@ -286,8 +726,9 @@ class BinaryTree:
 
         # view the tree
         #
-        self.tree_export()
-        self.tree_print()
+        if self.verbose:
+            self.tree_export()
+            self.tree_print()
     #
     # end method: build_tree
 
@@ -319,9 +760,9 @@ class BinaryTree:
         # find a specific node by member number or index
         #
         if memflag:
-            return search.find(self.root, mem_finder)
+            return next(filter(mem_finder, self.walk_pre_order(self.root)), None)
         else:
-            return search.find(self.root, node_finder)
+            return next(filter(node_finder, self.walk_pre_order(self.root)), None)
     #
     # end method: find_node
 
@@ -357,6 +798,38 @@ class BinaryTree:
     #
     # end method: find_insertion
 
+    # method: grow_root
+    #
+    def grow_root(self) -> tuple[DataNode, DataNode]:
+        '''This method puts a new root above the tree and returns the sponsor and new member nodes (skinny layout).'''
+
+        # the old root becomes the left child of the new root, the new member its right child
+        #
+        old_root = self.root
+        self.root = DataNode()
+        old_root.pos = 'left'
+        old_root.ntype = 'inter'
+        old_root.parent = self.root
+        self.root.lchild = old_root
+        self.root.rchild = DataNode(pos='right', l=1, v=1, parent=self.root, ntype='inter')
+
+        # the old group key is now an intermediate key: the old members combine it with the new member's blind
+        # key, while the new member only needs its blind key (a tree sent to it holds no private keys, see
+        # strip_private_keys)
+        #
+        if old_root.key is not None:
+            old_root.gen_blind_key()
+
+        # the topmost old member sponsors the join
+        #
+        sponsor_node = old_root
+        while not sponsor_node.is_leaf:
+            sponsor_node = sponsor_node.rchild
+        sponsor_node.sponsor_assign(join=False)
+        return sponsor_node, self.root.rchild
+    #
+    # end method: grow_root
+
     # method: get_update_path
     #
     def get_update_path(self) -> set[DataNode]:
@@ -369,6 +842,89 @@ class BinaryTree:
     #
     # end method: get_update_path
 
+    # method: get_cipher
+    #
+    def get_cipher(self) -> GroupCipher:
+        '''This method returns the traffic keys of the current epoch, deriving them only once per epoch.'''
+
+        if self.root.key is None:
+            raise ValueError("The group key has not been calculated yet")
+        if self.cipher is None or self.cipher.epoch != self.epoch or self.cipher_key != self.root.key:
+            key_size = (DataNode.p.bit_length()+7)//8
+            self.cipher = GroupCipher.derive(self.root.key, self.epoch, key_size)
+            self.cipher_key = self.root.key
+        return self.cipher
+    #
+    # end method: get_cipher
+
+    # method: key_commitment
+    #
+    def key_commitment(self) -> str:
+        '''This method returns a short commitment to my group key, bound to the epoch.'''
+
+        # members that agree on the epoch and the group key publish the same commitment; the key itself
+        # cannot be recovered from it
+        #
+        key_size = (DataNode.p.bit_length()+7)//8
+        key = self.root.key.to_bytes(key_size, 'big') if self.root.key is not None else b''
+        digest = hashlib.sha256(b'tgdhstruct commitment' + self.epoch.to_bytes(8, 'big') + key)
+        return digest.hexdigest()[:32]
+    #
+    # end method: key_commitment
+
+    # method: get_refreshed_blind_keys
+    #
+    def get_refreshed_blind_keys(self) -> dict[str, int]:
+        '''This method returns the blind keys on my key path (except the root) by node name.'''
+
+        return {node.name: node.b_key for node in self.my_node.get_key_path() if node.ntype != 'root'}
+    #
+    # end method: get_refreshed_blind_keys
+
+    # method: strip_private_keys
+    #
+    def strip_private_keys(self) -> tuple[list[tuple[DataNode, int]], dict[str, list[int]]]:
+        '''This method removes every private node key, the traffic-key cache and the membership delta from the tree and returns the keys and delta (to be put back).'''
+
+        # a tree handed to a joining member must not hold my key or any key on my path (in a skinny tree the
+        # old group key), or the new member could read the keys of epochs before it joined; the traffic keys of
+        # the old group key go too (they are derived again for the next group key), and so does the record of
+        # who joined and left before the new member
+        #
+        keys = [(node, node.key) for node in self.walk_pre_order(self.root) if node.key is not None]
+        for node, _ in keys:
+            node.key = None
+        self.cipher = None
+        self.cipher_key = None
+        delta = self.delta
+        self.delta = {'joined': [], 'left': []}
+        return keys, delta
+    #
+    # end method: strip_private_keys
+
+    # method: restore_private_keys
+    #
+    def restore_private_keys(self, stripped: tuple[list[tuple[DataNode, int]], dict[str, list[int]]]) -> None:
+        '''This method puts back the node keys and membership delta removed by strip_private_keys.'''
+
+        keys, delta = stripped
+        for node, key in keys:
+            node.key = key
+        self.delta = delta
+    #
+    # end method: restore_private_keys
+
+    # method: set_blind_keys
+    #
+    def set_blind_keys(self, bkeys: dict[str, int]) -> None:
+        '''This method stores the received blind keys that lie on my co-path.'''
+
+        for node in self.my_node.get_co_path():
+            if node.name in bkeys:
+                node.b_key = int(bkeys[node.name])
+    #
+    # end method: set_blind_keys
+
     # method: empty_check
     #
     def empty_check(self) -> None:
@@ -382,52 +938,71 @@ class BinaryTree:
 
     # method: tree_refresh
     #
+    @traced('tree.tree_refresh')
     def tree_refresh(self) -> None:
         '''This method refreshes tree attributes and keys after an event.'''
 
         self.find_me()
         self.recalculate_names()
-        self.tree_export()
-        if self.my_node.ntype == 'spon':
-            print(f"MEM {self.uid}: I am the sponsor!")
-            print(f"MEM {self.uid}: Entering sponsor protocol ...")
+        self.epoch = self.epoch+1
+        if self.verbose:
+            self.tree_export()
+            if self.my_node.ntype == 'spon':
+                print(f"MEM {self.uid}: I am the sponsor!")
+                print(f"MEM {self.uid}: Entering sponsor protocol ...")
     #
     # end method: tree_refresh
 
     # method: join_event
     #
+    @traced('tree.join_event')
     def join_event(self) -> None:
         '''This method updates the tree when a new member joins the group.'''
 
+        # the key store holds the group's tree once; its events are applied by simulate_join/simulate_leave
+        #
+        if self.storage is not None:
+            raise TypeError("With a key store, events are applied with simulate_join and simulate_leave")
+
         # signal that a member is joining
         #
-        print(f"\nMEM {self.uid}: New member is joining the group!")
+        if self.verbose:
+            print(f"\nMEM {self.uid}: New member is joining the group!")
 
         # prepare the tree by assigning types
         #
         self.type_assign()
 
-        # create two new nodes at the insertion node
+        # a skinny tree grows at the top
         #
-        inserti_node = self.find_insertion()
-        self.add_nodes(inserti_node)
-        sponsor_node = inserti_node.lchild
-        newmemb_node = inserti_node.rchild
-        self.refresh_path = newmemb_node.get_key_path()
-
-        # transfer data to the sponsor node (the insertion node data is transferred to sponsor node)
-        #
-        sponsor_node.sponsor_assign(
-            mid=inserti_node.mid, key=inserti_node.key,
-            b_key=inserti_node.b_key, join=True)
-
-        # assign attributes for new intermediate node and new member node
+        if self.layout == 'str':
+            sponsor_node, newmemb_node = self.grow_root()
+        else:
+            # create two new nodes at the insertion node
+            #
+            inserti_node = self.find_insertion()
+            self.add_nodes(inserti_node)
+            sponsor_node = inserti_node.lchild
+            newmemb_node = inserti_node.rchild
+
+            # transfer data to the sponsor node (the insertion node data is transferred to sponsor node)
+            #
+            sponsor_node.sponsor_assign(
+                mid=inserti_node.mid, key=inserti_node.key,
+                b_key=inserti_node.b_key, join=True)
+
+            # assign attributes for new intermediate node
+            #
+            inserti_node.insertion_assign()
+
+        # assign attributes for the new member node
         #
-        inserti_node.insertion_assign()
         newmemb_node.new_memb_assign(self.nextmemb)
+        self.refresh_path = newmemb_node.get_key_path()
 
         # signal that a new member has been added
         #
+        self.delta['joined'].append(self.nextmemb)
         self.nextmemb = self.nextmemb+1
 
         # refresh the tree
@@ -438,16 +1013,24 @@ class BinaryTree:
 
     # method: leave_event
     #
+    @traced('tree.leave_event')
     def leave_event(self, eid: int) -> None:
         '''This method updates the tree when a member leaves the tree'''
 
+        # the key store holds the group's tree once; its events are applied by simulate_join/simulate_leave
+        #
+        if self.storage is not None:
+            raise TypeError("With a key store, events are applied with simulate_join and simulate_leave")
+
         # signal that a member is leaving
         #
-        print(f"\nMEM {self.uid}: Member {str(eid)} is leaving the group!")
+        if self.verbose:
+            print(f"\nMEM {self.uid}: Member {str(eid)} is leaving the group!")
 
         # determine if the tree is empty
         #
         self.empty_check()
+        self.delta['left'].append(eid)
 
         # prepare the tree by assigning types
         #
@@ -466,7 +1049,6 @@ class BinaryTree:
                     sponsor_node = list(self.walk_pre_order(self.root))[-1]
                     sponsor_node.sponsor_assign(join=False)
                     del node
-                    gc.collect()
 
                 else:
                     # assign the sponsor and transfer data
@@ -475,7 +1057,6 @@ class BinaryTree:
                     sponsor_node.sponsor_assign(join=False)
                     node.parent.transfer_data_remove(node.get_sibling())
                     del node
-                    gc.collect()
 
         # determine the keys that need to be refreshed
         #
@@ -489,6 +1070,7 @@ class BinaryTree:
 
     # method: new_member_protocol
     #
+    @traced('tree.new_member_protocol')
     def new_member_protocol(self) -> None:
         '''This method is used by the new member when joining the group.'''
 
@@ -503,13 +1085,15 @@ class BinaryTree:
 
         # print the tree
         #
-        self.tree_export()
-        self.tree_print()
+        if self.verbose:
+            self.tree_export()
+            self.tree_print()
     #
     # end method: new_member_protocol
 
     # method: tree_export
     #
+    @traced('tree.tree_export')
     def tree_export(self) -> None:
         '''This method exports the tree as a png file using Graphviz.'''
 
@@ -527,8 +1111,9 @@ class BinaryTree:
         #
         # end function: nodeattrfunc
 
-        # use graphics module to export the tree
+        # use graphics module to export the tree (imported here: the exporter is only needed for rendering)
         #
+        from anytree.exporter import DotExporter
         DotExporter(self.root, nodeattrfunc=nodeattrfunc).to_picture("tree_export.png")
     #
     # end method: tree_export
@@ -540,10 +1125,17 @@ class BinaryTree:
 
         print(f"\nMEM {self.uid}: Displaying the tree and key information ...")
         print('')
-        for pre, _, node in RenderTree(self.root):
+        # drawn like anytree's RenderTree, from an explicit stack (skinny trees are too deep for its recursion)
+        #
+        stack = [(self.root, '', '')]
+        while stack:
+            node, pre, fill = stack.pop()
             treestr = f'{pre}{node.name}'
             datastr = f'type: {node.ntype}, ID: {node.mid}, key: {node.key}, b_key: {node.b_key}'
             print(treestr.ljust(8), datastr)
+            last = len(node.children)-1
+            for i, child in reversed(list(enumerate(node.children))):
+                stack.append((child, fill+('└── ' if i == last else '├── '), fill+('    ' if i == last else '│   ')))
     #
     # end method: tree_print
 
@@ -0,0 +1,163 @@
+# file: connection_manager.py
+#
+'''This file contains the ConnectionManager class.'''
+
+# import modules
+#
+from typing import Any, Callable
+from osbrain import Proxy, AgentAddress
+from tgdhstruct.tracing import get_tracer
+
+# class: ConnectionManager
+#
+class ConnectionManager:
+    '''
+    Description
+    -----------
+    This class keeps the publisher and subscriber sockets of the member agents alive across rounds and events.
+    Each member binds its publisher once and connects to another member at most once; between rounds only
+    the topic filters (node names) of the subscriber sockets are changed.
+
+    Attributes
+    ----------
+    agents : dict[int, Proxy]
+        The agents managed by the connection manager (shared with the owner)
+    addr : dict[int, AgentAddress]
+        The address of the publisher of each member
+    topics : dict[int, dict[int, set[str]]]
+        The topics each member is currently subscribed to, keyed by publisher
+    connected : set[int]
+        The publishers that gained a subscriber socket since their last message
+    settle : float
+        The seconds a publisher waits for new subscriber sockets before sending (messages sent to a socket that
+        is still connecting are dropped)
+
+    Methods
+    -------
+    publisher(self, mid: int) -> AgentAddress
+        This method returns the publisher address of a member and binds it on first use.
+    subscribe(self, mid: int, pub_id: int, topic: str, handler: Callable) -> None
+        This method subscribes a member to a topic of another member's publisher.
+    clear_topics(self) -> None
+        This method unsubscribes all members from all topics while keeping the sockets open.
+    ready(self, mid: int) -> str
+        This method returns the alias of a member's publisher once new subscribers had time to connect.
+    publish(self, mid: int, topic: str, message: Any) -> None
+        This method publishes a message on a topic of a member's publisher.
+    remove_member(self, mid: int) -> None
+        This method forgets a departed member and closes the sockets connected to it.
+    close(self) -> None
+        This method closes all sockets of all agents.
+    '''
+
+    # constructor
+    #
+    def __init__(self, agents: dict[int, Proxy], settle: float=0.2) -> None:
+        '''This is the constructor.'''
+
+        self.agents = agents
+        self.addr = {}
+        self.topics = {}
+        self.connected = set()
+        self.settle = settle
+    #
+    # end constructor
+
+    # method: publisher
+    #
+    def publisher(self, mid: int) -> AgentAddress:
+        '''This method returns the publisher address of a member and binds it on first use.'''
+
+        if mid not in self.addr:
+            self.addr[mid] = self.agents[mid].bind('PUB', alias=f'mem_{mid}')
+        return self.addr[mid]
+    #
+    # end method: publisher
+
+    # method: subscribe
+    #
+    def subscribe(self, mid: int, pub_id: int, topic: str, handler: Callable) -> None:
+        '''This method subscribes a member to a topic of another member's publisher.'''
+
+        subs = self.topics.setdefault(mid, {})
+        if pub_id not in subs:
+            # first contact between the two members: connect the subscriber socket
+            #
+            self.agents[mid].connect(self.publisher(pub_id), alias=f'sub_{pub_id}', handler={topic: handler})
+            subs[pub_id] = {topic}
+            self.connected.add(pub_id)
+        elif topic not in subs[pub_id]:
+            # the socket already exists: only the topic filter changes
+            #
+            self.agents[mid].subscribe(f'sub_{pub_id}', {topic: handler})
+            subs[pub_id].add(topic)
+    #
+    # end method: subscribe
+
+    # method: clear_topics
+    #
+    def clear_topics(self) -> None:
+        '''This method unsubscribes all members from all topics while keeping the sockets open.'''
+
+        for mid, subs in self.topics.items():
+            for pub_id, topics in subs.items():
+                if topics:
+                    self.agents[mid].unsubscribe(f'sub_{pub_id}', list(topics))
+                    topics.clear()
+    #
+    # end method: clear_topics
+
+    # method: ready
+    #
+    def ready(self, mid: int) -> str:
+        '''This method returns the alias of a member's publisher once new subscribers had time to connect.'''
+
+        # let first-contact subscribers finish connecting, or they miss the message
+        #
+        self.publisher(mid)
+        if mid in self.connected:
+            get_tracer().sleep(self.settle)
+            self.connected.clear()
+        return f'mem_{mid}'
+    #
+    # end method: ready
+
+    # method: publish
+    #
+    def publish(self, mid: int, topic: str, message: Any) -> None:
+        '''This method publishes a message on a topic of a member's publisher.'''
+
+        self.agents[mid].send(self.ready(mid), message, topic=topic)
+    #
+    # end method: publish
+
+    # method: remove_member
+    #
+    def remove_member(self, mid: int) -> None:
+        '''This method forgets a departed member and closes the sockets connected to it.'''
+
+        self.addr.pop(mid, None)
+        self.topics.pop(mid, None)
+        self.connected.discard(mid)
+        for key, subs in self.topics.items():
+            if mid in subs:
+                self.agents[key].close(f'sub_{mid}')
+                del subs[mid]
+    #
+    # end method: remove_member
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method closes all sockets of all agents.'''
+
+        for agent in self.agents.values():
+            agent.close_all()
+        self.addr = {}
+        self.topics = {}
+    #
+    # end method: close
+#
+# end class: ConnectionManager
+#
+# end file: connection_manager.py
@@ -5,10 +5,9 @@
 # import modules
 #
 from __future__ import annotations
-import gc
 from typing import Optional
 from anytree import NodeMixin
-from Crypto.Random.random import randint
+from tgdhstruct.random_pool import get_pool
 
 # class: DataNode
 #
@@ -16,7 +15,7 @@ class DataNode(NodeMixin):
     '''
     Description
     -----------
-    This is the node class for use in the binary tree structure.
+    This is the node class for use in the binary (or n-ary) tree structure.
 
     Global Data
     -----------
@@ -24,6 +23,8 @@ class DataNode(NodeMixin):
         The generator for Diffie-Hellman algorithm
     int: p
         The modulus for Diffie-Hellman algorithm
+    int: exps
+        The number of modular exponentiations performed in this process
 
     Attributes
     ----------
@@ -49,6 +50,12 @@ class DataNode(NodeMixin):
         The private key of the node
     b_key: int
         The blind (public) key of the node
+    x_key: int
+        The second-round (Burmester-Desmedt) value of the node below a parent with more than two children
+    _key_path : list[DataNode]
+        The cached key path of the node (None until requested or after a structural change)
+    _co_path : list[DataNode]
+        The cached co-path of the node (None until requested or after a structural change)
 
     Methods
     -------
@@ -57,13 +64,23 @@ class DataNode(NodeMixin):
      calculate_name(self) -> None
         This method determines the name of a node based on the name of its parent.
     gen_private_key(self) -> None
-        This method generates a random private key.
+        This method generates a random private key in [1, p-2].
     gen_blind_key(self) -> None
         This method generates the blind key.
+    exp(base: int, exponent: int) -> int
+        This method raises a base to a private key modulo p and counts the exponentiation.
     get_key_path(self) -> list[DataNode]
         This method gets the path from the current node up to the root.
      get_co_path(self) -> list[DataNode]
         This method gets the co-path from the current node up to the root.
+    fill_paths(self) -> None
+        This method caches the key path and co-path of the node and of its ancestors.
+    invalidate_paths(self) -> None
+        This method drops the cached paths of the node and of all its descendants.
+    height(self) -> int
+        This property returns the number of edges on the longest path down to a leaf.
+    leaves(self) -> tuple[DataNode]
+        This property returns the leaves below the node, from left to right.
     sponsor_assign(self, mid: Optional[int]=None, key: Optional[int]=None, b_key: Optional[int]=None, join: bool=True) -> None
         This method tags a node as the sponsor node.
     insertion_assign(self) -> None
@@ -82,12 +99,18 @@ class DataNode(NodeMixin):
     #
     g = 5
     p = 23
+    exps = 0
 
     # constructor
     #
     def __init__(self, pos: str='NA', l: int=0, v: int=0, parent: Optional[DataNode]=None, ntype: str='root', mid: Optional[int]=None, rchild: Optional[DataNode]=None, lchild: Optional[DataNode]=None) -> None:
         '''This is the constructor.'''
 
+        # cached paths (must exist before the node is attached to its parent)
+        #
+        self._key_path = None
+        self._co_path = None
+
         # tree data
         #
         self.pos = pos
@@ -104,6 +127,7 @@ class DataNode(NodeMixin):
         #
         self.key = None
         self.b_key = None
+        self.x_key = None
     #
     # end constructor
 
@@ -137,9 +161,9 @@ class DataNode(NodeMixin):
     # method: gen_private_key
     #
     def gen_private_key(self) -> None:
-        '''This method generates a random private key.'''
+        '''This method generates a random private key in [1, p-2] (drawn from the random pool of this process).'''
 
-        self.key = randint(1, int(DataNode.p-1))
+        self.key = get_pool().randint(1, int(DataNode.p-2))
     #
     # end method: gen_private_key
 
@@ -148,28 +172,139 @@ class DataNode(NodeMixin):
     def gen_blind_key(self) -> None:
         '''This method generates the blind key.'''
 
-        self.b_key = pow(DataNode.g, self.key, DataNode.p)
+        self.b_key = DataNode.exp(DataNode.g, self.key)
     #
     # end method: gen_blind_key
 
+    # method: exp
+    #
+    @staticmethod
+    def exp(base: int, exponent: int) -> int:
+        '''This method raises a base to a private key modulo p and counts the exponentiation.'''
+
+        DataNode.exps = DataNode.exps+1
+        return pow(base, exponent, DataNode.p)
+    #
+    # end method: exp
+
     # method: get_key_path
     #
     def get_key_path(self) -> list[DataNode]:
-        '''This method gets the path from the current node up to the root.'''
+        '''This method gets the path from the current node up to the root (the cached list must not be modified).'''
 
-        return(list(reversed(self.path)))
+        if self._key_path is None:
+            self.fill_paths()
+        return self._key_path
     #
     # end method: get_key_path
 
     # method: get_co_path
     #
     def get_co_path(self) -> list[DataNode]:
-        '''This method gets the co-path from the current node up to the root.'''
+        '''This method gets the co-path from the current node up to the root (the cached list must not be modified).'''
 
-        return [node.get_sibling() for node in self.get_key_path() if node.ntype != 'root']
+        if self._co_path is None:
+            self.fill_paths()
+        return self._co_path
     #
     # end method: get_co_path
 
+    # method: fill_paths
+    #
+    def fill_paths(self) -> None:
+        '''This method caches the key path and co-path of the node and of its ancestors.'''
+
+        # walk up to the nearest cached ancestor, then fill downward (no recursion: skinny trees are deep)
+        #
+        uncached = []
+        node = self
+        while node is not None and node._key_path is None:
+            uncached.append(node)
+            node = node.parent
+        for node in reversed(uncached):
+            if node.parent is None:
+                node._key_path = [node]
+                node._co_path = []
+            else:
+                node._key_path = [node] + node.parent._key_path
+                node._co_path = list(node.siblings) + node.parent._co_path
+    #
+    # end method: fill_paths
+
+    # method: invalidate_paths
+    #
+    def invalidate_paths(self) -> None:
+        '''This method drops the cached paths of the node and of all its descendants.'''
+
+        # a node is only cached if its parent is cached, so uncached subtrees are skipped
+        #
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node._key_path is None:
+                continue
+            node._key_path = None
+            node._co_path = None
+            stack.extend(node.children)
+    #
+    # end method: invalidate_paths
+
+    # method: height
+    #
+    @property
+    def height(self) -> int:
+        '''This property returns the number of edges on the longest path down to a leaf.'''
+
+        # anytree recurses once per level, which a skinny tree exceeds
+        #
+        height = 0
+        stack = [(self, 0)]
+        while stack:
+            node, depth = stack.pop()
+            height = max(height, depth)
+            stack.extend((child, depth+1) for child in node.children)
+        return height
+    #
+    # end method: height
+
+    # method: leaves
+    #
+    @property
+    def leaves(self) -> tuple[DataNode]:
+        '''This property returns the leaves below the node, from left to right.'''
+
+        leaves = []
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            if node.is_leaf:
+                leaves.append(node)
+            stack.extend(reversed(node.children))
+        return tuple(leaves)
+    #
+    # end method: leaves
+
+    # method: _post_attach
+    #
+    def _post_attach(self, parent: DataNode) -> None:
+        '''This hook invalidates the paths below a parent that gained a child.'''
+
+        for child in parent.children:
+            child.invalidate_paths()
+    #
+    # end method: _post_attach
+
+    # method: _post_detach
+    #
+    def _post_detach(self, parent: DataNode) -> None:
+        '''This hook invalidates the paths of a detached subtree and below the parent that lost it.'''
+
+        self.invalidate_paths()
+        for child in parent.children:
+            child.invalidate_paths()
+    #
+    # end method: _post_detach
+
     # method: sponsor_assign
     #
     def sponsor_assign(self, mid: Optional[int]=None, key: Optional[int]=None, b_key: Optional[int]=None, join: bool=True) -> None:
@@ -218,7 +353,6 @@ class DataNode(NodeMixin):
         self.key = node.key
         self.b_key = node.b_key
         del node
-        gc.collect()
     #
     # end method: transfer_data_remove
 
@@ -0,0 +1,239 @@
+# file: epoch_stream.py
+#
+'''This file contains the EpochStream class and the per-process stream trees announce their group keys to.'''
+
+# import modules
+#
+import queue
+import logging
+import threading
+from typing import AsyncIterator, Callable, Iterator, Optional
+
+# define the type of an update: (epoch, member ID, derived key, membership delta)
+#
+Update = tuple[int, int, bytes, dict[str, list[int]]]
+
+# the log of failing callbacks
+#
+logger = logging.getLogger(__name__)
+
+# class: EpochStream
+#
+class EpochStream:
+    '''
+    Description
+    -----------
+    This class pushes group-key updates to the application as they happen. Every time a member finishes
+    calculating the group key, its tree announces (epoch, member ID, derived key, membership delta): the derived
+    key is the epoch's traffic key (see GroupCipher.derive), never the group key itself, and the membership delta
+    lists the members that joined and left since the member's previous key ({'joined': [...], 'left': [...]},
+    empty for the initial group).
+
+    Updates are delivered to callbacks (called in the announcing thread; an exception raised by a callback is
+    logged and does not reach the other subscribers or the announcing tree), to blocking iterators and to async
+    iterators (each with its own unbounded queue, registered when the iteration starts). Nothing is derived or
+    queued while there are no subscribers.
+    The stream belongs to the process that calculates the keys: a GroupManager or a simulated tree, and the
+    MemberAgent controller, which republishes the updates its member agents return with their key calculations
+    (the members of a ShardedMemberAgent announce in their worker processes).
+
+    Attributes
+    ----------
+    callbacks : list[tuple[Callable, Optional[int]]]
+        The subscribed callbacks (with the member they are limited to)
+    queues : list[tuple[queue.Queue, Optional[int]]]
+        The queues of the blocking iterators
+    async_queues : list[tuple[AbstractEventLoop, asyncio.Queue, Optional[int]]]
+        The event loops and queues of the async iterators
+    lock : threading.Lock
+        The lock guarding the subscriber lists
+
+    Methods
+    -------
+    active(self) -> bool
+        This method determines if anyone is subscribed.
+    subscribe(self, callback: Callable[[int, int, bytes, dict], None], member: Optional[int]=None) -> Callable[[], None]
+        This method calls <callback> with every update (of one member if given) and returns the unsubscriber.
+    publish(self, epoch: int, member_id: int, derived_key: bytes, delta: dict[str, list[int]]) -> None
+        This method delivers an update to all subscribers.
+    updates(self, member: Optional[int]=None, timeout: Optional[float]=None) -> Iterator[Update]
+        This method returns a blocking iterator over the updates from its first next() on.
+    aupdates(self, member: Optional[int]=None) -> AsyncIterator[Update]
+        This method returns an async iterator over the updates from its first anext() on (iterate it inside the event loop).
+    close(self) -> None
+        This method ends all iterators.
+    '''
+
+    # constructor
+    #
+    def __init__(self) -> None:
+        '''This is the constructor.'''
+
+        self.callbacks = []
+        self.queues = []
+        self.async_queues = []
+        self.lock = threading.Lock()
+    #
+    # end constructor
+
+    # method: active
+    #
+    def active(self) -> bool:
+        '''This method determines if anyone is subscribed.'''
+
+        return bool(self.callbacks or self.queues or self.async_queues)
+    #
+    # end method: active
+
+    # method: subscribe
+    #
+    def subscribe(self, callback: Callable[[int, int, bytes, dict], None], member: Optional[int]=None) -> Callable[[], None]:
+        '''This method calls <callback> with every update (of one member if given) and returns the unsubscriber.'''
+
+        entry = (callback, member)
+        with self.lock:
+            self.callbacks.append(entry)
+
+        # function: unsubscribe
+        #
+        def unsubscribe() -> None:
+            '''This helper function removes the callback.'''
+
+            with self.lock:
+                if entry in self.callbacks:
+                    self.callbacks.remove(entry)
+        #
+        # end function: unsubscribe
+
+        return unsubscribe
+    #
+    # end method: subscribe
+
+    # method: publish
+    #
+    def publish(self, epoch: int, member_id: int, derived_key: bytes, delta: dict[str, list[int]]) -> None:
+        '''This method delivers an update to all subscribers.'''
+
+        update = (epoch, member_id, derived_key, delta)
+        with self.lock:
+            callbacks = list(self.callbacks)
+            queues = list(self.queues)
+            async_queues = list(self.async_queues)
+        for callback, member in callbacks:
+            if member is None or member == member_id:
+                try:
+                    callback(*update)
+                except Exception:
+                    logger.exception("Epoch stream callback %r failed on epoch %d of member %d", callback, epoch, member_id)
+        for q, member in queues:
+            if member is None or member == member_id:
+                q.put(update)
+        for loop, q, member in async_queues:
+            if member is None or member == member_id:
+                loop.call_soon_threadsafe(q.put_nowait, update)
+    #
+    # end method: publish
+
+    # method: updates
+    #
+    def updates(self, member: Optional[int]=None, timeout: Optional[float]=None) -> Iterator[Update]:
+        '''This method returns a blocking iterator over the updates from its first next() on.'''
+
+        # function: drain
+        #
+        def drain() -> Iterator[Update]:
+            '''This helper function yields the queued updates until the stream closes (or a timeout passes).'''
+
+            # the queue is registered when the iteration starts: an iterator that is never started holds no
+            # queue and does not keep the stream active
+            #
+            entry = (queue.Queue(), member)
+            with self.lock:
+                self.queues.append(entry)
+            try:
+                while True:
+                    try:
+                        update = entry[0].get(timeout=timeout)
+                    except queue.Empty:
+                        return
+                    if update is None:
+                        return
+                    yield update
+            finally:
+                with self.lock:
+                    if entry in self.queues:
+                        self.queues.remove(entry)
+        #
+        # end function: drain
+
+        return drain()
+    #
+    # end method: updates
+
+    # method: aupdates
+    #
+    def aupdates(self, member: Optional[int]=None) -> AsyncIterator[Update]:
+        '''This method returns an async iterator over the updates from its first anext() on (iterate it inside the event loop).'''
+
+        # asyncio is only imported by applications that use it
+        #
+        import asyncio
+
+        # function: drain
+        #
+        async def drain() -> AsyncIterator[Update]:
+            '''This helper function yields the queued updates until the stream closes.'''
+
+            # registered when the iteration starts, like the queue of a blocking iterator
+            #
+            entry = (asyncio.get_running_loop(), asyncio.Queue(), member)
+            with self.lock:
+                self.async_queues.append(entry)
+            try:
+                while True:
+                    update = await entry[1].get()
+                    if update is None:
+                        return
+                    yield update
+            finally:
+                with self.lock:
+                    if entry in self.async_queues:
+                        self.async_queues.remove(entry)
+        #
+        # end function: drain
+
+        return drain()
+    #
+    # end method: aupdates
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method ends all iterators.'''
+
+        with self.lock:
+            queues = list(self.queues)
+            async_queues = list(self.async_queues)
+        for q, _ in queues:
+            q.put(None)
+        for loop, q, _ in async_queues:
+            loop.call_soon_threadsafe(q.put_nowait, None)
+    #
+    # end method: close
+#
+# end class: EpochStream
+
+# the stream of this process
+#
+_stream = EpochStream()
+
+# function: get_stream
+#
+def get_stream() -> EpochStream:
+    '''This function returns the epoch stream of this process.'''
+
+    return _stream
+#
+# end function: get_stream
+#
+# end file: epoch_stream.py
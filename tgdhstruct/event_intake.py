@@ -0,0 +1,259 @@
+# file: event_intake.py
+#
+'''This file contains the EventIntake class.'''
+
+# import modules
+#
+import time
+from typing import Optional, TYPE_CHECKING
+if TYPE_CHECKING:
+    from tgdhstruct.member_agent import MemberAgent
+    from tgdhstruct.event_scheduler import EventScheduler
+
+# class: EventIntake
+#
+class EventIntake:
+    '''
+    Description
+    -----------
+    This class collects membership events of a MemberAgent group over a coalescing window and rekeys once per
+    window instead of once per event. The window closes when no event arrived for <window> seconds, or at the
+    latest <max_delay> seconds after its first event.
+
+    Coalescing: a leave followed by a rejoin of the same member cancels out (the member keeps its leaf and its
+    key), repeated leaves collapse into one, and leaves of members not in the group are dropped. The remaining
+    leaves are applied before the joins, so joiners fill the positions the leaves freed, and all sponsors then
+    compute one refresh together (see EventScheduler.refresh).
+
+    Attributes
+    ----------
+    group : MemberAgent
+        The group the events are applied to
+    scheduler : EventScheduler
+        The scheduler whose concurrent refresh is used once per window
+    window : float
+        The quiet time (seconds) that closes a window
+    max_delay : float
+        The maximum time (seconds) an event waits before its window closes
+    leaves : dict[int, int]
+        The pending leaves by member ID (with the number of times each was requested)
+    joins : list[Optional[int]]
+        The pending joins (the member ID of a returning member, or None)
+    first : float
+        The arrival time of the first pending event
+    last : float
+        The arrival time of the last pending event
+    received : int
+        The number of events received
+    cancelled : int
+        The number of events cancelled or merged by coalescing
+    dropped : int
+        The number of leaves dropped because the member was not in the group
+    refreshes : int
+        The number of refreshes run
+
+    Methods
+    -------
+    submit_join(self, member: Optional[int]=None) -> None
+        This method queues a join (of a returning member if its old member ID is given).
+    submit_leave(self, eid: int) -> None
+        This method queues a leave.
+    arrive(self) -> None
+        This method records the arrival of an event.
+    pending(self) -> int
+        This method returns the number of events still to be applied.
+    due(self, now: Optional[float]=None) -> bool
+        This method determines if the current window has closed.
+    poll(self, now: Optional[float]=None) -> bool
+        This method flushes the window if it has closed and reports whether it did.
+    wait(self) -> None
+        This method sleeps until the current window closes and then flushes it.
+    flush(self) -> list[int]
+        This method applies the coalesced events with one refresh and returns the IDs of the new members.
+    rekeys_saved(self) -> int
+        This method returns the number of rekeys avoided compared to one rekey per event.
+    '''
+
+    # constructor
+    #
+    def __init__(self, group: 'MemberAgent', window: float=1.0, max_delay: float=5.0, workers: int=4,
+        scheduler: Optional['EventScheduler']=None) -> None:
+        '''This is the constructor (a scheduler with <workers> threads is created unless one is given).'''
+
+        if scheduler is None:
+            from tgdhstruct.event_scheduler import EventScheduler
+            scheduler = EventScheduler(group, workers)
+        self.group = group
+        self.scheduler = scheduler
+        self.window = window
+        self.max_delay = max_delay
+        self.leaves = {}
+        self.joins = []
+        self.first = None
+        self.last = None
+        self.received = 0
+        self.cancelled = 0
+        self.dropped = 0
+        self.refreshes = 0
+    #
+    # end constructor
+
+    # method: submit_join
+    #
+    def submit_join(self, member: Optional[int]=None) -> None:
+        '''This method queues a join (of a returning member if its old member ID is given).'''
+
+        self.arrive()
+        if member is not None and member in self.leaves:
+            # the member comes back before its leave was applied: both events cancel out
+            #
+            self.leaves[member] = self.leaves[member]-1
+            if self.leaves[member] == 0:
+                del self.leaves[member]
+            self.cancelled = self.cancelled+2
+        else:
+            self.joins.append(member)
+    #
+    # end method: submit_join
+
+    # method: submit_leave
+    #
+    def submit_leave(self, eid: int) -> None:
+        '''This method queues a leave.'''
+
+        self.arrive()
+        if eid in self.leaves:
+            self.cancelled = self.cancelled+1
+        self.leaves[eid] = self.leaves.get(eid, 0)+1
+    #
+    # end method: submit_leave
+
+    # method: arrive
+    #
+    def arrive(self) -> None:
+        '''This method records the arrival of an event.'''
+
+        now = time.monotonic()
+        if self.first is None:
+            self.first = now
+        self.last = now
+        self.received = self.received+1
+    #
+    # end method: arrive
+
+    # method: pending
+    #
+    def pending(self) -> int:
+        '''This method returns the number of events still to be applied.'''
+
+        return len(self.leaves)+len(self.joins)
+    #
+    # end method: pending
+
+    # method: due
+    #
+    def due(self, now: Optional[float]=None) -> bool:
+        '''This method determines if the current window has closed.'''
+
+        if self.first is None:
+            return False
+        now = time.monotonic() if now is None else now
+        return now-self.last >= self.window or now-self.first >= self.max_delay
+    #
+    # end method: due
+
+    # method: poll
+    #
+    def poll(self, now: Optional[float]=None) -> bool:
+        '''This method flushes the window if it has closed and reports whether it did.'''
+
+        if not self.due(now):
+            return False
+        self.flush()
+        return True
+    #
+    # end method: poll
+
+    # method: wait
+    #
+    def wait(self) -> None:
+        '''This method sleeps until the current window closes and then flushes it.'''
+
+        while self.first is not None and not self.due():
+            now = time.monotonic()
+            time.sleep(max(0.0, min(self.last+self.window, self.first+self.max_delay)-now))
+        self.flush()
+    #
+    # end method: wait
+
+    # method: flush
+    #
+    def flush(self) -> list[int]:
+        '''This method applies the coalesced events with one refresh and returns the IDs of the new members.'''
+
+        # the leaves are applied before the joins, so the group must keep two members without the joiners, and
+        # the transport must have room for the group with them (the window stays pending if either fails)
+        #
+        leaves = [eid for eid in self.leaves if eid in self.group.agents]
+        joins = list(self.joins)
+        if len(self.group.agents)-len(leaves) < 2:
+            raise ValueError("The group would be left with a single member")
+        self.group.check_room(len(self.group.agents)-len(leaves)+len(joins))
+
+        # function: close_window
+        #
+        def close_window() -> None:
+            '''This helper function clears the window once its events are applied.'''
+
+            self.dropped = self.dropped+len(self.leaves)-len(leaves)
+            self.leaves = {}
+            self.joins = []
+            self.first = None
+            self.last = None
+        #
+        # end function: close_window
+
+        if not leaves and not joins:
+            close_window()
+            return []
+
+        print(f"\n{'Coalesced Window'.center(80, '=')}")
+
+        # leaves first (their sponsors generate new keys), then joins (new members bring their own keys)
+        #
+        fresh = {}
+        for eid in leaves:
+            self.group.apply_leave(eid)
+            fresh.pop(eid, None)
+            fresh[self.group.spon_id] = True
+        new_ids = []
+        for _ in joins:
+            self.group.apply_join()
+            fresh[self.group.new_id] = False
+            new_ids.append(self.group.new_id)
+        close_window()
+        print(f"\nSYS: {len(leaves)} leaves and {len(joins)} joins applied; sponsors: {sorted(fresh)}")
+
+        # one refresh for the whole window
+        #
+        self.scheduler.refresh(fresh)
+        self.refreshes = self.refreshes+1
+        print(f"SYS: {self.rekeys_saved()} rekeys saved so far ({self.received} events, {self.refreshes} refreshes).")
+        return new_ids
+    #
+    # end method: flush
+
+    # method: rekeys_saved
+    #
+    def rekeys_saved(self) -> int:
+        '''This method returns the number of rekeys avoided compared to one rekey per event.'''
+
+        # dropped leaves would not have caused a rekey either
+        #
+        return self.received-self.pending()-self.dropped-self.refreshes
+    #
+    # end method: rekeys_saved
+#
+# end class: EventIntake
+#
+# end file: event_intake.py
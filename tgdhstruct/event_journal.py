@@ -0,0 +1,319 @@
+# file: event_journal.py
+#
+'''This file contains the EventJournal class.'''
+
+# import modules
+#
+import os
+import json
+import pickle
+import threading
+from typing import Any, Optional
+from tgdhstruct.binary_tree import BinaryTree
+
+# class: EventJournal
+#
+class EventJournal:
+    '''
+    Description
+    -----------
+    This class keeps a write-ahead journal of a member's tree so that a member whose process dies can rebuild
+    its state without rejoining (and so without another rekey of the whole group). Every change to the tree
+    is appended as one JSON line (sequence number, operation, arguments): the events applied to the tree,
+    the blind keys posted to the member, the key calculations and the member's own new key pairs, which are
+    random and cannot be replayed otherwise. The journal holds private keys and must be kept like them.
+
+    Appending only queues the record; a background thread writes and fsyncs everything queued so far in one
+    go (group commit), so the records of a whole round share a single fsync and an event never waits for the
+    disk. sync() waits until a record is durable: a member calls it before it publishes anything derived from
+    a new private key. Every <snapshot_every> records (and whenever the tree is replaced as a whole, e.g. the
+    tree a joining member receives) the tree is pickled to a snapshot and the journal starts over; recover()
+    loads the latest snapshot and replays the records after it.
+
+    Attributes
+    ----------
+    path : str
+        The base path: the journal is <path>.wal and the snapshot <path>.snap
+    snapshot_every : int
+        The number of records after which the next snapshot is taken
+    seq : int
+        The sequence number of the last record appended
+    durable : int
+        The sequence number of the last record written and fsynced
+    pending : list[str]
+        The records queued for the next group commit
+    since_snapshot : int
+        The number of records appended since the last snapshot
+    commits : int
+        The number of group commits (fsyncs of the journal)
+    file : BinaryIO
+        The open journal file
+    lock : threading.Lock
+        The lock guarding the queue and the sequence numbers
+    io_lock : threading.Lock
+        The lock guarding the journal file (held by a group commit and by a snapshot)
+    flushed : threading.Condition
+        The signal that new records became durable
+    wanted : threading.Event
+        The signal that wakes the commit thread
+    thread : threading.Thread
+        The commit thread (started on first append)
+    closed : bool
+        Whether the journal was closed
+
+    Methods
+    -------
+    append(self, op: str, *args: Any) -> int
+        This method queues a record for the next group commit and returns its sequence number.
+    sync(self, seq: Optional[int]=None) -> None
+        This method waits until a record (or every record appended so far) is durable.
+    commit(self) -> int
+        This method writes and fsyncs all queued records at once and returns how many it wrote.
+    run(self) -> None
+        This method is the body of the commit thread.
+    snapshot(self, tree: BinaryTree) -> None
+        This method saves the whole tree and starts the journal over.
+    read_header(self) -> dict[str, int]
+        This method returns the header of the snapshot (sequence number 0 without a snapshot).
+    read(self) -> list[dict]
+        This method returns the complete records of the journal file (a torn last line is ignored).
+    recover(self) -> Optional[BinaryTree]
+        This method rebuilds the tree from the latest snapshot and the records after it (None without a snapshot).
+    apply(tree: BinaryTree, op: str, args: list) -> None
+        This method replays one record on a tree.
+    close(self) -> None
+        This method commits the queued records, stops the commit thread and closes the journal file.
+    '''
+
+    # constructor
+    #
+    def __init__(self, path: str, snapshot_every: int=256) -> None:
+        '''This is the constructor (an existing journal is continued).'''
+
+        self.path = path
+        self.snapshot_every = snapshot_every
+        self.pending = []
+        self.since_snapshot = 0
+        self.commits = 0
+        self.lock = threading.Lock()
+        self.io_lock = threading.Lock()
+        self.flushed = threading.Condition(self.lock)
+        self.wanted = threading.Event()
+        self.thread = None
+        self.closed = False
+
+        # continue the numbering of an existing journal; like recover(), count only the records after the
+        # snapshot (a crash between the snapshot and the truncation leaves older ones behind)
+        #
+        self.seq = 0
+        snapshot_seq = self.read_header()['seq']
+        for record in self.read():
+            self.seq = record['seq']
+            if record['seq'] > snapshot_seq:
+                self.since_snapshot = self.since_snapshot+1
+        self.seq = max(self.seq, snapshot_seq)
+        self.durable = self.seq
+        self.file = open(f'{self.path}.wal', 'ab')
+    #
+    # end constructor
+
+    # method: append
+    #
+    def append(self, op: str, *args: Any) -> int:
+        '''This method queues a record for the next group commit and returns its sequence number.'''
+
+        with self.lock:
+            if self.closed:
+                raise ValueError(f"The journal {self.path} is closed")
+            self.seq = self.seq+1
+            self.pending.append(json.dumps({'seq': self.seq, 'op': op, 'args': list(args)}))
+            self.since_snapshot = self.since_snapshot+1
+            seq = self.seq
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.run, name='event-journal', daemon=True)
+            self.thread.start()
+        self.wanted.set()
+        return seq
+    #
+    # end method: append
+
+    # method: sync
+    #
+    def sync(self, seq: Optional[int]=None) -> None:
+        '''This method waits until a record (or every record appended so far) is durable.'''
+
+        with self.lock:
+            seq = self.seq if seq is None else seq
+            if self.durable >= seq:
+                return
+        self.wanted.set()
+        with self.flushed:
+            self.flushed.wait_for(lambda: self.durable >= seq or self.closed)
+    #
+    # end method: sync
+
+    # method: commit
+    #
+    def commit(self) -> int:
+        '''This method writes and fsyncs all queued records at once and returns how many it wrote.'''
+
+        with self.io_lock:
+            # records queued while the disk is busy wait for the next commit and share its fsync
+            #
+            with self.lock:
+                lines, self.pending = self.pending, []
+                seq = self.seq
+            if lines:
+                self.file.write(('\n'.join(lines)+'\n').encode())
+                self.file.flush()
+                os.fsync(self.file.fileno())
+                self.commits = self.commits+1
+            with self.flushed:
+                self.durable = max(self.durable, seq)
+                self.flushed.notify_all()
+        return len(lines)
+    #
+    # end method: commit
+
+    # method: run
+    #
+    def run(self) -> None:
+        '''This method is the body of the commit thread.'''
+
+        while not self.closed:
+            self.wanted.wait()
+            self.wanted.clear()
+            if not self.file.closed:
+                self.commit()
+    #
+    # end method: run
+
+    # method: snapshot
+    #
+    def snapshot(self, tree: BinaryTree) -> None:
+        '''This method saves the whole tree and starts the journal over.'''
+
+        with self.io_lock:
+            # the snapshot covers every record appended so far; queued records are dropped with the old journal
+            #
+            with self.lock:
+                self.pending = []
+                seq = self.seq
+                self.since_snapshot = 0
+            header = json.dumps({'seq': seq, 'uid': tree.uid})
+
+            # write the new snapshot next to the old one, then swap it in atomically
+            #
+            with open(f'{self.path}.snap.tmp', 'wb') as snap:
+                snap.write(header.encode()+b'\n')
+                pickle.dump(tree, snap, protocol=pickle.HIGHEST_PROTOCOL)
+                snap.flush()
+                os.fsync(snap.fileno())
+            os.replace(f'{self.path}.snap.tmp', f'{self.path}.snap')
+
+            # the journal only holds records after the snapshot (a crash before the truncation leaves records
+            # that recover() skips by their sequence numbers)
+            #
+            self.file.truncate(0)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+            with self.flushed:
+                self.durable = max(self.durable, seq)
+                self.flushed.notify_all()
+    #
+    # end method: snapshot
+
+    # method: read_header
+    #
+    def read_header(self) -> dict[str, int]:
+        '''This method returns the header of the snapshot (sequence number 0 without a snapshot).'''
+
+        if not os.path.exists(f'{self.path}.snap'):
+            return {'seq': 0}
+        with open(f'{self.path}.snap', 'rb') as snap:
+            return json.loads(snap.readline())
+    #
+    # end method: read_header
+
+    # method: read
+    #
+    def read(self) -> list[dict]:
+        '''This method returns the complete records of the journal file (a torn last line is ignored).'''
+
+        if not os.path.exists(f'{self.path}.wal'):
+            return []
+        records = []
+        with open(f'{self.path}.wal', 'rb') as wal:
+            for line in wal:
+                if not line.endswith(b'\n'):
+                    break
+                records.append(json.loads(line))
+        return records
+    #
+    # end method: read
+
+    # method: recover
+    #
+    def recover(self) -> Optional[BinaryTree]:
+        '''This method rebuilds the tree from the latest snapshot and the records after it (None without a snapshot).'''
+
+        if not os.path.exists(f'{self.path}.snap'):
+            return None
+        header = self.read_header()
+        with open(f'{self.path}.snap', 'rb') as snap:
+            snap.readline()
+            tree = pickle.load(snap)
+        for record in self.read():
+            if record['seq'] > header['seq']:
+                EventJournal.apply(tree, record['op'], record['args'])
+        return tree
+    #
+    # end method: recover
+
+    # method: apply
+    #
+    @staticmethod
+    def apply(tree: BinaryTree, op: str, args: list) -> None:
+        '''This method replays one record on a tree.'''
+
+        if op == 'join':
+            tree.join_event()
+        elif op == 'leave':
+            tree.leave_event(*args)
+        elif op == 'key':
+            tree.my_node.key, tree.my_node.b_key = args
+        elif op == 'bkeys':
+            tree.set_blind_keys(*args)
+        elif op == 'initial':
+            tree.initial_calculate_group_key(*args)
+        elif op == 'calculate':
+            tree.calculate_group_key()
+        elif op == 'clear':
+            tree.clear_path_keys()
+        elif op == 'partial':
+            tree.calculate_partial_group_key(set(*args))
+        else:
+            raise ValueError(f"Unknown journal operation: {op}")
+    #
+    # end method: apply
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method commits the queued records, stops the commit thread and closes the journal file.'''
+
+        self.commit()
+        with self.flushed:
+            self.closed = True
+            self.flushed.notify_all()
+        self.wanted.set()
+        if self.thread is not None:
+            self.thread.join()
+        with self.io_lock:
+            self.file.close()
+    #
+    # end method: close
+#
+# end class: EventJournal
+#
+# end file: event_journal.py
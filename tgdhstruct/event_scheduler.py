@@ -0,0 +1,223 @@
+# file: event_scheduler.py
+#
+'''This file contains the EventScheduler class.'''
+
+# import modules
+#
+from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from tgdhstruct.member_agent import MemberAgent, receive_bkey_batch
+from tgdhstruct.epoch_stream import Update, get_stream
+from tgdhstruct.tracing import get_tracer
+
+# class: EventScheduler
+#
+class EventScheduler:
+    '''
+    Description
+    -----------
+    This class processes queued membership events of a MemberAgent group in batches.
+    Consecutive events whose affected subtrees are disjoint form one batch: their tree updates are applied,
+    then all of their sponsors compute and broadcast concurrently, round by round, and the key paths merge
+    at the shared upper levels. An event that overlaps an event of the current batch starts a new batch.
+
+    Attributes
+    ----------
+    group : MemberAgent
+        The group whose events are scheduled
+    events : list[tuple[str, Optional[int]]]
+        The queued events as ('join', None) or ('leave', <member ID>)
+    workers : int
+        The number of sponsors allowed to compute at the same time
+    skipped : list[int]
+        The member IDs whose leaves were skipped because they were not in the group when their turn came
+
+    Methods
+    -------
+    submit_join(self) -> None
+        This method queues a join event.
+    submit_leave(self, eid: int) -> None
+        This method queues a leave event.
+    get_region(self, mid: int, event: tuple[str, Optional[int]]) -> set[int]
+        This method returns the member IDs below the subtree that an event changes (as seen by a member).
+    run(self) -> int
+        This method processes all queued events and returns the number of batches (rekeys) used.
+    refresh(self, fresh: dict[int, bool]) -> None
+        This method rekeys the group with several sponsors computing and broadcasting concurrently.
+    '''
+
+    # constructor
+    #
+    def __init__(self, group: MemberAgent, workers: int=4) -> None:
+        '''This is the constructor.'''
+
+        self.group = group
+        self.events = []
+        self.workers = workers
+        self.skipped = []
+    #
+    # end constructor
+
+    # method: submit_join
+    #
+    def submit_join(self) -> None:
+        '''This method queues a join event.'''
+
+        self.events.append(('join', None))
+    #
+    # end method: submit_join
+
+    # method: submit_leave
+    #
+    def submit_leave(self, eid: int) -> None:
+        '''This method queues a leave event.'''
+
+        self.events.append(('leave', eid))
+    #
+    # end method: submit_leave
+
+    # method: get_region
+    #
+    def get_region(self, mid: int, event: tuple[str, Optional[int]]) -> set[int]:
+        '''This method returns the member IDs below the subtree that an event changes (as seen by a member).'''
+
+        return self.group.agents[mid].tree_region(event)
+    #
+    # end method: get_region
+
+    # method: run
+    #
+    def run(self) -> int:
+        '''This method processes all queued events and returns the number of batches (rekeys) used.'''
+
+        batches = 0
+        while self.events:
+            print(f"\n{'Event Batch'.center(80, '=')}")
+
+            # apply events while their subtrees are disjoint from the rest of the batch
+            #
+            fresh = {}
+            regions = []
+            while self.events:
+                event = self.events[0]
+
+                # a member that is not in the group (never was, or left earlier in the queue) cannot leave
+                #
+                if event[0] == 'leave' and event[1] not in self.group.agents:
+                    self.events.pop(0)
+                    self.skipped.append(event[1])
+                    print(f"\nSYS: Member {event[1]} is not in the group; its leave is skipped.")
+                    continue
+                viewer = next(key for key in self.group.agents if key != event[1])
+                region = self.get_region(viewer, event)
+                if any(region & other for other in regions):
+                    break
+                self.events.pop(0)
+                regions.append(region)
+                if event[0] == 'join':
+                    self.group.apply_join()
+                    fresh[self.group.new_id] = False
+                else:
+                    self.group.apply_leave(event[1])
+                    fresh[self.group.spon_id] = True
+            if not fresh:
+                break
+            print(f"\nSYS: {len(regions)} independent events applied; sponsors: {sorted(fresh)}")
+
+            # rekey once for the whole batch
+            #
+            self.refresh(fresh)
+            batches = batches+1
+        return batches
+    #
+    # end method: run
+
+    # method: refresh
+    #
+    def refresh(self, fresh: dict[int, bool]) -> None:
+        '''This method rekeys the group with several sponsors computing and broadcasting concurrently.'''
+
+        agents = self.group.agents
+        connections = self.group.connections
+        announce = get_stream().active()
+
+        # function: prepare
+        #
+        def prepare(mid: int) -> list[str]:
+            '''This helper function refreshes a sponsor's keys and returns its stale key path.'''
+
+            return agents[mid].tree_prepare(fresh[mid])
+        #
+        # end function: prepare
+
+        # function: step
+        #
+        def step(mid: int) -> tuple[dict[str, int], bool, list[Update]]:
+            '''This helper function lets a sponsor compute as far up its key path as it can.'''
+
+            return agents[mid].tree_partial(pending, announce)
+        #
+        # end function: step
+
+        # function: finish
+        #
+        def finish(mid: int) -> list[Update]:
+            '''This helper function lets a member that is not a sponsor calculate the group key.'''
+
+            return agents[mid].tree_calculate(announce)[1]
+        #
+        # end function: finish
+
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+
+            # the blind keys on the sponsors' key paths are pending until someone publishes them
+            #
+            pending = set()
+            for names in pool.map(prepare, fresh):
+                pending.update(names)
+            co_paths = {key: set(agent.tree_co_path()) for key, agent in agents.items()}
+
+            # sponsors compute concurrently and broadcast what they computed in the same round
+            #
+            active = list(fresh)
+            level = 0
+            while active:
+                results = dict(zip(active, pool.map(step, active)))
+                published = {}
+                for mid, (bkeys, _, updates) in results.items():
+                    self.group.republish(updates)
+                    bkeys = {name: bkey for name, bkey in bkeys.items() if name in pending and name not in published}
+                    if not bkeys:
+                        continue
+                    for key in agents:
+                        if key != mid and co_paths[key] & bkeys.keys():
+                            connections.subscribe(key, mid, 'rekey', receive_bkey_batch)
+                    published.update(bkeys)
+                    self.group.send_info(mid, 'rekey', bkeys)
+                active = [mid for mid, (_, done, _) in results.items() if not done]
+                if not published:
+                    if active:
+                        raise RuntimeError(f"Sponsors {active} cannot make progress")
+                    break
+
+                # drop the subscriptions once the keys have been received
+                #
+                get_tracer().sleep(1)
+                connections.clear_topics()
+                pending.difference_update(published)
+                level = level+1
+                print(f"\nSYS: Round {level} finished -- {len(published)} blind keys exchanged!")
+
+            # all remaining members calculate the group key
+            #
+            for updates in pool.map(finish, [key for key in agents if key not in fresh]):
+                self.group.republish(updates)
+
+        print("\nSYS: Tree updation completed!")
+        print("SYS: All members have computed the new group key.")
+    #
+    # end method: refresh
+#
+# end class: EventScheduler
+#
+# end file: event_scheduler.py
@@ -0,0 +1,234 @@
+# file: group_cipher.py
+#
+'''This file contains the GroupCipher and GcmStream classes.'''
+
+# import modules
+#
+from __future__ import annotations
+from typing import Iterable, Iterator, Optional, Union
+from Crypto.Cipher import AES
+from Crypto.Hash import SHA256
+from Crypto.Protocol.KDF import HKDF
+
+Buffer = Union[bytes, bytearray, memoryview]
+
+# class: GcmStream
+#
+class GcmStream:
+    '''
+    Description
+    -----------
+    This class encrypts or decrypts one AES-GCM message incrementally, chunk by chunk.
+    Chunks may be any buffer (e.g. memoryview slices); output is written into a caller-supplied buffer when
+    one is given, so large payloads are processed without extra copies.
+
+    Attributes
+    ----------
+    cipher : GcmMode
+        The underlying AES-GCM cipher object
+    decrypt : bool
+        Whether the stream decrypts instead of encrypts
+
+    Methods
+    -------
+    update(self, chunk: Buffer, out: Optional[Buffer]=None) -> Buffer
+        This method processes the next chunk and returns the output (written into <out> if given).
+    finalize(self) -> bytes
+        This method ends an encryption stream and returns the authentication tag.
+    verify(self, tag: bytes) -> None
+        This method ends a decryption stream; a ValueError is raised if the tag does not match.
+    '''
+
+    # constructor
+    #
+    def __init__(self, key: bytes, nonce: bytes, decrypt: bool=False, aad: Optional[bytes]=None) -> None:
+        '''This is the constructor.'''
+
+        self.cipher = AES.new(key, AES.MODE_GCM, nonce=nonce)
+        self.decrypt = decrypt
+        if aad is not None:
+            self.cipher.update(aad)
+    #
+    # end constructor
+
+    # method: update
+    #
+    def update(self, chunk: Buffer, out: Optional[Buffer]=None) -> Buffer:
+        '''This method processes the next chunk and returns the output (written into <out> if given).'''
+
+        if self.decrypt:
+            result = self.cipher.decrypt(chunk, output=out)
+        else:
+            result = self.cipher.encrypt(chunk, output=out)
+        return out if out is not None else result
+    #
+    # end method: update
+
+    # method: finalize
+    #
+    def finalize(self) -> bytes:
+        '''This method ends an encryption stream and returns the authentication tag.'''
+
+        return self.cipher.digest()
+    #
+    # end method: finalize
+
+    # method: verify
+    #
+    def verify(self, tag: bytes) -> None:
+        '''This method ends a decryption stream; a ValueError is raised if the tag does not match.'''
+
+        self.cipher.verify(tag)
+    #
+    # end method: verify
+#
+# end class: GcmStream
+
+# class: GroupCipher
+#
+class GroupCipher:
+    '''
+    Description
+    -----------
+    This class holds the traffic keys derived from the group key of one epoch and encrypts/decrypts payloads
+    with AES-GCM. The nonce of a message is the derived IV XORed with the sender ID (4 bytes) and the sender's
+    message sequence number (8 bytes), so every (sender, sequence) pair must be used only once per epoch.
+
+    Attributes
+    ----------
+    epoch : int
+        The epoch the traffic keys belong to
+    key : bytes
+        The 256-bit AES key
+    iv : bytes
+        The 96-bit IV from which message nonces are derived
+
+    Methods
+    -------
+    derive(group_key: int, epoch: int, key_size: int) -> GroupCipher
+        This method derives the traffic keys of an epoch from the group key with HKDF-SHA256.
+    nonce(self, sender: int, seq: int) -> bytes
+        This method returns the nonce of a sender's message.
+    encryptor(self, sender: int, seq: int, aad: Optional[bytes]=None) -> GcmStream
+        This method starts an encryption stream for a message.
+    decryptor(self, sender: int, seq: int, aad: Optional[bytes]=None) -> GcmStream
+        This method starts a decryption stream for a message.
+    encrypt_stream(self, sender: int, seq: int, chunks: Iterable[Buffer], out: Optional[bytearray]=None) -> Iterator[Buffer]
+        This method encrypts a stream of chunks, yielding the ciphertext chunks and finally the tag.
+    encrypt_into(self, sender: int, seq: int, src: Buffer, dst: Buffer, chunk_size: int=1048576) -> bytes
+        This method encrypts a whole buffer into another buffer and returns the tag.
+    decrypt_into(self, sender: int, seq: int, src: Buffer, dst: Buffer, tag: bytes, chunk_size: int=1048576) -> None
+        This method decrypts and verifies a whole buffer into another buffer (zeroed if the tag does not match).
+    '''
+
+    # constructor
+    #
+    def __init__(self, epoch: int, key: bytes, iv: bytes) -> None:
+        '''This is the constructor.'''
+
+        self.epoch = epoch
+        self.key = key
+        self.iv = iv
+    #
+    # end constructor
+
+    # method: derive
+    #
+    @staticmethod
+    def derive(group_key: int, epoch: int, key_size: int) -> GroupCipher:
+        '''This method derives the traffic keys of an epoch from the group key with HKDF-SHA256.'''
+
+        master = group_key.to_bytes(key_size, 'big')
+        okm = HKDF(master, 44, epoch.to_bytes(8, 'big'), SHA256, context=b'tgdhstruct traffic keys')
+        return GroupCipher(epoch, okm[:32], okm[32:])
+    #
+    # end method: derive
+
+    # method: nonce
+    #
+    def nonce(self, sender: int, seq: int) -> bytes:
+        '''This method returns the nonce of a sender's message.'''
+
+        counter = sender.to_bytes(4, 'big') + seq.to_bytes(8, 'big')
+        return bytes(a ^ b for a, b in zip(self.iv, counter))
+    #
+    # end method: nonce
+
+    # method: encryptor
+    #
+    def encryptor(self, sender: int, seq: int, aad: Optional[bytes]=None) -> GcmStream:
+        '''This method starts an encryption stream for a message.'''
+
+        return GcmStream(self.key, self.nonce(sender, seq), decrypt=False, aad=aad)
+    #
+    # end method: encryptor
+
+    # method: decryptor
+    #
+    def decryptor(self, sender: int, seq: int, aad: Optional[bytes]=None) -> GcmStream:
+        '''This method starts a decryption stream for a message.'''
+
+        return GcmStream(self.key, self.nonce(sender, seq), decrypt=True, aad=aad)
+    #
+    # end method: decryptor
+
+    # method: encrypt_stream
+    #
+    def encrypt_stream(self, sender: int, seq: int, chunks: Iterable[Buffer], out: Optional[bytearray]=None) -> Iterator[Buffer]:
+        '''This method encrypts a stream of chunks, yielding the ciphertext chunks and finally the tag.'''
+
+        # with an output buffer, every yielded chunk is a view into it (valid until the next chunk)
+        #
+        stream = self.encryptor(sender, seq)
+        view = memoryview(out) if out is not None else None
+        for chunk in chunks:
+            if view is None:
+                yield stream.update(chunk)
+            else:
+                if len(chunk) > len(view):
+                    raise ValueError(f"The output buffer ({len(view)} bytes) is smaller than a chunk ({len(chunk)} bytes)")
+                yield stream.update(chunk, view[:len(chunk)])
+        yield stream.finalize()
+    #
+    # end method: encrypt_stream
+
+    # method: encrypt_into
+    #
+    def encrypt_into(self, sender: int, seq: int, src: Buffer, dst: Buffer, chunk_size: int=1048576) -> bytes:
+        '''This method encrypts a whole buffer into another buffer and returns the tag.'''
+
+        src = memoryview(src)
+        dst = memoryview(dst)
+        stream = self.encryptor(sender, seq)
+        for i in range(0, len(src), chunk_size):
+            stream.update(src[i:i+chunk_size], dst[i:i+chunk_size])
+        return stream.finalize()
+    #
+    # end method: encrypt_into
+
+    # method: decrypt_into
+    #
+    def decrypt_into(self, sender: int, seq: int, src: Buffer, dst: Buffer, tag: bytes, chunk_size: int=1048576) -> None:
+        '''This method decrypts and verifies a whole buffer into another buffer (zeroed if the tag does not match).'''
+
+        src = memoryview(src)
+        dst = memoryview(dst)
+        if len(dst) < len(src):
+            raise ValueError(f"The output buffer ({len(dst)} bytes) is smaller than the ciphertext ({len(src)} bytes)")
+        stream = self.decryptor(sender, seq)
+        for i in range(0, len(src), chunk_size):
+            stream.update(src[i:i+chunk_size], dst[i:i+chunk_size])
+
+        # the plaintext is only released with a valid tag: unauthenticated output is wiped
+        #
+        try:
+            stream.verify(tag)
+        except ValueError:
+            dst[:len(src)] = bytes(len(src))
+            raise
+    #
+    # end method: decrypt_into
+#
+# end class: GroupCipher
+#
+# end file: group_cipher.py
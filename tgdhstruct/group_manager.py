@@ -0,0 +1,303 @@
+# file: group_manager.py
+#
+'''This file contains the GroupManager class.'''
+
+# import modules
+#
+import pickle
+from collections import deque
+from typing import Hashable, Optional
+from concurrent.futures import ThreadPoolExecutor
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.group_cipher import GroupCipher
+from tgdhstruct.epoch_stream import EpochStream
+
+# class: GroupManager
+#
+class GroupManager:
+    '''
+    Description
+    -----------
+    This class hosts many independent TGDH groups in one process.
+    Every member of a group keeps its own quiet BinaryTree holding only its own private key and the keys of its
+    key path, as a member agent does, so adding a group costs its members' tree nodes (kilobytes for a small
+    group) rather than a set of agent processes. Blind keys travel over one in-process bulletin board shared by
+    all groups: in every round a group's members post the blind keys they calculated and read their co-path
+    keys from the group's posts. A joining member receives its sponsor's tree without private keys. The
+    Diffie-Hellman parameters (DataNode.g and DataNode.p), the key pair pool and the worker pool are shared by
+    all groups. Member IDs repeat across groups, so every group announces its group keys on its own epoch
+    stream (stream(gid)) rather than on the stream of the process.
+
+    Events are queued per group and dispatched in turns: each turn takes at most one event from every group
+    with pending work (round-robin), so a group with heavy churn cannot starve the others, and a group never
+    runs two events at the same time. The events of a turn are handed to the worker threads together, but the
+    exponentiations hold the GIL, so the threads take turns on the CPU rather than rekeying groups in parallel;
+    they only overlap work that releases it (such as epoch-stream subscribers doing I/O). An event that raises
+    is reported in its result like a rejected event and does not stop the rest of the turn.
+
+    Attributes
+    ----------
+    groups : dict[Hashable, dict[int, BinaryTree]]
+        The members' trees of each hosted group by group ID and member ID
+    board : dict[Hashable, dict[str, int]]
+        The blind keys posted by node name in each group's current round (the transport shared by all groups)
+    queues : dict[Hashable, deque[tuple[str, Optional[int]]]]
+        The pending events of each group as ('join', None) or ('leave', <member ID>)
+    ready : deque[Hashable]
+        The groups with pending events, in round-robin order
+    streams : dict[Hashable, EpochStream]
+        The epoch stream of each hosted group
+    pool : ThreadPoolExecutor
+        The worker pool shared by all groups
+
+    Methods
+    -------
+    create_group(self, gid: Hashable, size: int, layout: str='balanced') -> None
+        This method creates a group (in the 'balanced' or 'str' tree layout) and runs its initial key exchange.
+    remove_group(self, gid: Hashable) -> None
+        This method removes a group and its pending events (and ends the iterators of its stream).
+    submit_join(self, gid: Hashable) -> None
+        This method queues a join event for a group.
+    submit_leave(self, gid: Hashable, eid: int) -> None
+        This method queues a leave event for a group.
+    process(self, gid: Hashable, event: tuple[str, Optional[int]]) -> tuple[Hashable, str, Optional[int], Optional[str]]
+        This method applies one event to a group and rekeys it.
+    exchange(self, gid: Hashable, trees: list[BinaryTree]) -> None
+        This method lets members read their co-path blind keys from the board and calculate the group key.
+    run_pending(self, max_turns: Optional[int]=None) -> list[tuple[Hashable, str, Optional[int], Optional[str]]]
+        This method processes the queued events fairly across groups and returns the results.
+    members(self, gid: Hashable) -> list[int]
+        This method returns the member IDs of a group.
+    stream(self, gid: Hashable) -> EpochStream
+        This method returns the epoch stream a group announces its group keys on.
+    get_cipher(self, gid: Hashable) -> GroupCipher
+        This method returns the traffic keys of a group's current epoch.
+    close(self) -> None
+        This method shuts down the worker pool.
+    '''
+
+    # constructor
+    #
+    def __init__(self, workers: Optional[int]=None) -> None:
+        '''This is the constructor.'''
+
+        self.groups = {}
+        self.board = {}
+        self.queues = {}
+        self.ready = deque()
+        self.streams = {}
+        self.pool = ThreadPoolExecutor(max_workers=workers)
+    #
+    # end constructor
+
+    # method: create_group
+    #
+    def create_group(self, gid: Hashable, size: int, layout: str='balanced') -> None:
+        '''This method creates a group (in the 'balanced' or 'str' tree layout) and runs its initial key exchange.'''
+
+        if gid in self.groups:
+            raise ValueError(f"Group {gid} already exists")
+        trees = {mid: BinaryTree(size, mid, verbose=False, layout=layout) for mid in range(1, size+1)}
+        self.streams[gid] = EpochStream()
+        for tree in trees.values():
+            tree.stream = self.streams[gid]
+
+        # in every round each member calculates its key path up to the first co-path blind key nobody has
+        # posted yet and posts the blind keys it calculated (its own blind key in the first round)
+        #
+        board = {}
+        waiting = list(trees.values())
+        while waiting:
+            posts = {}
+            for tree in waiting:
+                tree.set_blind_keys(board)
+                pending = {node.name for node in tree.my_node.get_co_path() if node.b_key is None}
+                if tree.my_node.name not in board:
+                    pending.add(tree.my_node.name)
+                posts.update(tree.calculate_partial_group_key(pending))
+            done = [tree for tree in waiting if tree.root.key is not None]
+            if not posts and not done:
+                raise RuntimeError(f"The initial key exchange of group {gid} is stuck")
+            waiting = [tree for tree in waiting if tree.root.key is None]
+            board.update(posts)
+        self.groups[gid] = trees
+        self.board[gid] = {}
+        self.queues[gid] = deque()
+    #
+    # end method: create_group
+
+    # method: remove_group
+    #
+    def remove_group(self, gid: Hashable) -> None:
+        '''This method removes a group and its pending events (and ends the iterators of its stream).'''
+
+        del self.groups[gid]
+        del self.board[gid]
+        del self.queues[gid]
+        self.streams.pop(gid).close()
+        if gid in self.ready:
+            self.ready.remove(gid)
+    #
+    # end method: remove_group
+
+    # method: submit_join
+    #
+    def submit_join(self, gid: Hashable) -> None:
+        '''This method queues a join event for a group.'''
+
+        if not self.queues[gid]:
+            self.ready.append(gid)
+        self.queues[gid].append(('join', None))
+    #
+    # end method: submit_join
+
+    # method: submit_leave
+    #
+    def submit_leave(self, gid: Hashable, eid: int) -> None:
+        '''This method queues a leave event for a group.'''
+
+        if not self.queues[gid]:
+            self.ready.append(gid)
+        self.queues[gid].append(('leave', eid))
+    #
+    # end method: submit_leave
+
+    # method: process
+    #
+    def process(self, gid: Hashable, event: tuple[str, Optional[int]]) -> tuple[Hashable, str, Optional[int], Optional[str]]:
+        '''This method applies one event to a group and rekeys it.'''
+
+        trees = self.groups[gid]
+        kind, eid = event
+        if kind == 'leave' and eid not in trees:
+            return gid, kind, eid, f"Member {eid} is not in group {gid}"
+        if kind == 'leave' and len(trees) <= 2:
+            return gid, kind, eid, f"Group {gid} would be left with a single member"
+
+        # every member applies the event to its own tree
+        #
+        board = self.board[gid]
+        board.clear()
+        if kind == 'join':
+            for tree in trees.values():
+                tree.join_event()
+            sponsor = next(tree for tree in trees.values() if tree.my_node.ntype == 'spon')
+
+            # the sponsor hands its tree to the new member without its private keys; the new member posts
+            # its blind key (the sponsor keeps its own key on a join)
+            #
+            stripped = sponsor.strip_private_keys()
+            try:
+                tree = pickle.loads(pickle.dumps(sponsor))
+            finally:
+                sponsor.restore_private_keys(stripped)
+            tree.stream = self.streams[gid]
+            tree.new_member_protocol()
+            eid = tree.uid
+            trees[eid] = tree
+            board[tree.my_node.name] = tree.my_node.b_key
+        else:
+            del trees[eid]
+            for tree in trees.values():
+                tree.leave_event(eid)
+            sponsor = next(tree for tree in trees.values() if tree.my_node.ntype == 'spon')
+            sponsor.key_generation()
+
+        # the sponsor calculates its key path and posts it, then every other member catches up
+        #
+        self.exchange(gid, [sponsor])
+        board.update(sponsor.get_refreshed_blind_keys())
+        self.exchange(gid, [tree for tree in trees.values() if tree is not sponsor])
+        return gid, kind, eid, None
+    #
+    # end method: process
+
+    # method: exchange
+    #
+    def exchange(self, gid: Hashable, trees: list[BinaryTree]) -> None:
+        '''This method lets members read their co-path blind keys from the board and calculate the group key.'''
+
+        board = self.board[gid]
+        for tree in trees:
+            tree.set_blind_keys(board)
+            tree.calculate_group_key()
+
+            # only the tree itself is kept between events
+            #
+            tree.refresh_path = None
+    #
+    # end method: exchange
+
+    # method: run_pending
+    #
+    def run_pending(self, max_turns: Optional[int]=None) -> list[tuple[Hashable, str, Optional[int], Optional[str]]]:
+        '''This method processes the queued events fairly across groups and returns the results.'''
+
+        results = []
+        turns = 0
+        while self.ready and (max_turns is None or turns < max_turns):
+
+            # one event from every group with pending work, handed to the worker threads together (they
+            # interleave under the GIL; the exponentiations do not run in parallel)
+            #
+            batch = [(gid, self.queues[gid].popleft()) for gid in self.ready]
+            self.ready.clear()
+            futures = [self.pool.submit(self.process, gid, event) for gid, event in batch]
+
+            # a failing event is reported for its own group; the other groups' results are kept
+            #
+            for (gid, (kind, eid)), future in zip(batch, futures):
+                try:
+                    results.append(future.result())
+                except Exception as err:
+                    results.append((gid, kind, eid, f"{type(err).__name__}: {err}"))
+
+            # groups with more work go to the back of the line
+            #
+            for gid, _ in batch:
+                if self.queues[gid]:
+                    self.ready.append(gid)
+            turns = turns+1
+        return results
+    #
+    # end method: run_pending
+
+    # method: members
+    #
+    def members(self, gid: Hashable) -> list[int]:
+        '''This method returns the member IDs of a group.'''
+
+        return [node.mid for node in next(iter(self.groups[gid].values())).get_leaves()]
+    #
+    # end method: members
+
+    # method: stream
+    #
+    def stream(self, gid: Hashable) -> EpochStream:
+        '''This method returns the epoch stream a group announces its group keys on.'''
+
+        return self.streams[gid]
+    #
+    # end method: stream
+
+    # method: get_cipher
+    #
+    def get_cipher(self, gid: Hashable) -> GroupCipher:
+        '''This method returns the traffic keys of a group's current epoch.'''
+
+        return next(iter(self.groups[gid].values())).get_cipher()
+    #
+    # end method: get_cipher
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method shuts down the worker pool.'''
+
+        self.pool.shutdown()
+    #
+    # end method: close
+#
+# end class: GroupManager
+#
+# end file: group_manager.py
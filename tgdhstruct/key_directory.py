@@ -0,0 +1,285 @@
+# file: key_directory.py
+#
+'''This file contains the KeyDirectory bulletin board, its osbrain service and the client used by member agents.'''
+
+# import modules
+#
+from typing import Any, Optional, TYPE_CHECKING
+from tgdhstruct.shm_transport import SharedKeyTable
+if TYPE_CHECKING:
+    from osbrain import Proxy, AgentAddress
+
+# class: KeyDirectory
+#
+class KeyDirectory:
+    '''
+    Description
+    -----------
+    This class is a bulletin board of blind keys keyed by node position and epoch. Members post the blind keys
+    they computed and fetch all of their co-path keys in one batched request; a member that fell behind
+    fetches everything posted since its last epoch in one request as well (unless that epoch is older than the
+    history). It runs in-process (e.g. for tests) or behind a KeyDirectoryService.
+
+    Attributes
+    ----------
+    epoch : int
+        The current epoch
+    posts : dict[int, dict[int, int]]
+        The blind keys posted in each epoch by node position
+    history : int
+        The number of past epochs kept for members catching up
+
+    Methods
+    -------
+    get_epoch(self) -> int
+        This method returns the current epoch.
+    advance(self) -> int
+        This method starts a new epoch (dropping posts older than the history) and returns it.
+    write(self, bkeys: dict[str, int]) -> None
+        This method posts blind keys by node name in the current epoch.
+    read(self, names: list[str], since: Optional[int]=None) -> dict[str, int]
+        This method returns the named blind keys posted in the current epoch (or the latest since an epoch).
+    handle(self, request: tuple) -> Any
+        This method answers a request of the form (operation, *arguments).
+    '''
+
+    # constructor
+    #
+    def __init__(self, history: int=16) -> None:
+        '''This is the constructor.'''
+
+        self.epoch = 0
+        self.posts = {0: {}}
+        self.history = history
+    #
+    # end constructor
+
+    # method: get_epoch
+    #
+    def get_epoch(self) -> int:
+        '''This method returns the current epoch.'''
+
+        return self.epoch
+    #
+    # end method: get_epoch
+
+    # method: advance
+    #
+    def advance(self) -> int:
+        '''This method starts a new epoch (dropping posts older than the history) and returns it.'''
+
+        self.epoch = self.epoch+1
+        self.posts[self.epoch] = {}
+        self.posts.pop(self.epoch-self.history-1, None)
+        return self.epoch
+    #
+    # end method: advance
+
+    # method: write
+    #
+    def write(self, bkeys: dict[str, int]) -> None:
+        '''This method posts blind keys by node name in the current epoch.'''
+
+        posts = self.posts[self.epoch]
+        for name, b_key in bkeys.items():
+            posts[SharedKeyTable.position(name)] = int(b_key)
+    #
+    # end method: write
+
+    # method: read
+    #
+    def read(self, names: list[str], since: Optional[int]=None) -> dict[str, int]:
+        '''This method returns the named blind keys posted in the current epoch (or the latest since an epoch).'''
+
+        # the posts of a dropped epoch are gone, so a member that far behind has to rejoin
+        #
+        if since is not None and since < self.epoch-self.history:
+            raise ValueError(f"Epoch {since} is older than the {self.history} epochs kept")
+        first = self.epoch if since is None else since
+        bkeys = {}
+        for epoch in range(first, self.epoch+1):
+            posts = self.posts.get(epoch, {})
+            for name in names:
+                pos = SharedKeyTable.position(name)
+                if pos in posts:
+                    bkeys[name] = posts[pos]
+        return bkeys
+    #
+    # end method: read
+
+    # method: handle
+    #
+    def handle(self, request: tuple) -> Any:
+        '''This method answers a request of the form (operation, *arguments).'''
+
+        operation, *args = request
+        if operation == 'write':
+            return self.write(*args)
+        if operation == 'read':
+            return self.read(*args)
+        if operation == 'epoch':
+            return self.get_epoch()
+        raise ValueError(f"Unknown directory request: {operation}")
+    #
+    # end method: handle
+#
+# end class: KeyDirectory
+
+# function: directory_init
+#
+def directory_init(self, history: int) -> None:
+    '''This function gives the service agent its bulletin board.'''
+
+    self.directory = KeyDirectory(history)
+#
+# end function: directory_init
+
+# function: directory_advance
+#
+def directory_advance(self) -> int:
+    '''This function starts a new epoch on the service agent's bulletin board.'''
+
+    return self.directory.advance()
+#
+# end function: directory_advance
+
+# function: handle_request
+#
+def handle_request(agent: 'Proxy', request: tuple) -> Any:
+    '''This helper function answers a member's request to the directory (a rejected request is answered with the error).'''
+
+    try:
+        return agent.directory.handle(request)
+    except ValueError as err:
+        return err
+#
+# end function: handle_request
+
+# class: KeyDirectoryService
+#
+class KeyDirectoryService:
+    '''
+    Description
+    -----------
+    This class runs a KeyDirectory in its own agent behind a REP socket. Every member connects to it once, so
+    the number of connections grows with the number of members rather than with members times levels.
+
+    Attributes
+    ----------
+    agent : Proxy
+        The agent hosting the bulletin board
+    addr : AgentAddress
+        The address members connect their REQ sockets to
+
+    Methods
+    -------
+    advance(self) -> int
+        This method starts a new epoch and returns it.
+    close(self) -> None
+        This method shuts down the service agent.
+    '''
+
+    # constructor
+    #
+    def __init__(self, name: str='key_directory', history: int=16) -> None:
+        '''This is the constructor.'''
+
+        # osbrain is only needed for the service (the board itself runs in-process without it)
+        #
+        from osbrain import run_agent
+        self.agent = run_agent(name)
+        self.agent.set_method(directory_init, directory_advance)
+        self.agent.directory_init(history)
+        self.addr = self.agent.bind('REP', alias='directory', handler=handle_request)
+    #
+    # end constructor
+
+    # method: advance
+    #
+    def advance(self) -> int:
+        '''This method starts a new epoch and returns it.'''
+
+        return self.agent.directory_advance()
+    #
+    # end method: advance
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method shuts down the service agent.'''
+
+        self.agent.shutdown()
+    #
+    # end method: close
+#
+# end class: KeyDirectoryService
+
+# class: DirectoryClient
+#
+class DirectoryClient:
+    '''
+    Description
+    -----------
+    This class lets a member agent use the directory service with the same write/read interface as a
+    SharedKeyTable; every call is one request/reply on the agent's REQ socket.
+
+    Attributes
+    ----------
+    agent : Agent
+        The member agent owning the REQ socket
+    alias : str
+        The alias of the REQ socket
+
+    Methods
+    -------
+    write(self, bkeys: dict[str, int]) -> None
+        This method posts blind keys to the directory.
+    read(self, names: list[str], since: Optional[int]=None) -> dict[str, int]
+        This method fetches blind keys from the directory in one request.
+    request(self, *request: Any) -> Any
+        This method sends one request to the directory and returns the reply (raising the error of a rejected request).
+    '''
+
+    # constructor
+    #
+    def __init__(self, agent: Any, alias: str='directory') -> None:
+        '''This is the constructor.'''
+
+        self.agent = agent
+        self.alias = alias
+    #
+    # end constructor
+
+    # method: write
+    #
+    def write(self, bkeys: dict[str, int]) -> None:
+        '''This method posts blind keys to the directory.'''
+
+        self.request('write', bkeys)
+    #
+    # end method: write
+
+    # method: read
+    #
+    def read(self, names: list[str], since: Optional[int]=None) -> dict[str, int]:
+        '''This method fetches blind keys from the directory in one request.'''
+
+        return self.request('read', names, since)
+    #
+    # end method: read
+
+    # method: request
+    #
+    def request(self, *request: Any) -> Any:
+        '''This method sends one request to the directory and returns the reply (raising the error of a rejected request).'''
+
+        reply = self.agent.send_recv(self.alias, request)
+        if isinstance(reply, Exception):
+            raise reply
+        return reply
+    #
+    # end method: request
+#
+# end class: DirectoryClient
+#
+# end file: key_directory.py
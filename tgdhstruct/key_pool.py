@@ -0,0 +1,216 @@
+# file: key_pool.py
+#
+'''This file contains the KeyPairPool class and the per-process pool used for key generation.'''
+
+# import modules
+#
+import os
+import threading
+from collections import deque
+from typing import Optional
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.random_pool import get_pool
+
+# class: KeyPairPool
+#
+class KeyPairPool:
+    '''
+    Description
+    -----------
+    This class keeps ready (private key, blind key) pairs so that a member generating a new key (e.g. the
+    sponsor after a leave) does not compute g^k mod p on the rekey path. Taking a pair does not start a refill:
+    the refill thread holds the interpreter lock for every exponentiation, so running it next to the rekey
+    slows the rekey down by as much as the pair saved. The tree calls replenish() once it has announced its
+    new group key, and the thread refills the pool between rekeys. If the pool is empty, a pair is generated
+    on the spot.
+
+    Pairs are bound to the group parameters they were made with and dropped if p or g change. A forked child
+    drops the pairs it inherited (a private key must never be shared by two members). In the deterministic
+    mode of the random pool there is no background thread: the owner refills the pool in its idle time with
+    fill(), so that the order of random draws (and so every key) stays reproducible.
+    The exponentiations of refills are counted in <generated>, not in DataNode.exps.
+
+    Attributes
+    ----------
+    capacity : int
+        The number of pairs kept ready
+    pairs : deque[tuple[int, int]]
+        The ready pairs
+    params : tuple[int, int]
+        The group parameters (p, g) of the ready pairs
+    lock : threading.Lock
+        The lock guarding the pairs
+    wanted : threading.Event
+        The signal that wakes the refill thread
+    thread : threading.Thread
+        The refill thread (started on first use)
+    pid : int
+        The process the pairs belong to
+    hits : int
+        The number of pairs taken ready
+    misses : int
+        The number of pairs generated on the spot
+    generated : int
+        The number of pairs generated by refills
+
+    Methods
+    -------
+    generate(params: tuple[int, int]) -> tuple[int, int]
+        This method generates a pair for the group parameters.
+    reset(self) -> None
+        This method drops all pairs (and forgets the refill thread of a parent process).
+    take(self) -> tuple[int, int]
+        This method returns a ready pair (or generates one).
+    replenish(self) -> None
+        This method wakes the refill thread if pairs were taken (call it after a rekey, off its critical path).
+    fill(self, count: Optional[int]=None) -> int
+        This method generates pairs until the pool (or <count> more pairs) is ready and returns how many it made.
+    refill(self) -> None
+        This method is the body of the refill thread.
+    '''
+
+    # constructor
+    #
+    def __init__(self, capacity: int=4) -> None:
+        '''This is the constructor.'''
+
+        self.capacity = capacity
+        self.pairs = deque()
+        self.params = (DataNode.p, DataNode.g)
+        self.lock = threading.Lock()
+        self.wanted = threading.Event()
+        self.thread = None
+        self.pid = os.getpid()
+        self.hits = 0
+        self.misses = 0
+        self.generated = 0
+    #
+    # end constructor
+
+    # method: generate
+    #
+    @staticmethod
+    def generate(params: tuple[int, int]) -> tuple[int, int]:
+        '''This method generates a pair for the group parameters.'''
+
+        p, g = params
+        key = get_pool().randint(1, int(p-2))
+        return key, pow(g, key, p)
+    #
+    # end method: generate
+
+    # method: reset
+    #
+    def reset(self) -> None:
+        '''This method drops all pairs (and forgets the refill thread of a parent process).'''
+
+        self.pairs.clear()
+        self.lock = threading.Lock()
+        self.wanted = threading.Event()
+        self.thread = None
+        self.pid = os.getpid()
+    #
+    # end method: reset
+
+    # method: take
+    #
+    def take(self) -> tuple[int, int]:
+        '''This method returns a ready pair (or generates one).'''
+
+        if self.pid != os.getpid():
+            self.reset()
+        params = (DataNode.p, DataNode.g)
+        with self.lock:
+            if self.params != params:
+                self.pairs.clear()
+                self.params = params
+            pair = self.pairs.popleft() if self.pairs else None
+
+        # an empty pool costs the exponentiation now; the blind key is counted like any other
+        #
+        if pair is None:
+            self.misses = self.misses+1
+            DataNode.exps = DataNode.exps+1
+            pair = KeyPairPool.generate(params)
+        else:
+            self.hits = self.hits+1
+        return pair
+    #
+    # end method: take
+
+    # method: replenish
+    #
+    def replenish(self) -> None:
+        '''This method wakes the refill thread if pairs were taken (call it after a rekey, off its critical path).'''
+
+        # no refill thread while the random draws must stay in a reproducible order
+        #
+        if get_pool().deterministic:
+            return
+        if self.pid != os.getpid():
+            self.reset()
+        with self.lock:
+            if len(self.pairs) >= self.capacity:
+                return
+        if self.thread is None:
+            self.thread = threading.Thread(target=self.refill, name='key-pair-pool', daemon=True)
+            self.thread.start()
+        self.wanted.set()
+    #
+    # end method: replenish
+
+    # method: fill
+    #
+    def fill(self, count: Optional[int]=None) -> int:
+        '''This method generates pairs until the pool (or <count> more pairs) is ready and returns how many it made.'''
+
+        made = 0
+        while count is None or made < count:
+            with self.lock:
+                if count is None and len(self.pairs) >= self.capacity:
+                    break
+                params = self.params
+            pair = KeyPairPool.generate(params)
+            with self.lock:
+                if self.params == params:
+                    self.pairs.append(pair)
+            made = made+1
+            self.generated = self.generated+1
+        return made
+    #
+    # end method: fill
+
+    # method: refill
+    #
+    def refill(self) -> None:
+        '''This method is the body of the refill thread.'''
+
+        while True:
+            self.wanted.wait()
+            self.wanted.clear()
+            self.fill()
+    #
+    # end method: refill
+#
+# end class: KeyPairPool
+
+# the key pair pool of this process
+#
+_key_pool = KeyPairPool()
+
+# function: get_key_pool
+#
+def get_key_pool() -> KeyPairPool:
+    '''This function returns the key pair pool of this process.'''
+
+    return _key_pool
+#
+# end function: get_key_pool
+
+# drop inherited pairs right after a fork
+#
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=lambda: _key_pool.reset())
+
+#
+# end file: key_pool.py
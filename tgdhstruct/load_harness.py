@@ -0,0 +1,323 @@
+# file: load_harness.py
+#
+'''This file contains the LoadHarness class and the churn load-test command-line entry point.'''
+
+# import modules
+#
+import sys
+import json
+import heapq
+import random
+import argparse
+import contextlib
+from typing import Optional
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.random_pool import seed_pool
+from tgdhstruct.key_pool import get_key_pool
+from tgdhstruct.trace_replay import TraceReplay
+from tgdhstruct.tracing import get_tracer
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# function: percentile
+#
+def percentile(values: list[float], q: float) -> Optional[float]:
+    '''This function returns the nearest-rank percentile of a list of values.'''
+
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered)*q//100))
+    return ordered[int(rank)-1]
+#
+# end function: percentile
+
+# function: peak_rss_mb
+#
+def peak_rss_mb() -> Optional[float]:
+    '''This function returns the peak resident memory of this process in megabytes (None if unknown).'''
+
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak/(1024*1024 if sys.platform == 'darwin' else 1024), 1)
+#
+# end function: peak_rss_mb
+
+# class: LoadHarness
+#
+class LoadHarness:
+    '''
+    Description
+    -----------
+    This class drives a TGDH group with synthetic membership churn and measures how it copes.
+    Events are generated on a simulated clock and applied back to back; the wall-clock time of every event
+    (its rekey latency) is measured, together with the sponsor's exponentiations, the tree height and the group
+    size. Workloads:
+
+        poisson   joins and leaves arrive as independent Poisson processes
+        bursty    Poisson churn plus periodic mass leaves whose members rejoin shortly after
+        longtail  Poisson joins; every member stays for a Pareto-distributed session and then leaves
+
+    Exponentiations are counted in this process only, so they are reported for the 'tree' backend, where the
+    simulated tree only carries out the sponsor's rekey: the other members' recalculation of their key paths
+    (one exponentiation per level above the changed node, each) is not included. The sponsor's new key pair is
+    counted even when the key pair pool prepared it before the event.
+
+    Attributes
+    ----------
+    engine : TraceReplay
+        The group the events are applied to
+    rng : random.Random
+        The generator of the workload (not of any key)
+    clock : float
+        The simulated time
+    queue : list[tuple[float, int, str, Optional[int]]]
+        The scheduled events as (time, sequence, kind, member ID)
+    seq : int
+        The number of events scheduled so far (keeps the queue order stable)
+    records : list[dict]
+        The per-event measurements
+    skipped : int
+        The number of generated events that could not be applied
+
+    Methods
+    -------
+    schedule(self, delay: float, kind: str, member: Optional[int]=None) -> None
+        This method schedules an event <delay> time units from now.
+    height(self) -> int
+        This method returns the current height of the tree.
+    apply(self, kind: str, member: Optional[int]) -> Optional[dict]
+        This method applies one event and records its measurements.
+    run(self, workload: str, events: int, join_rate: float=1.0, leave_rate: float=1.0, burst_every: float=50.0, burst_fraction: float=0.2, tail_shape: float=1.5, mean_session: float=20.0) -> dict
+        This method runs a workload for a number of events and returns the summary.
+    summary(self, workload: str) -> dict
+        This method summarizes the recorded measurements.
+    close(self) -> None
+        This method shuts down the group.
+    '''
+
+    # constructor
+    #
+    def __init__(self, size: int, backend: str='tree', seed: Optional[int]=None) -> None:
+        '''This is the constructor.'''
+
+        # a seed also makes the private keys reproducible (deterministic random pool, benchmarks only)
+        #
+        if seed is not None:
+            seed_pool(str(seed).encode())
+        self.rng = random.Random(seed)
+        self.engine = TraceReplay(backend)
+        with contextlib.redirect_stdout(sys.stderr):
+            self.engine.start(size)
+        self.clock = 0.0
+        self.queue = []
+        self.seq = 0
+        self.records = []
+        self.skipped = 0
+    #
+    # end constructor
+
+    # method: schedule
+    #
+    def schedule(self, delay: float, kind: str, member: Optional[int]=None) -> None:
+        '''This method schedules an event <delay> time units from now.'''
+
+        heapq.heappush(self.queue, (self.clock+delay, self.seq, kind, member))
+        self.seq = self.seq+1
+    #
+    # end method: schedule
+
+    # method: height
+    #
+    def height(self) -> int:
+        '''This method returns the current height of the tree.'''
+
+        if self.engine.backend == 'agent':
+            return next(iter(self.engine.group.agents.values())).tree_summary()['height']
+        return self.engine.tree.root.height
+    #
+    # end method: height
+
+    # method: apply
+    #
+    def apply(self, kind: str, member: Optional[int]) -> Optional[dict]:
+        '''This method applies one event and records its measurements.'''
+
+        # leaves of departed members (or ones that would empty the group) are skipped
+        #
+        if kind == 'leave':
+            members = self.engine.members()
+            if member is None and len(members) > 2:
+                member = self.rng.choice(members)
+            if member not in members or len(members) <= 2:
+                self.skipped = self.skipped+1
+                return None
+
+        # a key pair taken ready from the pool was calculated before the event but is still part of its cost
+        #
+        pool = get_key_pool()
+        exps, hits = DataNode.exps, pool.hits
+        with contextlib.redirect_stdout(sys.stderr):
+            record = self.engine.apply({'event': kind, 'member': member})
+        if 'error' in record:
+            self.skipped = self.skipped+1
+            return None
+        record['t'] = round(self.clock, 4)
+        record['sponsor_exps'] = DataNode.exps-exps+pool.hits-hits
+        record['height'] = self.height()
+        self.records.append(record)
+
+        # prepare the next sponsors' key pairs between events (the pool has no refill thread with a seed)
+        #
+        pool.fill()
+        return record
+    #
+    # end method: apply
+
+    # method: run
+    #
+    def run(self, workload: str, events: int, join_rate: float=1.0, leave_rate: float=1.0, burst_every: float=50.0, burst_fraction: float=0.2, tail_shape: float=1.5, mean_session: float=20.0) -> dict:
+        '''This method runs a workload for a number of events and returns the summary.'''
+
+        if workload not in ('poisson', 'bursty', 'longtail'):
+            raise ValueError(f"Unknown workload: {workload}")
+
+        # function: session
+        #
+        def session() -> float:
+            '''This helper function draws a Pareto session length with the requested mean.'''
+
+            scale = mean_session*(tail_shape-1)/tail_shape if tail_shape > 1 else mean_session
+            return scale*self.rng.paretovariate(tail_shape)
+        #
+        # end function: session
+
+        # seed the event sources
+        #
+        self.schedule(self.rng.expovariate(join_rate), 'join')
+        if workload == 'longtail':
+            for mid in self.engine.members():
+                self.schedule(session(), 'leave', mid)
+        else:
+            self.schedule(self.rng.expovariate(leave_rate), 'leave')
+        if workload == 'bursty':
+            self.schedule(burst_every, 'burst')
+
+        start = len(self.records)
+        while len(self.records)-start < events and self.queue:
+            self.clock, _, kind, member = heapq.heappop(self.queue)
+
+            # a burst drops a fraction of the group at once (but no more events than requested); the members
+            # come back shortly after
+            #
+            if kind == 'burst':
+                members = self.engine.members()
+                count = min(int(len(members)*burst_fraction), len(members)-2)
+                for mid in self.rng.sample(members, count):
+                    if len(self.records)-start >= events:
+                        break
+                    self.apply('leave', mid)
+                    self.schedule(self.rng.expovariate(1.0), 'rejoin')
+                self.schedule(burst_every, 'burst')
+                continue
+
+            record = self.apply('join' if kind == 'rejoin' else kind, member)
+
+            # keep the sources going
+            #
+            if kind == 'join':
+                self.schedule(self.rng.expovariate(join_rate), 'join')
+                if workload == 'longtail' and record is not None:
+                    self.schedule(session(), 'leave', record['member'])
+            elif kind == 'leave' and workload != 'longtail':
+                self.schedule(self.rng.expovariate(leave_rate), 'leave')
+        return self.summary(workload)
+    #
+    # end method: run
+
+    # method: summary
+    #
+    def summary(self, workload: str) -> dict:
+        '''This method summarizes the recorded measurements.'''
+
+        latencies = [record['ms'] for record in self.records]
+        exps = [record['sponsor_exps'] for record in self.records]
+        return {
+            'workload': workload,
+            'backend': self.engine.backend,
+            'events': len(self.records),
+            'skipped': self.skipped,
+            'final_size': len(self.engine.members()),
+            'p50_ms': percentile(latencies, 50),
+            'p95_ms': percentile(latencies, 95),
+            'p99_ms': percentile(latencies, 99),
+            'max_ms': max(latencies, default=None),
+            'sponsor_exps_per_event': round(sum(exps)/len(exps), 2) if exps and self.engine.backend == 'tree' else None,
+            'max_height': max((record['height'] for record in self.records), default=None),
+            'final_height': self.height(),
+            'peak_rss_mb': peak_rss_mb(),
+        }
+    #
+    # end method: summary
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method shuts down the group.'''
+
+        self.engine.close()
+    #
+    # end method: close
+#
+# end class: LoadHarness
+
+# function: main
+#
+def main(argv: Optional[list[str]]=None) -> None:
+    '''This is the main function.'''
+
+    parser = argparse.ArgumentParser(description='Drive a TGDH group with synthetic membership churn and report rekey latency.')
+    parser.add_argument('--size', type=int, required=True, help='number of members in the initial group')
+    parser.add_argument('--workload', choices=('poisson', 'bursty', 'longtail'), default='poisson', help='churn pattern')
+    parser.add_argument('--events', type=int, default=1000, help='number of events to apply')
+    parser.add_argument('--backend', choices=('tree', 'agent'), default='tree', help='group implementation to load')
+    parser.add_argument('--join-rate', type=float, default=1.0, help='joins per time unit')
+    parser.add_argument('--leave-rate', type=float, default=1.0, help='leaves per time unit (poisson and bursty)')
+    parser.add_argument('--burst-every', type=float, default=50.0, help='time units between mass leaves (bursty)')
+    parser.add_argument('--burst-fraction', type=float, default=0.2, help='fraction of the group leaving in a burst (bursty)')
+    parser.add_argument('--tail-shape', type=float, default=1.5, help='Pareto shape of the session lengths (longtail)')
+    parser.add_argument('--mean-session', type=float, default=20.0, help='mean session length in time units (longtail)')
+    parser.add_argument('--seed', type=int, default=None, help='seed for a reproducible run (deterministic keys, benchmarks only)')
+    parser.add_argument('-o', '--output', default=None, help='path of a JSONL file receiving one record per event')
+    parser.add_argument('--trace', default=None, help='path of a Chrome/Perfetto trace JSON file of the protocol phases')
+    args = parser.parse_args(argv)
+    if args.trace is not None:
+        get_tracer().enable()
+
+    # run the workload and print the summary
+    #
+    harness = LoadHarness(args.size, args.backend, args.seed)
+    try:
+        summary = harness.run(args.workload, args.events, args.join_rate, args.leave_rate, args.burst_every,
+            args.burst_fraction, args.tail_shape, args.mean_session)
+    finally:
+        harness.close()
+    if args.output is not None:
+        with open(args.output, 'w', encoding='utf-8') as out:
+            for record in harness.records:
+                out.write(json.dumps(record) + '\n')
+    if args.trace is not None:
+        count = get_tracer().export(args.trace)
+        print(f"SYS: {count} trace events written to {args.trace}", file=sys.stderr)
+    print(json.dumps(summary, indent=2))
+
+# begin gracefully
+#
+if __name__ == '__main__':
+    main()
+
+#
+# end file: load_harness.py
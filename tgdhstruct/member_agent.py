@@ -4,13 +4,75 @@
 
 # import modules
 #
-import time
+import os
+import contextlib
+from collections import Counter
 from math import floor, log
-from copy import copy
+from typing import Any, Iterator, Optional
 from osbrain import run_nameserver
 from osbrain import run_agent
 from osbrain import Proxy, NSProxy, AgentAddress
 from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.connection_manager import ConnectionManager
+from tgdhstruct.shm_transport import SharedKeyTable
+from tgdhstruct.key_directory import KeyDirectoryService, DirectoryClient
+from tgdhstruct.event_journal import EventJournal
+from tgdhstruct.epoch_stream import Update, get_stream
+from tgdhstruct.schedule_planner import SchedulePlanner, Transmission
+from tgdhstruct.tracing import get_tracer, traced, TracedAgent
+
+# function: journal_record
+#
+def journal_record(self, op: str, *args: Any) -> None:
+    '''This helper function journals a change to the agent's tree (and snapshots the tree when one is due).'''
+
+    journal = getattr(self, 'journal', None)
+    if journal is None:
+        return
+    journal.append(op, *args)
+    if journal.since_snapshot >= journal.snapshot_every:
+        journal.snapshot(self.data)
+#
+# end function: journal_record
+
+# function: journal_snapshot
+#
+def journal_snapshot(self) -> None:
+    '''This helper function saves the agent's whole tree to its journal (after the tree was replaced).'''
+
+    if getattr(self, 'journal', None) is not None:
+        self.journal.snapshot(self.data)
+#
+# end function: journal_snapshot
+
+# function: journal_sync
+#
+def journal_sync(self) -> None:
+    '''This helper function waits until the agent's journal is durable (before a new blind key is published).'''
+
+    if getattr(self, 'journal', None) is not None:
+        self.journal.sync()
+#
+# end function: journal_sync
+
+# function: announced
+#
+@contextlib.contextmanager
+def announced(announce: bool) -> Iterator[list[Update]]:
+    '''This helper function collects the group-key updates announced in this process inside the block (if <announce>).'''
+
+    # the epoch stream of an agent process has no subscribers of its own: the updates go back to the controller
+    #
+    updates = []
+    unsubscribe = get_stream().subscribe(lambda *update: updates.append(update)) if announce else None
+    try:
+        yield updates
+    finally:
+        if unsubscribe is not None:
+            unsubscribe()
+#
+# end function: announced
 
 # function: receive_bkeys
 #
@@ -23,9 +85,23 @@ def receive_bkeys(agent: Proxy, message: str) -> None:
     node = newtree.find_node(data[0].lstrip('<').rstrip('>'), False)
     node.b_key = int(data[1])
     agent.set_data(newtree)
+    journal_record(agent, 'bkeys', {node.name: node.b_key})
 #
 # end function: receive_bkeys
 
+# function: receive_bkey_batch
+#
+def receive_bkey_batch(agent: Proxy, message: dict[str, int]) -> None:
+    '''This helper function processes a broadcast of refreshed blind keys.'''
+
+    agent.log_info(f"Received: {len(message)} blind keys")
+    newtree = agent.get_data()
+    newtree.set_blind_keys(message)
+    agent.set_data(newtree)
+    journal_record(agent, 'bkeys', message)
+#
+# end function: receive_bkey_batch
+
 # function: receive_tree
 #
 def receive_tree(agent: Proxy, tree: BinaryTree) -> None:
@@ -54,6 +130,303 @@ def get_data(self) -> BinaryTree:
 #
 # end function: set_data
 
+# function: get_blind_key
+#
+def get_blind_key(self, name: str) -> int:
+    '''This function returns the blind key of a node of the agent's tree.'''
+
+    return self.data.find_node(name.lstrip('<').rstrip('>'), False).b_key
+#
+# end function: get_blind_key
+
+# function: get_commitment
+#
+def get_commitment(self) -> str:
+    '''This function returns the agent's commitment to its group key.'''
+
+    return self.data.key_commitment()
+#
+# end function: get_commitment
+
+# function: shm_attach
+#
+def shm_attach(self, name: str) -> None:
+    '''This function attaches the agent to the shared blind-key table.'''
+
+    self.table = SharedKeyTable(name=name)
+#
+# end function: shm_attach
+
+# function: dir_attach
+#
+def dir_attach(self, addr: AgentAddress) -> None:
+    '''This function connects the agent to the blind-key directory service.'''
+
+    self.connect(addr, alias='directory')
+    self.table = DirectoryClient(self)
+#
+# end function: dir_attach
+
+# function: table_publish
+#
+def table_publish(self, names: Optional[list[str]]=None) -> int:
+    '''This function writes the agent's known key-path blind keys (or only the named ones) to the key table.'''
+
+    bkeys = {name: bkey for name, bkey in self.data.get_refreshed_blind_keys().items()
+        if bkey is not None and (names is None or name in names)}
+    self.table.write(bkeys)
+    return len(bkeys)
+#
+# end function: table_publish
+
+# function: table_pull
+#
+def table_pull(self, since: Optional[int]=None) -> int:
+    '''This function reads the co-path blind keys refreshed in this epoch (or since an epoch) from the key table.'''
+
+    bkeys = self.table.read([node.name for node in self.data.my_node.get_co_path()], since)
+    self.data.set_blind_keys(bkeys)
+    journal_record(self, 'bkeys', bkeys)
+    return len(bkeys)
+#
+# end function: table_pull
+
+# function: tree_build
+#
+def tree_build(self, size: int, uid: int, layout: str) -> None:
+    '''This function builds the agent's tree in the agent's process.'''
+
+    self.data = BinaryTree(size, uid, layout=layout)
+    journal_snapshot(self)
+#
+# end function: tree_build
+
+# function: tree_plan
+#
+def tree_plan(self, event: str, *args: int) -> list[list[Transmission]]:
+    '''This function plans the messages of an exchange ('initial', 'join' or 'leave') from the agent's tree.'''
+
+    return SchedulePlanner.plan(self.data, event, *args)
+#
+# end function: tree_plan
+
+# function: tree_initial_step
+#
+def tree_initial_step(self, level: int, announce: bool=False) -> list[Update]:
+    '''This function calculates the next level of the agent's key path in the initial exchange and returns the updates announced.'''
+
+    with announced(announce) as updates:
+        self.data.initial_calculate_group_key(level)
+    journal_record(self, 'initial', level)
+    if self.data.verbose:
+        self.data.tree_print()
+    return updates
+#
+# end function: tree_initial_step
+
+# function: tree_join
+#
+def tree_join(self) -> Optional[int]:
+    '''This function applies a join event to the agent's tree and returns the new member's ID if it is the sponsor.'''
+
+    self.data.join_event()
+    journal_record(self, 'join')
+    return self.data.nextmemb-1 if self.data.my_node.ntype == 'spon' else None
+#
+# end function: tree_join
+
+# function: tree_leave
+#
+def tree_leave(self, eid: int) -> bool:
+    '''This function applies a leave event to the agent's tree and returns whether it is the sponsor.'''
+
+    self.data.leave_event(eid)
+    journal_record(self, 'leave', eid)
+    return self.data.my_node.ntype == 'spon'
+#
+# end function: tree_leave
+
+# function: tree_send
+#
+def tree_send(self, alias: str, topic: str) -> None:
+    '''This function publishes the agent's tree without its private keys (the sponsor to a joining member).'''
+
+    # the message is serialized while sending, so the keys can be put back right after
+    #
+    stripped = self.data.strip_private_keys()
+    try:
+        self.send(alias, self.data, topic=topic)
+    finally:
+        self.data.restore_private_keys(stripped)
+#
+# end function: tree_send
+
+# function: tree_new_member
+#
+def tree_new_member(self) -> None:
+    '''This function lets a joining agent find itself in the received tree and generate its keys.'''
+
+    self.data.new_member_protocol()
+    journal_snapshot(self)
+#
+# end function: tree_new_member
+
+# function: tree_share
+#
+def tree_share(self) -> Transmission:
+    '''This function plans the message carrying the agent's own blind key (a joining member's first message).'''
+
+    return SchedulePlanner.share(self.data)
+#
+# end function: tree_share
+
+# function: tree_rekey
+#
+def tree_rekey(self, generate: bool, announce: bool=False) -> tuple[dict[str, int], list[Update]]:
+    '''This function lets the sponsor calculate the group key (with new keys if <generate>) and returns its refreshed blind keys and the updates announced.'''
+
+    if generate:
+        self.data.key_generation()
+        journal_record(self, 'key', self.data.my_node.key, self.data.my_node.b_key)
+    with announced(announce) as updates:
+        self.data.calculate_group_key()
+    journal_record(self, 'calculate')
+    if self.data.verbose:
+        self.data.tree_print()
+    if generate:
+        journal_sync(self)
+    return self.data.get_refreshed_blind_keys(), updates
+#
+# end function: tree_rekey
+
+# function: tree_calculate
+#
+def tree_calculate(self, announce: bool=False) -> tuple[str, list[Update]]:
+    '''This function calculates the group key and returns the agent's commitment to it and the updates announced.'''
+
+    with announced(announce) as updates:
+        self.data.calculate_group_key()
+    journal_record(self, 'calculate')
+    if self.data.verbose:
+        self.data.tree_print()
+    return self.data.key_commitment(), updates
+#
+# end function: tree_calculate
+
+# function: tree_region
+#
+def tree_region(self, event: tuple[str, Optional[int]]) -> set[int]:
+    '''This function returns the member IDs below the subtree that an event changes.'''
+
+    if event[0] == 'join':
+        # the insertion leaf is split into the sponsor and the new member
+        #
+        return {self.data.find_insertion().mid, self.data.nextmemb}
+
+    # the parent of the leaving member is replaced by the sibling subtree
+    #
+    node = self.data.find_node(event[1], True)
+    return {leaf.mid for leaf in node.parent.leaves}
+#
+# end function: tree_region
+
+# function: tree_prepare
+#
+def tree_prepare(self, generate: bool) -> list[str]:
+    '''This function clears a sponsor's key path (after new keys if <generate>) and returns the stale node names.'''
+
+    if generate:
+        self.data.key_generation()
+        journal_record(self, 'key', self.data.my_node.key, self.data.my_node.b_key)
+    self.data.clear_path_keys()
+    journal_record(self, 'clear')
+    if generate:
+        journal_sync(self)
+    return [node.name for node in self.data.my_node.get_key_path() if node.ntype != 'root']
+#
+# end function: tree_prepare
+
+# function: tree_partial
+#
+def tree_partial(self, pending: set[str], announce: bool=False) -> tuple[dict[str, int], bool, list[Update]]:
+    '''This function calculates as far up the key path as the pending blind keys allow and returns the new ones (and the updates announced).'''
+
+    with announced(announce) as updates:
+        bkeys = self.data.calculate_partial_group_key(pending)
+    journal_record(self, 'partial', sorted(pending))
+    return bkeys, self.data.root.key is not None, updates
+#
+# end function: tree_partial
+
+# function: tree_co_path
+#
+def tree_co_path(self) -> list[str]:
+    '''This function returns the names of the nodes on the agent's co-path.'''
+
+    return [node.name for node in self.data.my_node.get_co_path()]
+#
+# end function: tree_co_path
+
+# function: tree_summary
+#
+def tree_summary(self) -> dict[str, Any]:
+    '''This function returns the height, the epoch and the group key of the agent's tree.'''
+
+    return {'height': self.data.root.height, 'epoch': self.data.epoch, 'key': self.data.root.key}
+#
+# end function: tree_summary
+
+# function: journal_attach
+#
+def journal_attach(self, path: str, snapshot_every: int) -> None:
+    '''This function opens the agent's journal (the tree is journaled from its next change on).'''
+
+    self.journal = EventJournal(path, snapshot_every)
+#
+# end function: journal_attach
+
+# function: journal_recover
+#
+def journal_recover(self) -> Optional[str]:
+    '''This function rebuilds the agent's tree from its journal and returns the commitment to the recovered group key.'''
+
+    self.data = self.journal.recover()
+    return self.data.key_commitment() if self.data is not None else None
+#
+# end function: journal_recover
+
+# function: trace_enable
+#
+def trace_enable(self, origin: float) -> None:
+    '''This function turns on tracing in the agent's process (with the controller's time origin).'''
+
+    tracer = get_tracer()
+    tracer.origin = origin
+    tracer.enable()
+#
+# end function: trace_enable
+
+# function: trace_collect
+#
+def trace_collect(self) -> list[dict]:
+    '''This function returns and drops the trace events recorded in the agent's process.'''
+
+    tracer = get_tracer()
+    events = list(tracer.events)
+    tracer.clear()
+    return events
+#
+# end function: trace_collect
+
+# the methods installed in every member agent: each event runs on the agent's own tree and only small results
+# (sponsor status, schedules, blind keys, commitments) cross the proxy
+#
+MEMBER_METHODS = (
+    set_data, get_data, get_blind_key, get_commitment, shm_attach, dir_attach, table_publish, table_pull,
+    tree_build, tree_plan, tree_initial_step, tree_join, tree_leave, tree_send, tree_new_member, tree_share,
+    tree_rekey, tree_calculate, tree_region, tree_prepare, tree_partial, tree_co_path, tree_summary,
+    journal_attach, journal_snapshot, journal_recover, trace_enable, trace_collect)
+
 # class: MemberAgent
 #
 class MemberAgent():
@@ -61,13 +434,17 @@ class MemberAgent():
     Description
     -----------
     This class manages the multi-agent system used to faciliate the TGDH scheme.
+    Every member's tree lives in its agent: the protocol steps run there as remote methods (MEMBER_METHODS) and
+    only small results (sponsor status, schedules, blind keys, commitments) come back to the controller. The
+    group-key updates the members announce come back with the results and are republished on the controller's
+    epoch stream; the spans the members record while tracing are gathered by collect_traces().
 
     Attributes
     ----------
     agents : list[Proxy]
         A list of the agents
-    addr : list[AgentAddress]
-        A list of the addresses used for communication
+    connections : ConnectionManager
+        The persistent publisher/subscriber sockets used for communication
     size : int
         The number of members in the group
     nodemax : int
@@ -84,36 +461,84 @@ class MemberAgent():
         The member ID of the new member
     nameserver : NSProxy
         The running nameserver
+    broadcast : bool
+        Whether the sponsor publishes the whole refreshed key path in one round after an event
+    table : SharedKeyTable | KeyDirectoryService
+        The blind-key table of the 'shm' or 'directory' transport (None for the 'socket' transport)
+    max_size : int
+        The largest group the 'shm' key table has room for
+    omniscient : bool
+        Whether the initial group key is calculated once by the controller instead of exchanged (simulation only)
+    workers : int
+        The number of processes calculating a level of the tree in omniscient mode
+    layout : str
+        The shape of the members' trees: 'balanced' or 'str' (skinny, constant-round joins)
+    journal : str
+        The directory of the members' write-ahead journals (None if the members keep no journal)
+    snapshot_every : int
+        The number of journal records after which a member snapshots its tree
 
     Methods
     -------
-    send_info(self, agent: Proxy, channel: str, data_message: str) -> None:
-        This method sends information to a publishing channel.
+    spawn(self, mid: int) -> Proxy:
+        This method starts the agent of a member with the member methods, the key table and the journal attached.
+    send_info(self, mid: int, topic: str, data_message: Any) -> None:
+        This method sends information to a publishing topic.
+    republish(self, updates: list[Update]) -> None:
+        This method announces the group-key updates of member agents on the controller's epoch stream.
+    collect_traces(self, mids: Optional[list[int]]=None) -> int:
+        This method moves the trace events recorded in the member agents (or in some of them) to the controller's tracer.
+    attach_table(self, agent: Proxy) -> None:
+        This method attaches an agent to the blind-key table of the transport.
+    check_room(self, size: int) -> None:
+        This method raises a ValueError if the transport has no room for a group of <size> members.
     close_connections(self) -> None:
-        This method closes all agent connections.
+        This method drops all topic subscriptions while keeping the agent connections alive.
     initial_key_exchange(self) -> None:
         This method facilitates the initial key exchange algorithmically.
-    join_key_exchange(self) -> None:
+    omniscient_key_exchange(self, trees: dict[int, BinaryTree]) -> None:
+        This method calculates every node key once and seeds the members' trees with their paths (simulation only).
+    broadcast_key_exchange(self, receivers: set[int], bkeys: dict[str, int]) -> None:
+        This method lets the sponsor publish all refreshed blind keys in a single round.
+    rekey_key_exchange(self, schedule: list[list[Transmission]], bkeys: dict[str, int]) -> None:
+        This method runs a planned rekey: the sponsor sends every refreshed blind key to its receivers.
+    join_key_exchange(self, bkeys: dict[str, int]) -> None:
         This method facilitates the key exchange for a join event algorithmically.
+    apply_join(self) -> None:
+        This method updates all trees for a joining member and hands the tree to the new member.
     join_protocol(self) -> None:
         This method facilitates a new member joining the group.
-    leave_key_exchange(self):
+    leave_key_exchange(self, bkeys: dict[str, int]):
         This method the key exchange for a leave event algorithmically.
+    apply_leave(self, eid: int) -> None:
+        This method removes a leaving member and updates all trees; the sponsor is found.
     leave_protocol(self, eid: int):
         This method facilitates a member leaving the group.
+    verify_convergence(self) -> list[int]:
+        This method collects every member's key commitment and returns the members that diverged.
+    recover_member(self, mid: int) -> bool:
+        This method restarts a member whose process died from its journal and returns whether it holds the group key.
     close(self) -> None:
-        This method shuts down the nameserver.
+        This method closes all agent connections and shuts down the nameserver.
     '''
 
     # constructor
     #
-    def __init__(self, size: int) -> None:
+    def __init__(self, size: int, broadcast: bool=False, transport: str='socket', omniscient: bool=False, workers: int=4, layout: str='balanced',
+        journal: Optional[str]=None, snapshot_every: int=256, max_size: Optional[int]=None) -> None:
         '''This is the constructor.'''
 
+        if transport not in ('socket', 'shm', 'directory'):
+            raise ValueError(f"Unknown transport: {transport}")
+        if transport == 'shm' and layout != 'balanced':
+            raise ValueError("The 'shm' transport indexes a balanced tree by position")
+        if max_size is not None and max_size < size:
+            raise ValueError(f"The initial group ({size} members) is larger than max_size ({max_size})")
+
         # define class data
         #
         self.agents = {}
-        self.addr = {}
+        self.connections = ConnectionManager(self.agents)
         self.size = size
         self.nodemax = (2*self.size)-1
         self.max_height = floor(log((self.nodemax-1),2))
@@ -121,38 +546,133 @@ class MemberAgent():
         self.new_memb = None
         self.spon_id = None
         self.new_id = None
+        self.broadcast = broadcast
+        self.omniscient = omniscient
+        self.workers = workers
+        self.layout = layout
+        self.journal = journal
+        self.snapshot_every = snapshot_every
+        self.max_size = max_size if max_size is not None else 32*size
+        if journal is not None:
+            os.makedirs(journal, exist_ok=True)
 
         # system deployment
         #
         self.nameserver = run_nameserver()
 
+        # with the 'shm' transport, blind keys go through a table in shared memory (sized for <max_size> members)
+        # instead of sockets; with the 'directory' transport, through a bulletin-board agent every member holds
+        # a single connection to
+        #
+        self.table = None
+        if transport == 'shm':
+            self.table = SharedKeyTable(SharedKeyTable.levels_for(self.max_size))
+        elif transport == 'directory':
+            self.table = KeyDirectoryService()
+
         # initialize the tree
         #
         self.initial_key_exchange()
     #
     # end constructor
 
+    # method: spawn
+    #
+    def spawn(self, mid: int) -> Proxy:
+        '''This method starts the agent of a member with the member methods, the key table and the journal attached.'''
+
+        # the agent is wrapped so its remote calls are traced if tracing is on
+        #
+        agent = run_agent(f'mem_{mid}')
+        agent = TracedAgent(agent, mid) if get_tracer().enabled else agent
+        agent.set_method(*MEMBER_METHODS)
+        if get_tracer().enabled:
+            agent.trace_enable(get_tracer().origin)
+        if self.table is not None:
+            self.attach_table(agent)
+        if self.journal is not None:
+            agent.journal_attach(os.path.join(self.journal, f'mem_{mid}'), self.snapshot_every)
+        return agent
+    #
+    # end method: spawn
+
     # method: send_info
     #
-    def send_info(self, agent: Proxy, channel: str, data_message: str) -> None:
-        '''This method sends information to a publishing channel.'''
+    def send_info(self, mid: int, topic: str, data_message: Any) -> None:
+        '''This method sends information to a publishing topic.'''
 
-        agent.send(channel, data_message)
+        self.connections.publish(mid, topic, data_message)
     #
     # end method: send_info
 
+    # method: republish
+    #
+    def republish(self, updates: list[Update]) -> None:
+        '''This method announces the group-key updates of member agents on the controller's epoch stream.'''
+
+        stream = get_stream()
+        for update in updates:
+            stream.publish(*update)
+    #
+    # end method: republish
+
+    # method: collect_traces
+    #
+    def collect_traces(self, mids: Optional[list[int]]=None) -> int:
+        '''This method moves the trace events recorded in the member agents (or in some of them) to the controller's tracer.'''
+
+        # the tree spans are recorded in the agent processes; they are lost with an agent that is not collected
+        # before it shuts down
+        #
+        tracer = get_tracer()
+        if not tracer.enabled:
+            return 0
+        count = 0
+        for mid in self.agents if mids is None else mids:
+            events = self.agents[mid].trace_collect()
+            tracer.events.extend(events)
+            count = count+len(events)
+        return count
+    #
+    # end method: collect_traces
+
+    # method: attach_table
+    #
+    def attach_table(self, agent: Proxy) -> None:
+        '''This method attaches an agent to the blind-key table of the transport.'''
+
+        if isinstance(self.table, SharedKeyTable):
+            agent.shm_attach(self.table.name)
+        else:
+            agent.dir_attach(self.table.addr)
+    #
+    # end method: attach_table
+
+    # method: check_room
+    #
+    def check_room(self, size: int) -> None:
+        '''This method raises a ValueError if the transport has no room for a group of <size> members.'''
+
+        # the shared-memory table cannot grow under the attached agents, so a join beyond it is refused before
+        # any tree changes
+        #
+        if isinstance(self.table, SharedKeyTable) and size > self.max_size:
+            raise ValueError(f"The 'shm' key table has room for {self.max_size} members (set max_size)")
+    #
+    # end method: check_room
+
     # method: close_connections
     #
     def close_connections(self) -> None:
-        '''This method closes all agent connections.'''
+        '''This method drops all topic subscriptions while keeping the agent connections alive.'''
 
-        for agent in self.agents.items():
-            agent[1].close_all()
+        self.connections.clear_topics()
     #
     # end method: close_connections
 
     # method: initial_key_exchange
     #
+    @traced('agent.initial_key_exchange', 'agent')
     def initial_key_exchange(self) -> None:
         '''This method facilitates the initial key exchange algorithmically.'''
 
@@ -160,240 +680,293 @@ class MemberAgent():
         #
         print(f"\n{'Key Exchange (Init)'.center(80, '=')}")
 
-        # initialize all agents with their trees and co-paths
+        # start all agents
         #
-        key_paths = []
-        co_paths = []
-        iters = [0]*self.size
         for i in range(self.size):
-            mem = f'mem_{i+1}'
-            self.agents[i+1] = run_agent(mem)
-            self.agents[i+1].set_method(set_data, get_data)
-            self.agents[i+1].set_data(BinaryTree(self.size, i+1))
-            temp_key_path = []
-            for node in self.agents[i+1].get_data().my_node.get_key_path():
-                temp_key_path.append(node.name)
-            key_paths.append(temp_key_path)
-            temp_co_path = []
-            for node in self.agents[i+1].get_data().my_node.get_co_path():
-                temp_co_path.append(node.name)
-            co_paths.append(temp_co_path)
-
-        # pad the co-path lists to account for co-paths of varying lengths
+            self.agents[i+1] = self.spawn(i+1)
+
+        # skip the exchange if the controller calculates the keys
         #
-        for i in range(self.size):
-            if len(co_paths[i]) < self.max_height:
-                co_padding = [None]*(self.max_height-len(co_paths[i]))
-                key_padding = [None]*(self.max_height-len(key_paths[i])+1)
-                co_paths[i] = co_padding + co_paths[i]
-                key_paths[i] = key_padding + key_paths[i]
+        if self.omniscient:
+            self.omniscient_key_exchange({key: BinaryTree(self.size, key, verbose=False, layout=self.layout) for key in self.agents})
+            return
+
+        # every agent builds its own tree; one of them plans every round (all initial trees have the same shape)
+        #
+        for key, agent in self.agents.items():
+            agent.tree_build(self.size, key, self.layout)
+        schedule = self.agents[1].tree_plan('initial')
+        iters = [0]*self.size
 
         # perform the send-receive communication protocol
         #
-        for i in range(self.max_height):
+        if self.table is not None:
+            self.table.advance()
+        for i, transmissions in enumerate(schedule):
+            receivers = sorted(SchedulePlanner.receivers([transmissions]))
+            get_tracer().instant('init.round', level=len(schedule)-i, messages=len(transmissions))
 
-            # establish publishers (each node will publish)
+            # write this level's blind keys to the key table; members read them back without waiting
             #
-            self.addr = {}
-            for key, agent in self.agents.items():
-                mem = f'mem_{key}'
-                self.addr[key] = agent.bind('PUB', alias=mem)
+            if self.table is not None:
+                for message in transmissions:
+                    self.agents[message.sender].table_publish([message.name])
+                for key in receivers:
+                    self.agents[key].table_pull()
+            else:
 
-            # establish subscribers (proper co-path member)
-            #
-            for key, agent in self.agents.items():
-                dest_name = co_paths[key-1][i]
-                if dest_name is not None:
-                    dest_node = agent.get_data().find_node(dest_name.lstrip('<').rstrip('>'), False)
-                    dest_mem = dest_node.leaves[0].mid
-                    agent.connect(self.addr[dest_mem], handler=receive_bkeys)
-
-            # send blind keys for the proper node
-            #
-            print('')
-            for key, agent in self.agents.items():
-                mem = f'mem_{key}'
-                key_node = key_paths[key-1][i]
-                if key_node is not None:
-                    blind_key = agent.get_data().find_node(key_node.lstrip('<').rstrip('>'), False).b_key
-                    message = f'{key_node}:{blind_key}'
-                    self.send_info(agent, mem, message)
+                # subscribe the receivers to the sender (each node is published on the topic of its name)
+                #
+                for message in transmissions:
+                    for key in message.receivers:
+                        self.connections.subscribe(key, message.sender, message.name, receive_bkeys)
+
+                # send blind keys for the proper node
+                #
+                print('')
+                for message in transmissions:
+                    blind_key = self.agents[message.sender].get_blind_key(message.name)
+                    self.send_info(message.sender, message.name, f'{message.name}:{blind_key}')
+                get_tracer().sleep(1)
 
             # calculate appropriate blind keys
             #
-            time.sleep(1)
-            for key, agent in self.agents.items():
-                if co_paths[key-1][i] is not None:
-                    newtree = agent.get_data()
-                    newtree.initial_calculate_group_key(iters[key-1])
-                    iters[key-1] = iters[key-1]+1
-                    agent.set_data(newtree)
-                    agent.get_data().tree_print()
-
-            # close connections to prevent unnecessary sending/receiving
+            for key in receivers:
+                self.republish(self.agents[key].tree_initial_step(iters[key-1], get_stream().active()))
+                iters[key-1] = iters[key-1]+1
+
+            # drop this level's subscriptions to prevent unnecessary receiving
             #
             self.close_connections()
 
             # increment the level
             #
-            time.sleep(1)
-            print(f"\nSYS: Level {self.max_height-i} finished -- keys exchanged!")
+            if self.table is None:
+                get_tracer().sleep(1)
+            print(f"\nSYS: Level {len(schedule)-i} finished -- keys exchanged!")
 
         print("\nSYS: Tree initialization completed!")
         print("SYS: All initial members have computed the group key.")
     #
     # end method: initial_key_exchange
 
-    # method: join_key_exchange
+    # method: omniscient_key_exchange
     #
-    def join_key_exchange(self) -> None:
-        '''This method facilitates the key exchange for a join event algorithmically.'''
+    @traced('agent.omniscient_key_exchange', 'agent')
+    def omniscient_key_exchange(self, trees: dict[int, BinaryTree]) -> None:
+        '''This method calculates every node key once and seeds the members' trees with their paths (simulation only).'''
 
-        # print a divider
+        # the controller sees every member's private key: one tree holding all of them is calculated bottom-up,
+        # each node once and each level as one batch on the worker pool, instead of every member calculating
+        # its own key path over O(log n) rounds
         #
-        print(f"\n{'Key Exchange (Join)'.center(80, '=')}")
+        exps = DataNode.exps
+        whole = BinaryTree(self.size, 1, verbose=False, layout=self.layout)
+        for leaf in whole.root.leaves:
+            leaf.key = trees[leaf.mid].my_node.key
+        node_keys = whole.compute_node_keys(self.workers)
+
+        # every member takes its key path and co-path from the result (the trees are built quietly in the
+        # controller and report their events once they are in the agents)
+        #
+        for key, tree in trees.items():
+            tree.seed_path(node_keys)
+            tree.verbose = True
+            self.agents[key].set_data(tree)
+            if self.journal is not None:
+                self.agents[key].journal_snapshot()
+        print(f"\nSYS: {len(node_keys)} node keys calculated once ({DataNode.exps-exps} exponentiations, {self.workers} workers).")
+        print("SYS: Tree initialization completed!")
+        print("SYS: All initial members have computed the group key.")
+    #
+    # end method: omniscient_key_exchange
+
+    # method: broadcast_key_exchange
+    #
+    @traced('agent.broadcast_key_exchange', 'agent')
+    def broadcast_key_exchange(self, receivers: set[int], bkeys: dict[str, int]) -> None:
+        '''This method lets the sponsor publish all refreshed blind keys in a single round.'''
 
-        # get the update paths of all members
+        # through the key table: the sponsor writes its key path, members with keys to update read them
         #
-        update_paths = {}
-        for key, agent in self.agents.items():
-            if key not in (self.spon_id, self.new_id):
-                temp_update_path = []
-                for node in agent.get_data().get_update_path():
-                    temp_update_path.append(node.name)
-                update_paths[key] = list(reversed(temp_update_path))
-            else:
-                update_paths[key] = None
+        if self.table is not None:
+            count = self.sponsor.table_publish()
+            for key in receivers:
+                self.agents[key].table_pull()
+            print(f"\nSYS: {count} refreshed blind keys shared -- keys exchanged!")
+            return
+
+        # every member with keys to update subscribes to the sponsor
+        #
+        for key in receivers:
+            self.connections.subscribe(key, self.spon_id, 'rekey', receive_bkey_batch)
+
+        # sponsor sends its whole key path; members keep the keys on their co-paths
+        #
+        print('')
+        self.send_info(self.spon_id, 'rekey', bkeys)
+
+        # drop the subscriptions once the keys have been received
+        #
+        get_tracer().sleep(1)
+        self.close_connections()
+        print(f"\nSYS: {len(bkeys)} refreshed blind keys broadcast -- keys exchanged!")
+    #
+    # end method: broadcast_key_exchange
+
+    # method: rekey_key_exchange
+    #
+    @traced('agent.rekey_key_exchange', 'agent')
+    def rekey_key_exchange(self, schedule: list[list[Transmission]], bkeys: dict[str, int]) -> None:
+        '''This method runs a planned rekey: the sponsor sends every refreshed blind key to its receivers.'''
 
-        # get the sponsor's key path
+        # nothing to send (e.g. a join at the top of a skinny tree)
         #
-        spon_key_path = []
-        for node in self.sponsor.get_data().my_node.get_key_path():
-            spon_key_path.append(node.name)
+        if not schedule:
+            return
 
-        for i in range(len(spon_key_path)-2):
+        # publish the whole refreshed path in one round if broadcasting (or sharing a key table)
+        #
+        if self.broadcast or self.table is not None:
+            self.broadcast_key_exchange(SchedulePlanner.receivers(schedule), bkeys)
+            return
 
-            # only the sponsor will publish
-            #
-            mem = f'mem_{self.spon_id}'
-            self.addr[self.spon_id] = self.sponsor.bind('PUB', alias=mem)
+        for transmissions in schedule:
+            get_tracer().instant('rekey.round', level=transmissions[0].level, sponsor=self.spon_id)
 
-            # establish subscribers (sponsor will publish)
+            # establish subscribers (only the sponsor will publish)
             #
-            key_node = spon_key_path[i+1]
-            for key, agent in self.agents.items():
-                if update_paths[key] is not None:
-                    if key_node in update_paths[key]:
-                        dest_name = key_node
-                        if dest_name is not None:
-                            agent.connect(self.addr[self.spon_id], handler=receive_bkeys)
+            for message in transmissions:
+                for key in message.receivers:
+                    self.connections.subscribe(key, message.sender, message.name, receive_bkeys)
 
             # sponsor sends appropriate blind keys
             #
-            blind_key = self.sponsor.get_data().find_node(key_node.lstrip('<').rstrip('>'), False).b_key
-            message = f'{key_node}:{blind_key}'
             print('')
-            self.send_info(self.sponsor, mem, message)
+            for message in transmissions:
+                self.send_info(message.sender, message.name, f'{message.name}:{bkeys[message.name]}')
 
-            # close connections to prevent unnecessary sending/receiving
+            # drop this level's subscriptions to prevent unnecessary receiving
             #
+            get_tracer().sleep(1)
             self.close_connections()
 
             # increment the level
             #
-            time.sleep(1)
-            print(f"\nSYS: Level {self.sponsor.get_data().my_node.l-i-1} finished -- keys exchanged!")
+            print(f"\nSYS: Level {transmissions[0].level} finished -- keys exchanged!")
+    #
+    # end method: rekey_key_exchange
+
+    # method: join_key_exchange
+    #
+    @traced('agent.join_key_exchange', 'agent')
+    def join_key_exchange(self, bkeys: dict[str, int]) -> None:
+        '''This method facilitates the key exchange for a join event algorithmically.'''
+
+        # print a divider
         #
-        # end method: join_key_exchange
+        print(f"\n{'Key Exchange (Join)'.center(80, '=')}")
 
-    # method: join_protocol
+        # plan the exchange once in the sponsor's agent
+        #
+        schedule = self.sponsor.tree_plan('join', self.spon_id, self.new_id)
+        self.rekey_key_exchange(schedule, bkeys)
     #
-    def join_protocol(self) -> None:
-        '''This method facilitates a new member joining the group.'''
+    # end method: join_key_exchange
 
-        print(f"\n{'Join Event'.center(80, '=')}")
+    # method: apply_join
+    #
+    @traced('agent.apply_join', 'agent')
+    def apply_join(self) -> None:
+        '''This method updates all trees for a joining member and hands the tree to the new member.'''
+
+        self.check_room(len(self.agents)+1)
 
         # alert current members that a new member is joining; find the sponsor
         #
         for key, agent in self.agents.items():
-            newtree = agent.get_data()
-            newtree.join_event()
-            agent.set_data(newtree)
-            if agent.get_data().my_node.ntype == 'spon':
+            new_id = agent.tree_join()
+            if new_id is not None:
                 self.sponsor = agent
+                self.spon_id = key
+                self.new_id = new_id
 
         # initialize the joining member
         #
-        self.new_id = self.sponsor.get_data().nextmemb-1
-        mem = f'mem_{self.new_id}'
-        self.agents[self.new_id] = run_agent(mem)
+        self.agents[self.new_id] = self.spawn(self.new_id)
         self.new_memb = self.agents[self.new_id]
-        self.new_memb.set_method(set_data, get_data)
         self.new_memb.set_data(None)
+        if self.table is not None:
+            self.table.advance()
 
         # joining member subscribes to the sponsor
         #
-        mem = f'mem_{self.sponsor.get_data().uid}'
-        self.addr[self.sponsor.get_data().uid] = self.sponsor.bind('PUB', alias=mem)
-        dest_mem = self.sponsor.get_data().uid
-        self.new_memb.connect(self.addr[dest_mem], handler=receive_tree)
+        self.connections.subscribe(self.new_id, self.spon_id, 'tree', receive_tree)
 
-        # sponsor sends the tree to the joining member
+        # sponsor sends its tree (without its key) to the joining member straight from its agent
         #
-        self.spon_id = self.sponsor.get_data().uid
-        stree = copy(self.sponsor.get_data())
-        stree.my_node.key = None
-        print(f"\nSYS: Member {self.sponsor.get_data().uid} is sending the tree ...\n")
-        self.send_info(self.sponsor, mem, stree)
+        print(f"\nSYS: Member {self.spon_id} is sending the tree ...\n")
+        self.sponsor.tree_send(self.connections.ready(self.spon_id), 'tree')
 
         # allow new member to update its tree
         #
-        time.sleep(1)
-        newtree = self.new_memb.get_data()
-        newtree.new_member_protocol()
-        self.new_memb.set_data(newtree)
+        get_tracer().sleep(1)
+        self.new_memb.tree_new_member()
 
-        # close connections
+        # drop the tree subscription
         #
         self.close_connections()
+    #
+    # end method: apply_join
 
-        # new member shares blind key with sponsor
+    # method: join_protocol
+    #
+    @traced('agent.join_protocol', 'agent')
+    def join_protocol(self) -> None:
+        '''This method facilitates a new member joining the group.'''
+
+        print(f"\n{'Join Event'.center(80, '=')}")
+
+        # update the trees and initialize the joining member
         #
-        mem = f'mem_{self.new_memb.get_data().uid}'
-        self.addr[self.new_id] = self.new_memb.bind('PUB', alias=mem)
-        self.sponsor.connect(self.addr[self.new_id], handler=receive_bkeys)
-        blind_key = self.new_memb.get_data().my_node.b_key
-        message = f'{self.new_memb.get_data().my_node.name}:{blind_key}'
-        print('')
-        self.send_info(self.new_memb, mem, message)
+        self.apply_join()
 
-        # allow the sponsor and new member to calculate the group key
+        # new member shares blind key with the members below its sibling (the sponsor in a balanced tree,
+        # every old member in a skinny tree)
         #
-        time.sleep(1)
-        newtree_s = self.sponsor.get_data()
-        newtree_s.calculate_group_key()
-        self.sponsor.set_data(newtree_s)
-        self.sponsor.get_data().tree_print()
-        newtree_n = self.new_memb.get_data()
-        newtree_n.calculate_group_key()
-        self.new_memb.set_data(newtree_n)
-        self.new_memb.get_data().tree_print()
+        share = self.new_memb.tree_share()
+        if self.table is not None:
+            self.new_memb.table_publish([share.name])
+            for key in share.receivers:
+                self.agents[key].table_pull()
+        else:
+            for key in share.receivers:
+                self.connections.subscribe(key, self.new_id, share.name, receive_bkeys)
+            blind_key = self.new_memb.get_blind_key(share.name)
+            message = f'{share.name}:{blind_key}'
+            print('')
+            self.send_info(self.new_id, share.name, message)
+
+            # allow the sponsor and new member to calculate the group key
+            #
+            get_tracer().sleep(1)
+        bkeys, updates = self.sponsor.tree_rekey(False, get_stream().active())
+        self.republish(updates)
+        self.republish(self.new_memb.tree_calculate(get_stream().active())[1])
 
         # sponsor sends updated blind keys
         #
-        self.join_key_exchange()
+        self.join_key_exchange(bkeys)
 
         # allow all remaining members to calculate the group key
         #
-        time.sleep(1)
+        if self.table is None:
+            get_tracer().sleep(1)
         for key, agent in self.agents.items():
             if key not in (self.spon_id, self.new_id):
-                newtree = agent.get_data()
-                newtree.calculate_group_key()
-                agent.set_data(newtree)
-                agent.get_data().tree_print()
+                self.republish(agent.tree_calculate(get_stream().active())[1])
 
-        # close connections
+        # drop remaining subscriptions (the connections stay alive for the next event)
         #
         self.close_connections()
 
@@ -404,117 +977,77 @@ class MemberAgent():
 
     # method: leave_key_exchange
     #
-    def leave_key_exchange(self):
+    @traced('agent.leave_key_exchange', 'agent')
+    def leave_key_exchange(self, bkeys: dict[str, int]):
         '''This method the key exchange for a leave event algorithmically.'''
 
         # print a divider
         #
         print(f"\n{'Key Exchange (Leave)'.center(80, '=')}")
 
-        # get the update paths of all members
-        #
-        update_paths = {}
-        for key, agent in self.agents.items():
-            if key != self.spon_id:
-                temp_update_path = []
-                for node in agent.get_data().get_update_path():
-                    temp_update_path.append(node.name)
-                update_paths[key] = list(reversed(temp_update_path))
-            else:
-                update_paths[key] = None
-
-        # get the sponsor's key path
+        # plan the exchange once in the sponsor's agent
         #
-        spon_key_path = []
-        for node in self.sponsor.get_data().my_node.get_key_path():
-            spon_key_path.append(node.name)
-
-        for i in range(len(spon_key_path)-1):
-
-            # only the sponsor will publish
-            #
-            mem = f'mem_{self.spon_id}'
-            self.addr[self.spon_id] = self.sponsor.bind('PUB', alias=mem)
-
-            # establish subscribers (sponsor will publish)
-            #
-            key_node = spon_key_path[i]
-            for key, agent in self.agents.items():
-                if update_paths[key] is not None:
-                    if key_node in update_paths[key]:
-                        dest_name = key_node
-                        if dest_name is not None:
-                            agent.connect(self.addr[self.spon_id], handler=receive_bkeys)
+        schedule = self.sponsor.tree_plan('leave', self.spon_id)
+        self.rekey_key_exchange(schedule, bkeys)
+    #
+    # end method: leave_key_exchange
 
-            # sponsor sends appropriate blind keys
-            #
-            blind_key = self.sponsor.get_data().find_node(key_node.lstrip('<').rstrip('>'), False).b_key
-            message = f'{key_node}:{blind_key}'
-            print('')
-            self.send_info(self.sponsor, mem, message)
+    # method: apply_leave
+    #
+    @traced('agent.apply_leave', 'agent')
+    def apply_leave(self, eid: int) -> None:
+        '''This method removes a leaving member and updates all trees; the sponsor is found.'''
 
-            # close connections to prevent unnecessary sending/receiving
-            #
-            self.close_connections()
+        # remove the agent (with the spans it recorded)
+        #
+        self.collect_traces([eid])
+        self.agents[eid].shutdown()
+        get_tracer().sleep(1)
+        del self.agents[eid]
+        self.connections.remove_member(eid)
 
-            # increment the level
-            #
-            time.sleep(1)
-            print(f"\nSYS: Level {self.sponsor.get_data().my_node.l-i} finished -- keys exchanged!")
+        # alert current members that a member is leaving the group; find the sponsor
         #
+        for key, agent in self.agents.items():
+            if agent.tree_leave(eid):
+                self.sponsor = agent
+                self.spon_id = key
+        if self.table is not None:
+            self.table.advance()
     #
-    # end method: leave_key_exchange
+    # end method: apply_leave
 
     # method: leave_protocol
     #
+    @traced('agent.leave_protocol', 'agent')
     def leave_protocol(self, eid: int):
         '''This method facilitates a member leaving the group.'''
 
         print(f"\n{'Leave Event'.center(80, '=')}")
 
-        # remove the agent
-        #
-        self.agents[eid].shutdown()
-        time.sleep(1)
-        del self.agents[eid]
-        del self.addr[eid]
-
-        # alert current members that a member is leaving the group; find the sponsor
+        # remove the member and find the sponsor
         #
-        for key, agent in self.agents.items():
-            newtree = agent.get_data()
-            newtree.leave_event(eid)
-            agent.set_data(newtree)
-            if agent.get_data().my_node.ntype == 'spon':
-                self.sponsor = agent
+        self.apply_leave(eid)
 
         # sponsor generates new keys and calculates new group key
         #
-        self.spon_id = self.sponsor.get_data().uid
-        print(f"\nSYS: Member {self.sponsor.get_data().uid} is generating new keys ...")
-        newtree = self.sponsor.get_data()
-        newtree.key_generation()
-        self.sponsor.set_data(newtree)
-        newtree = self.sponsor.get_data()
-        newtree.calculate_group_key()
-        self.sponsor.set_data(newtree)
-        self.sponsor.get_data().tree_print()
+        print(f"\nSYS: Member {self.spon_id} is generating new keys ...")
+        bkeys, updates = self.sponsor.tree_rekey(True, get_stream().active())
+        self.republish(updates)
 
         # sponsor sends updated blind keys
         #
-        self.leave_key_exchange()
+        self.leave_key_exchange(bkeys)
 
         # allow all remaining members to calculate the group key
         #
-        time.sleep(1)
+        if self.table is None:
+            get_tracer().sleep(1)
         for key, agent in self.agents.items():
             if key != self.spon_id:
-                newtree = agent.get_data()
-                newtree.calculate_group_key()
-                agent.set_data(newtree)
-                agent.get_data().tree_print()
+                self.republish(agent.tree_calculate(get_stream().active())[1])
 
-        # close connections
+        # drop remaining subscriptions (the connections stay alive for the next event)
         #
         self.close_connections()
 
@@ -523,14 +1056,64 @@ class MemberAgent():
     #
     # end method: leave_protocol
 
+    # method: verify_convergence
+    #
+    @traced('agent.verify_convergence', 'agent')
+    def verify_convergence(self) -> list[int]:
+        '''This method collects every member's key commitment and returns the members that diverged.'''
+
+        # every member answers with a short hash instead of its tree; the majority commitment is the reference
+        #
+        commitments = {key: agent.get_commitment() for key, agent in self.agents.items()}
+        reference, count = Counter(commitments.values()).most_common(1)[0]
+        diverged = sorted(key for key, commitment in commitments.items() if commitment != reference)
+        if diverged:
+            print(f"\nSYS: Members {diverged} diverged from the group key of {count} members!")
+        else:
+            print(f"\nSYS: All {count} members committed to the same group key.")
+        return diverged
+    #
+    # end method: verify_convergence
+
+    # method: recover_member
+    #
+    @traced('agent.recover_member', 'agent')
+    def recover_member(self, mid: int) -> bool:
+        '''This method restarts a member whose process died from its journal and returns whether it holds the group key.'''
+
+        if self.journal is None:
+            raise ValueError("The members keep no journal to recover from")
+
+        # forget the dead agent: its name, its publisher and the sockets other members connected to it
+        #
+        self.connections.remove_member(mid)
+        self.nameserver.remove(f'mem_{mid}')
+
+        # a new agent rebuilds the tree from the latest snapshot and the journal; the rest of the group does not
+        # notice (no rejoin, no rekey)
+        #
+        self.agents[mid] = self.spawn(mid)
+        commitment = self.agents[mid].journal_recover()
+        if commitment is None:
+            raise ValueError(f"Member {mid} has no journal snapshot")
+        reference = Counter(agent.get_commitment() for key, agent in self.agents.items() if key != mid).most_common(1)[0][0]
+        print(f"\nSYS: Member {mid} recovered from its journal ({'in sync' if commitment == reference else 'stale'}).")
+        return commitment == reference
+    #
+    # end method: recover_member
+
     # method: close
     #
     def close(self) -> None:
-        '''This method shuts down the nameserver.'''
+        '''This method closes all agent connections and shuts down the nameserver.'''
 
         # shutdown the system
         #
         print(f"\n{'Exiting Program'.center(80, '=')}\n")
+        self.collect_traces()
+        self.connections.close()
+        if self.table is not None:
+            self.table.close()
         self.nameserver.shutdown()
     #
     # end method: close
@@ -0,0 +1,458 @@
+# file: member_shard.py
+#
+'''This file contains the ShardedMemberAgent class along with the worker methods it installs.'''
+
+# import modules
+#
+import pickle
+from collections import Counter
+from math import floor, log
+from typing import Optional
+from osbrain import run_nameserver
+from osbrain import run_agent
+from osbrain import Proxy, NSProxy
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.connection_manager import ConnectionManager
+from tgdhstruct.tracing import get_tracer
+
+# function: shard_build
+#
+def shard_build(self, size: int, mids: list[int]) -> None:
+    '''This worker method builds the trees of the members hosted by the worker.'''
+
+    self.data = {mid: BinaryTree(size, mid, verbose=False) for mid in mids}
+#
+# end function: shard_build
+
+# function: shard_get
+#
+def shard_get(self, mid: int) -> BinaryTree:
+    '''This worker method returns the tree of a hosted member.'''
+
+    return self.data[mid]
+#
+# end function: shard_get
+
+# function: shard_remove
+#
+def shard_remove(self, mid: int) -> None:
+    '''This worker method removes a hosted member.'''
+
+    del self.data[mid]
+#
+# end function: shard_remove
+
+# function: shard_deliver
+#
+def shard_deliver(self, bkeys: dict[str, int]) -> None:
+    '''This worker method hands blind keys to every hosted member (each keeps the ones on its co-path).'''
+
+    for tree in self.data.values():
+        tree.set_blind_keys(bkeys)
+#
+# end function: shard_deliver
+
+# function: shard_send
+#
+def shard_send(self, alias: str, bkeys: dict[str, int]) -> None:
+    '''This worker method delivers blind keys in memory and publishes them to the other workers.'''
+
+    shard_deliver(self, bkeys)
+    self.send(alias, bkeys, topic='bkeys')
+#
+# end function: shard_send
+
+# function: shard_round_keys
+#
+def shard_round_keys(self, rnd: int, height: int) -> dict[str, int]:
+    '''This worker method returns the blind keys the hosted members publish in a round of the initial exchange.'''
+
+    bkeys = {}
+    for tree in self.data.values():
+        key_path = tree.my_node.get_key_path()
+        level = rnd-(height-len(key_path)+1)
+        if level >= 0:
+            bkeys[key_path[level].name] = key_path[level].b_key
+    return bkeys
+#
+# end function: shard_round_keys
+
+# function: shard_round_compute
+#
+def shard_round_compute(self, rnd: int, height: int) -> None:
+    '''This worker method lets the hosted members compute the next level of the initial exchange.'''
+
+    for tree in self.data.values():
+        level = rnd-(height-len(tree.my_node.get_key_path())+1)
+        if level >= 0:
+            tree.initial_calculate_group_key(level)
+#
+# end function: shard_round_compute
+
+# function: shard_join_event
+#
+def shard_join_event(self) -> Optional[int]:
+    '''This worker method applies a join event to the hosted members and returns the sponsor if hosted.'''
+
+    sponsor = None
+    for mid, tree in self.data.items():
+        tree.join_event()
+        if tree.my_node.ntype == 'spon':
+            sponsor = mid
+    return sponsor
+#
+# end function: shard_join_event
+
+# function: shard_leave_event
+#
+def shard_leave_event(self, eid: int) -> Optional[int]:
+    '''This worker method applies a leave event to the hosted members and returns the sponsor if hosted.'''
+
+    sponsor = None
+    for mid, tree in self.data.items():
+        tree.leave_event(eid)
+        if tree.my_node.ntype == 'spon':
+            sponsor = mid
+    return sponsor
+#
+# end function: shard_leave_event
+
+# function: shard_send_tree
+#
+def shard_send_tree(self, mid: int, alias: str, topic: str) -> None:
+    '''This worker method publishes a hosted sponsor's tree without its private keys (to another worker).'''
+
+    # the message is serialized while sending, so the keys can be put back right after
+    #
+    tree = self.data[mid]
+    stripped = tree.strip_private_keys()
+    try:
+        self.send(alias, tree, topic=topic)
+    finally:
+        tree.restore_private_keys(stripped)
+#
+# end function: shard_send_tree
+
+# function: shard_stage_tree
+#
+def shard_stage_tree(self, mid: int) -> None:
+    '''This worker method copies a hosted sponsor's tree without its private keys for a member joining here.'''
+
+    tree = self.data[mid]
+    stripped = tree.strip_private_keys()
+    try:
+        self.joining = pickle.loads(pickle.dumps(tree))
+    finally:
+        tree.restore_private_keys(stripped)
+#
+# end function: shard_stage_tree
+
+# function: shard_new_member
+#
+def shard_new_member(self) -> tuple[int, dict[str, int]]:
+    '''This worker method adopts the received tree for the joining member and returns its ID and blind key.'''
+
+    tree = self.joining
+    self.joining = None
+    tree.new_member_protocol()
+    self.data[tree.uid] = tree
+    return tree.uid, {tree.my_node.name: tree.my_node.b_key}
+#
+# end function: shard_new_member
+
+# function: shard_rekey
+#
+def shard_rekey(self, mid: int, generate: bool) -> dict[str, int]:
+    '''This worker method lets a hosted sponsor calculate the group key and returns its refreshed blind keys.'''
+
+    tree = self.data[mid]
+    if generate:
+        tree.key_generation()
+    tree.calculate_group_key()
+    return tree.get_refreshed_blind_keys()
+#
+# end function: shard_rekey
+
+# function: shard_calculate
+#
+def shard_calculate(self, exclude: list[int]) -> None:
+    '''This worker method lets the hosted members (except the excluded ones) calculate the group key.'''
+
+    for mid, tree in self.data.items():
+        if mid not in exclude:
+            tree.calculate_group_key()
+#
+# end function: shard_calculate
+
+# function: shard_commitments
+#
+def shard_commitments(self) -> dict[int, str]:
+    '''This worker method returns the key commitments of the hosted members.'''
+
+    return {mid: tree.key_commitment() for mid, tree in self.data.items()}
+#
+# end function: shard_commitments
+
+# function: receive_shard_bkeys
+#
+def receive_shard_bkeys(agent: Proxy, message: dict[str, int]) -> None:
+    '''This helper function processes blind keys published by another worker.'''
+
+    shard_deliver(agent, message)
+#
+# end function: receive_shard_bkeys
+
+# function: receive_shard_tree
+#
+def receive_shard_tree(agent: Proxy, tree: BinaryTree) -> None:
+    '''This helper function keeps a (stripped) sponsor tree received for a member joining this worker.'''
+
+    agent.log_info("Tree received!")
+    agent.joining = tree
+#
+# end function: receive_shard_tree
+
+# class: ShardedMemberAgent
+#
+class ShardedMemberAgent():
+    '''
+    Description
+    -----------
+    This class runs a TGDH group on a fixed number of worker agents, each hosting a shard of the members.
+    Every member's tree lives in its worker process and all key computation happens there. Blind keys are
+    delivered in memory to the members of the sending worker; only traffic between workers goes over the
+    (persistent) PUB/SUB sockets, as one message per worker and round.
+
+    Attributes
+    ----------
+    workers : dict[int, Proxy]
+        The worker agents by worker ID
+    hosts : dict[int, int]
+        The worker ID hosting each member
+    connections : ConnectionManager
+        The persistent sockets between the workers
+    size : int
+        The number of members in the initial group
+    max_height : int
+        The maximum height of the initial tree
+    spon_id : int
+        The member ID of the sponsor of the last event
+    new_id : int
+        The member ID of the last member to join
+    nameserver : NSProxy
+        The running nameserver
+
+    Methods
+    -------
+    send_keys(self, wid: int, bkeys: dict[str, int]) -> None
+        This method lets a worker deliver blind keys locally and publish them to the other workers.
+    get_tree(self, mid: int) -> BinaryTree
+        This method returns a copy of a member's tree.
+    initial_key_exchange(self) -> None
+        This method builds the hosted trees and runs the initial key exchange level by level.
+    join_protocol(self) -> None
+        This method facilitates a new member joining the group.
+    leave_protocol(self, eid: int) -> None
+        This method facilitates a member leaving the group.
+    finish_rekey(self, generate: bool) -> None
+        This method lets the sponsor broadcast its refreshed key path and all members calculate the group key.
+    verify_convergence(self) -> list[int]
+        This method collects every member's key commitment and returns the members that diverged.
+    close(self) -> None
+        This method closes all worker connections and shuts down the nameserver.
+    '''
+
+    # constructor
+    #
+    def __init__(self, size: int, workers: int=4) -> None:
+        '''This is the constructor.'''
+
+        # define class data
+        #
+        self.workers = {}
+        self.hosts = {}
+        self.connections = ConnectionManager(self.workers)
+        self.size = size
+        self.max_height = floor(log((2*self.size)-2, 2))
+        self.spon_id = None
+        self.new_id = None
+
+        # system deployment: every worker subscribes to every other worker once
+        #
+        self.nameserver = run_nameserver()
+        for wid in range(min(workers, size)):
+            self.workers[wid] = run_agent(f'worker_{wid}')
+            self.workers[wid].set_method(shard_build, shard_get, shard_remove, shard_send, shard_round_keys,
+                shard_round_compute, shard_join_event, shard_leave_event, shard_send_tree, shard_stage_tree,
+                shard_new_member, shard_rekey, shard_calculate, shard_commitments)
+            self.workers[wid].set_attr(joining=None)
+        for wid in self.workers:
+            for other in self.workers:
+                if other != wid:
+                    self.connections.subscribe(wid, other, 'bkeys', receive_shard_bkeys)
+
+        # initialize the tree
+        #
+        self.initial_key_exchange()
+    #
+    # end constructor
+
+    # method: send_keys
+    #
+    def send_keys(self, wid: int, bkeys: dict[str, int]) -> None:
+        '''This method lets a worker deliver blind keys locally and publish them to the other workers.'''
+
+        self.workers[wid].shard_send(self.connections.ready(wid), bkeys)
+    #
+    # end method: send_keys
+
+    # method: get_tree
+    #
+    def get_tree(self, mid: int) -> BinaryTree:
+        '''This method returns a copy of a member's tree.'''
+
+        return self.workers[self.hosts[mid]].shard_get(mid)
+    #
+    # end method: get_tree
+
+    # method: initial_key_exchange
+    #
+    def initial_key_exchange(self) -> None:
+        '''This method builds the hosted trees and runs the initial key exchange level by level.'''
+
+        print(f"\n{'Key Exchange (Init, Sharded)'.center(80, '=')}")
+
+        # members are dealt to the workers round-robin; each worker builds its own trees
+        #
+        for mid in range(1, self.size+1):
+            self.hosts[mid] = (mid-1) % len(self.workers)
+        for wid, worker in self.workers.items():
+            worker.shard_build(self.size, [mid for mid, host in self.hosts.items() if host == wid])
+
+        # one message per worker and level; the workers compute their members' next level
+        #
+        for i in range(self.max_height):
+            for wid, worker in self.workers.items():
+                bkeys = worker.shard_round_keys(i, self.max_height)
+                if bkeys:
+                    self.send_keys(wid, bkeys)
+            get_tracer().sleep(1)
+            for worker in self.workers.values():
+                worker.shard_round_compute(i, self.max_height)
+            print(f"\nSYS: Level {self.max_height-i} finished -- keys exchanged!")
+
+        print("\nSYS: Tree initialization completed!")
+        print("SYS: All initial members have computed the group key.")
+    #
+    # end method: initial_key_exchange
+
+    # method: join_protocol
+    #
+    def join_protocol(self) -> None:
+        '''This method facilitates a new member joining the group.'''
+
+        print(f"\n{'Join Event (Sharded)'.center(80, '=')}")
+
+        # alert current members that a new member is joining; find the sponsor
+        #
+        for worker in self.workers.values():
+            sponsor = worker.shard_join_event()
+            if sponsor is not None:
+                self.spon_id = sponsor
+
+        # the sponsor's worker strips the sponsor's tree and hands it to the least loaded worker, which hosts the
+        # new member (the tree never passes through this process)
+        #
+        swid = self.hosts[self.spon_id]
+        wid = min(self.workers, key=lambda key: list(self.hosts.values()).count(key))
+        if wid == swid:
+            self.workers[wid].shard_stage_tree(self.spon_id)
+        else:
+            self.connections.subscribe(wid, swid, f'tree_{wid}', receive_shard_tree)
+            self.workers[swid].shard_send_tree(self.spon_id, self.connections.ready(swid), f'tree_{wid}')
+            get_tracer().sleep(1)
+        self.new_id, bkeys = self.workers[wid].shard_new_member()
+        self.hosts[self.new_id] = wid
+        print(f"\nSYS: Member {self.new_id} joined on worker {wid}; member {self.spon_id} is the sponsor.")
+
+        # new member shares blind key with sponsor; both calculate and the sponsor broadcasts
+        #
+        self.send_keys(wid, bkeys)
+        get_tracer().sleep(1)
+        self.workers[wid].shard_rekey(self.new_id, False)
+        self.finish_rekey(False)
+    #
+    # end method: join_protocol
+
+    # method: leave_protocol
+    #
+    def leave_protocol(self, eid: int) -> None:
+        '''This method facilitates a member leaving the group.'''
+
+        print(f"\n{'Leave Event (Sharded)'.center(80, '=')}")
+
+        # remove the member and find the sponsor
+        #
+        self.workers[self.hosts.pop(eid)].shard_remove(eid)
+        for worker in self.workers.values():
+            sponsor = worker.shard_leave_event(eid)
+            if sponsor is not None:
+                self.spon_id = sponsor
+        self.new_id = None
+        print(f"\nSYS: Member {self.spon_id} is generating new keys ...")
+
+        # sponsor generates new keys and the group rekeys
+        #
+        self.finish_rekey(True)
+    #
+    # end method: leave_protocol
+
+    # method: finish_rekey
+    #
+    def finish_rekey(self, generate: bool) -> None:
+        '''This method lets the sponsor broadcast its refreshed key path and all members calculate the group key.'''
+
+        wid = self.hosts[self.spon_id]
+        bkeys = self.workers[wid].shard_rekey(self.spon_id, generate)
+        self.send_keys(wid, bkeys)
+        get_tracer().sleep(1)
+        for worker in self.workers.values():
+            worker.shard_calculate([self.spon_id, self.new_id])
+
+        print("\nSYS: Tree updation completed!")
+        print("SYS: All members have computed the new group key.")
+    #
+    # end method: finish_rekey
+
+    # method: verify_convergence
+    #
+    def verify_convergence(self) -> list[int]:
+        '''This method collects every member's key commitment and returns the members that diverged.'''
+
+        commitments = {}
+        for worker in self.workers.values():
+            commitments.update(worker.shard_commitments())
+        reference, count = Counter(commitments.values()).most_common(1)[0]
+        diverged = sorted(key for key, commitment in commitments.items() if commitment != reference)
+        if diverged:
+            print(f"\nSYS: Members {diverged} diverged from the group key of {count} members!")
+        else:
+            print(f"\nSYS: All {count} members committed to the same group key.")
+        return diverged
+    #
+    # end method: verify_convergence
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method closes all worker connections and shuts down the nameserver.'''
+
+        print(f"\n{'Exiting Program'.center(80, '=')}\n")
+        self.connections.close()
+        self.nameserver.shutdown()
+    #
+    # end method: close
+#
+# end class: ShardedMemberAgent
+#
+# end file: member_shard.py
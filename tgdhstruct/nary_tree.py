@@ -0,0 +1,417 @@
+# file: nary_tree.py
+#
+'''This file contains the NaryTree class.'''
+
+# import modules
+#
+import sys
+from anytree import PreOrderIter
+from anytree import PostOrderIter
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.tracing import traced
+
+# class: NaryTree
+#
+class NaryTree(BinaryTree):
+    '''
+    Description
+    -----------
+    This class manages a TGDH tree whose intermediate nodes have up to <arity> children (3 or 4), so a group of
+    n members is ceil(log_arity(n)) levels deep instead of log2(n).
+
+    A node with two children combines them as in the binary tree (g^(k1*k2)). A node with m > 2 children runs
+    the Burmester-Desmedt conference key at its level: every child publishes its blind key z_i = g^k_i and then
+    the second-round value X_i = (z_(i+1)/z_(i-1))^k_i, and every member below the node calculates the same node
+    key g^(k_0*k_1 + k_1*k_2 + ... + k_(m-1)*k_0) from its own child key, the blind keys and the X values. When a
+    child key changes, only that child and its two neighbours publish new X values.
+
+    A level therefore costs one or two broadcast rounds and 2-3 exponentiations per member on the key path (plus
+    the neighbours' X values), while the tree has fewer levels. Joins fill the shallowest node that is not full
+    before splitting a leaf; leaves collapse a node that is left with a single child. The class is meant for
+    simulated groups (seed_group_key, simulate_join and simulate_leave); the agent protocols, the omniscient
+    seeding and the key store use BinaryTree, and their methods raise TypeError here.
+
+    Attributes
+    ----------
+    arity : int
+        The maximum number of children of a node
+    (the attributes of BinaryTree)
+
+    Methods
+    -------
+    add_subtree(self, node: DataNode, mids: list[int]) -> None
+        This method builds a balanced subtree holding the given members below a node.
+    type_assign(self) -> None
+        This method assigns the 'ntype' attribute for the nodes in the tree.
+    calculate_group_key(self) -> None
+        This method calculates the group key (the X values of my co-path must be current).
+    second_round_key(self, node: DataNode) -> None
+        This method calculates the Burmester-Desmedt second-round value of a node from its own key.
+    combine(self, node: DataNode, child: DataNode) -> None
+        This method calculates the key of a node from the key of one child and the public values of the others.
+    refresh_level(self, child: DataNode) -> None
+        This method recalculates the parent of a node whose key changed (neighbours republish their X values).
+    seed_group_key(self) -> None
+        This method generates keys for every member and calculates every node key (simulation only).
+    sponsor_rekey(self, mid: int) -> None
+        This method lets a member refresh its key and recalculate its key path (simulation only).
+    binary_only(self, *args, **kwargs) -> None
+        This method rejects the BinaryTree methods that assume two children per node.
+    build_tree(self) -> None
+        This method builds the initial tree from the constructor.
+    recalculate_names(self) -> None
+        This method recalculates the names (position indices) for each node.
+    find_insertion(self) -> DataNode
+        This method finds the point of insertion for a joining node.
+    empty_check(self) -> None
+        This method determines if I am the only member left in the group and exits if so.
+    join_event(self) -> None
+        This method updates the tree when a new member joins the group.
+    leave_event(self, eid: int) -> None
+        This method updates the tree when a member leaves the tree.
+    '''
+
+    # constructor
+    #
+    def __init__(self, size: int, uid: int, arity: int=3, verbose: bool=True) -> None:
+        '''This is the constructor.'''
+
+        if arity < 2:
+            raise ValueError(f"The arity must be at least 2, not {arity}")
+        self.arity = arity
+        super().__init__(size, uid, verbose)
+        self.height = self.root.height
+    #
+    # end constructor
+
+    # method: add_subtree
+    #
+    def add_subtree(self, node: DataNode, mids: list[int]) -> None:
+        '''This method builds a balanced subtree holding the given members below a node.'''
+
+        if len(mids) == 1:
+            node.mid = mids[0]
+            return
+
+        # split the members as evenly as possible between up to <arity> children
+        #
+        count = min(self.arity, len(mids))
+        quot, rem = divmod(len(mids), count)
+        start = 0
+        for i in range(count):
+            stop = start+quot+(1 if i < rem else 0)
+            child = DataNode(l=node.l+1, v=self.arity*node.v+i, parent=node, ntype='inter')
+            self.add_subtree(child, mids[start:stop])
+            start = stop
+    #
+    # end method: add_subtree
+
+    # method: type_assign
+    #
+    def type_assign(self) -> None:
+        '''This method assigns the 'ntype' attribute for the nodes in the tree.'''
+
+        for node in self.get_leaves():
+            if node is not self.root:
+                node.ntype = 'mem'
+    #
+    # end method: type_assign
+
+    # method: calculate_group_key
+    #
+    @traced('tree.calculate_group_key')
+    def calculate_group_key(self) -> None:
+        '''This method calculates the group key (the X values of my co-path must be current).'''
+
+        for node in self.my_node.get_key_path()[:-1]:
+            if len(node.parent.children) > 2:
+                self.second_round_key(node)
+            self.combine(node.parent, node)
+        self.announce_key()
+    #
+    # end method: calculate_group_key
+
+    # method: second_round_key
+    #
+    def second_round_key(self, node: DataNode) -> None:
+        '''This method calculates the Burmester-Desmedt second-round value of a node from its own key.'''
+
+        siblings = node.parent.children
+        i = siblings.index(node)
+        ratio = int(siblings[(i+1) % len(siblings)].b_key)*pow(int(siblings[i-1].b_key), -1, DataNode.p) % DataNode.p
+        node.x_key = DataNode.exp(ratio, node.key)
+    #
+    # end method: second_round_key
+
+    # method: combine
+    #
+    def combine(self, node: DataNode, child: DataNode) -> None:
+        '''This method calculates the key of a node from the key of one child and the public values of the others.'''
+
+        children = node.children
+        m = len(children)
+        if m == 2:
+            node.key = DataNode.exp(int(child.siblings[0].b_key), child.key)
+        else:
+            # K = z_(i-1)^(m*k_i) * X_i^(m-1) * X_(i+1)^(m-2) * ... * X_(i+m-2) (the small powers are not counted)
+            #
+            i = children.index(child)
+            key = DataNode.exp(int(children[i-1].b_key), m*child.key)
+            for j in range(1, m):
+                key = key*pow(int(children[(i+j-1) % m].x_key), m-j, DataNode.p) % DataNode.p
+            node.key = key
+        if node.ntype != 'root':
+            node.gen_blind_key()
+    #
+    # end method: combine
+
+    # method: refresh_level
+    #
+    def refresh_level(self, child: DataNode) -> None:
+        '''This method recalculates the parent of a node whose key changed (neighbours republish their X values).'''
+
+        siblings = child.parent.children
+        m = len(siblings)
+        if m > 2:
+            i = siblings.index(child)
+            for j in sorted({(i-1) % m, i, (i+1) % m}):
+                self.second_round_key(siblings[j])
+        self.combine(child.parent, child)
+    #
+    # end method: refresh_level
+
+    # method: seed_group_key
+    #
+    @traced('tree.seed_group_key')
+    def seed_group_key(self) -> None:
+        '''This method generates keys for every member and calculates every node key (simulation only).'''
+
+        for node in self.root.leaves:
+            node.gen_private_key()
+            node.gen_blind_key()
+        for node in PostOrderIter(self.root):
+            if node.is_leaf:
+                continue
+            if len(node.children) > 2:
+                for child in node.children:
+                    self.second_round_key(child)
+            self.combine(node, node.children[0])
+        self.announce_key()
+    #
+    # end method: seed_group_key
+
+    # method: sponsor_rekey
+    #
+    @traced('tree.sponsor_rekey')
+    def sponsor_rekey(self, mid: int) -> None:
+        '''This method lets a member refresh its key and recalculate its key path (simulation only).'''
+
+        self.uid = mid
+        self.find_me()
+        self.key_generation()
+        for node in self.my_node.get_key_path()[:-1]:
+            self.refresh_level(node)
+        self.announce_key()
+    #
+    # end method: sponsor_rekey
+
+    # method: binary_only
+    #
+    def binary_only(self, *args, **kwargs) -> None:
+        '''This method rejects the BinaryTree methods that assume two children per node.'''
+
+        raise TypeError(f"A {self.arity}-ary tree only supports simulated groups (seed_group_key, simulate_join, simulate_leave)")
+    #
+    # end method: binary_only
+
+    # the agent protocols, the omniscient seeding and the key store combine one co-path blind key per level
+    #
+    initial_calculate_group_key = binary_only
+    calculate_partial_group_key = binary_only
+    compute_node_keys = binary_only
+    seed_path = binary_only
+    load_storage = binary_only
+
+    # method: storage
+    #
+    @property
+    def storage(self) -> None:
+        '''This property is the key store, which an n-ary tree never has.'''
+
+        return None
+
+    @storage.setter
+    def storage(self, store: object) -> None:
+        '''This setter rejects a key store.'''
+
+        if store is not None:
+            raise TypeError("A key store holds a binary tree")
+    #
+    # end method: storage
+
+    # method: build_tree
+    #
+    def build_tree(self) -> None:
+        '''This method builds the initial tree from the constructor.'''
+
+        if self.verbose:
+            print(f"\nMEM {self.uid}: Generating {self.arity}-ary Tree with {str(self.size).rjust(2)} members ...")
+        self.add_subtree(self.root, list(range(1, self.size+1)))
+
+        # set node attributes and generate keys
+        #
+        self.type_assign()
+        self.find_me()
+        self.key_generation()
+
+        # view the tree
+        #
+        if self.verbose:
+            self.tree_export()
+            self.tree_print()
+    #
+    # end method: build_tree
+
+    # method: recalculate_names
+    #
+    def recalculate_names(self) -> None:
+        '''This method recalculates the names (position indices) for each node.'''
+
+        for node in PreOrderIter(self.root):
+            if node.parent is not None:
+                node.l = node.parent.l+1
+                node.v = self.arity*node.parent.v+node.parent.children.index(node)
+            node.name = node.calculate_name()
+    #
+    # end method: recalculate_names
+
+    # method: find_insertion
+    #
+    def find_insertion(self) -> DataNode:
+        '''This method finds the point of insertion for a joining node.'''
+
+        # the new member goes below the shallowest node that is not full; a leaf is only split if no
+        # intermediate node on that level has room (rightmost first)
+        #
+        candidates = [node for node in PreOrderIter(self.root) if len(node.children) < self.arity]
+        slevel = min(node.l for node in candidates)
+        slist = [node for node in candidates if node.l == slevel]
+        olist = [node for node in slist if not node.is_leaf]
+        return (olist or slist)[-1]
+    #
+    # end method: find_insertion
+
+    # method: empty_check
+    #
+    def empty_check(self) -> None:
+        '''This method determines if I am the only member left in the group and exits if so.'''
+
+        if len(self.root.children) == 2 and all(node.is_leaf for node in self.root.children):
+            print("\nThis group is empty! Program will terminate.")
+            sys.exit(0)
+    #
+    # end method: empty_check
+
+    # method: join_event
+    #
+    @traced('tree.join_event')
+    def join_event(self) -> None:
+        '''This method updates the tree when a new member joins the group.'''
+
+        # signal that a member is joining
+        #
+        if self.verbose:
+            print(f"\nMEM {self.uid}: New member is joining the group!")
+
+        # prepare the tree by assigning types
+        #
+        self.type_assign()
+
+        # a full tree grows like the binary tree: the leaf becomes an intermediate node over its member
+        #
+        inserti_node = self.find_insertion()
+        if inserti_node.is_leaf:
+            sponsor_node = DataNode(l=inserti_node.l+1, v=self.arity*inserti_node.v, parent=inserti_node)
+            sponsor_node.sponsor_assign(
+                mid=inserti_node.mid, key=inserti_node.key,
+                b_key=inserti_node.b_key, join=True)
+            inserti_node.insertion_assign()
+
+        # add the new member as the last child of the insertion node
+        #
+        newmemb_node = DataNode(
+            l=inserti_node.l+1, v=self.arity*inserti_node.v+len(inserti_node.children), parent=inserti_node)
+        newmemb_node.new_memb_assign(self.nextmemb)
+        self.refresh_path = newmemb_node.get_key_path()
+
+        # signal that a new member has been added
+        #
+        self.delta['joined'].append(self.nextmemb)
+        self.nextmemb = self.nextmemb+1
+
+        # refresh the tree
+        #
+        self.tree_refresh()
+    #
+    # end method: join_event
+
+    # method: leave_event
+    #
+    @traced('tree.leave_event')
+    def leave_event(self, eid: int) -> None:
+        '''This method updates the tree when a member leaves the tree.'''
+
+        # signal that a member is leaving
+        #
+        if self.verbose:
+            print(f"\nMEM {self.uid}: Member {str(eid)} is leaving the group!")
+
+        # determine if the tree is empty
+        #
+        self.empty_check()
+        self.delta['left'].append(eid)
+
+        # prepare the tree by assigning types
+        #
+        self.type_assign()
+
+        # remove the member; the sponsor is the rightmost member below the preceding (cyclic) neighbour, whose
+        # key path covers every node that lost a child
+        #
+        node = self.find_node(eid, True)
+        parent = node.parent
+        index = parent.children.index(node)
+        node.parent = None
+        if len(parent.children) == 1:
+            # a single remaining child takes the place of its parent
+            #
+            child = parent.children[0]
+            if parent.parent is None:
+                child.parent = None
+                child.make_root()
+                self.root = child
+            else:
+                siblings = list(parent.parent.children)
+                siblings[siblings.index(parent)] = child
+                parent.parent.children = siblings
+            neighbour = child
+        else:
+            neighbour = parent.children[index-1]
+        sponsor_node = list(self.walk_pre_order(neighbour))[-1]
+        sponsor_node.sponsor_assign(join=False)
+        del node
+
+        # determine the keys that need to be refreshed
+        #
+        self.refresh_path = sponsor_node.get_key_path()
+
+        # refresh the tree
+        #
+        self.tree_refresh()
+    #
+    # end method: leave_event
+#
+# end class: NaryTree
+#
+# end file: nary_tree.py
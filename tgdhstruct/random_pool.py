@@ -0,0 +1,187 @@
+# file: random_pool.py
+#
+'''This file contains the RandomPool class and the per-process pool used for private key generation.'''
+
+# import modules
+#
+import os
+import threading
+from typing import Optional
+from Crypto.Hash import SHAKE256
+from Crypto.Random import get_random_bytes
+
+# class: RandomPool
+#
+class RandomPool:
+    '''
+    Description
+    -----------
+    This class hands out uniformly distributed integers from large blocks of random bytes, so generating many
+    private keys costs one OS entropy read per block instead of one per key. Integers are drawn by rejection
+    sampling: a candidate of the range's bit length is taken from the block and discarded if it falls
+    outside the range, so every value is equally likely.
+
+    With a seed the bytes come from SHAKE256(seed) instead of the OS. This DETERMINISTIC mode makes benchmark
+    runs reproducible and must never be used for real keys. A forked child keys its stream with its fork path
+    (e.g. /2/1: the first child of the parent's second child), which, unlike its process ID, is the same in
+    every run of the same program.
+
+    Attributes
+    ----------
+    block_size : int
+        The number of random bytes fetched at a time
+    seed : bytes
+        The seed of the deterministic mode (None for OS entropy)
+    deterministic : bool
+        Whether the pool is in the (insecure) deterministic mode
+    buffer : bytes
+        The current block of random bytes
+    offset : int
+        The number of bytes of the current block already used
+    pid : int
+        The process the buffered bytes belong to
+    forks : int
+        The number of children forked from this process so far
+    label : bytes
+        The fork path of this process (empty for the process that created the pool)
+    stream : SHAKE256
+        The byte stream of the deterministic mode
+    lock : threading.Lock
+        The lock serializing access from several threads
+
+    Methods
+    -------
+    fork(self) -> None
+        This method counts a child about to be forked.
+    reset(self) -> None
+        This method drops the buffered bytes and the lock (and re-keys the deterministic stream) in a forked child.
+    read(self, count: int) -> bytes
+        This method returns the next random bytes, refilling the block when it runs out.
+    randbelow(self, n: int) -> int
+        This method returns a uniformly distributed integer in [0, n).
+    randint(self, a: int, b: int) -> int
+        This method returns a uniformly distributed integer in [a, b].
+    '''
+
+    # constructor
+    #
+    def __init__(self, block_size: int=4096, seed: Optional[bytes]=None) -> None:
+        '''This is the constructor.'''
+
+        self.block_size = block_size
+        self.seed = seed
+        self.deterministic = seed is not None
+        self.buffer = b''
+        self.offset = 0
+        self.pid = os.getpid()
+        self.forks = 0
+        self.label = b''
+        self.stream = SHAKE256.new(seed) if self.deterministic else None
+        self.lock = threading.Lock()
+    #
+    # end constructor
+
+    # method: fork
+    #
+    def fork(self) -> None:
+        '''This method counts a child about to be forked.'''
+
+        self.forks = self.forks+1
+    #
+    # end method: fork
+
+    # method: reset
+    #
+    def reset(self) -> None:
+        '''This method drops the buffered bytes and the lock (and re-keys the deterministic stream) in a forked child.'''
+
+        # a forked child must never replay its parent's bytes, and a lock another thread of the parent held
+        # at the fork (e.g. the refill thread of the key pair pool) would never be released in the child
+        #
+        self.lock = threading.Lock()
+        self.buffer = b''
+        self.offset = 0
+        if self.pid != os.getpid():
+            self.label = self.label + b'/' + str(self.forks).encode()
+            self.forks = 0
+            if self.deterministic:
+                self.stream = SHAKE256.new(self.seed + self.label)
+        self.pid = os.getpid()
+    #
+    # end method: reset
+
+    # method: read
+    #
+    def read(self, count: int) -> bytes:
+        '''This method returns the next random bytes, refilling the block when it runs out.'''
+
+        if self.pid != os.getpid():
+            self.reset()
+        with self.lock:
+            if self.offset+count > len(self.buffer):
+                size = max(self.block_size, count)
+                self.buffer = self.stream.read(size) if self.deterministic else get_random_bytes(size)
+                self.offset = 0
+            data = self.buffer[self.offset:self.offset+count]
+            self.offset = self.offset+count
+        return data
+    #
+    # end method: read
+
+    # method: randbelow
+    #
+    def randbelow(self, n: int) -> int:
+        '''This method returns a uniformly distributed integer in [0, n).'''
+
+        if n < 1:
+            raise ValueError("The range is empty")
+        bits = (n-1).bit_length()
+        size = (bits+7)//8
+        while True:
+            value = int.from_bytes(self.read(size), 'big') >> (8*size-bits)
+            if value < n:
+                return value
+    #
+    # end method: randbelow
+
+    # method: randint
+    #
+    def randint(self, a: int, b: int) -> int:
+        '''This method returns a uniformly distributed integer in [a, b].'''
+
+        return a+self.randbelow(b-a+1)
+    #
+    # end method: randint
+#
+# end class: RandomPool
+
+# the pool of this process
+#
+_pool = RandomPool()
+
+# function: get_pool
+#
+def get_pool() -> RandomPool:
+    '''This function returns the random pool of this process.'''
+
+    return _pool
+#
+# end function: get_pool
+
+# function: seed_pool
+#
+def seed_pool(seed: Optional[bytes]) -> None:
+    '''This function switches the process pool to the deterministic mode (benchmarks only) or back to OS entropy.'''
+
+    global _pool
+    _pool = RandomPool(_pool.block_size, seed)
+#
+# end function: seed_pool
+
+# number the children and drop inherited bytes right after a fork
+#
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(before=lambda: _pool.fork(), after_in_child=lambda: _pool.reset())
+
+#
+# end file: random_pool.py
@@ -0,0 +1,242 @@
+# file: schedule_planner.py
+#
+'''This file contains the SchedulePlanner class and the Transmission it plans.'''
+
+# import modules
+#
+from typing import Optional
+from tgdhstruct.binary_tree import BinaryTree
+from tgdhstruct.data_node import DataNode
+
+# class: Transmission
+#
+class Transmission:
+    '''
+    Description
+    -----------
+    This class is one planned message of a key exchange: in round <rnd>, member <sender> sends the blind key
+    of the node at position <index> to the members in <receivers>.
+
+    Attributes
+    ----------
+    rnd : int
+        The round the message is sent in
+    sender : int
+        The member ID of the sender
+    receivers : list[int]
+        The member IDs of the receivers
+    index : int
+        The position of the node, (2^l)-1+v
+    name : str
+        The name of the node <l,v> (the topic the message is published on)
+    level : int
+        The level of the node
+    '''
+
+    # constructor
+    #
+    def __init__(self, rnd: int, sender: int, receivers: list[int], node: DataNode) -> None:
+        '''This is the constructor.'''
+
+        self.rnd = rnd
+        self.sender = sender
+        self.receivers = receivers
+        self.index = (1 << node.l)-1+node.v
+        self.name = node.name
+        self.level = node.l
+    #
+    # end constructor
+
+    # method: __repr__
+    #
+    def __repr__(self) -> str:
+        '''This method returns a readable description of the message.'''
+
+        return f'Transmission(rnd={self.rnd}, {self.name}: {self.sender} -> {self.receivers})'
+    #
+    # end method: __repr__
+#
+# end class: Transmission
+
+# class: SchedulePlanner
+#
+class SchedulePlanner:
+    '''
+    Description
+    -----------
+    This class computes the message schedule of a key exchange once, from a single copy of the tree, so the
+    protocols no longer work out senders and receivers round by round from every member's remote tree.
+    One post-order pass lists the member IDs in tree order and gives every node the range of that list below
+    it (offset and count), so the planner takes O(n) memory however deep the tree; a schedule is a list of
+    rounds, each a list of Transmissions, and its size is the number of messages it contains.
+
+    Initial exchange: the node <l,v> is sent in round (height-l) by the first member below it to the members
+    below its sibling, which then compute the next level. Rekeys: the sponsor sends the nodes of its key path
+    (the leaf only after a leave, when its key was renewed) one per round, to the members below each sibling.
+    A join at the top of a skinny tree needs no rekey message: the new member already holds the old root's blind
+    key from the sponsor's tree and has sent its own to every old member, so plan() and share() work such a join
+    out from the two new leaves alone, without the pass over the whole tree.
+
+    Attributes
+    ----------
+    tree : BinaryTree
+        The tree the schedules are planned from
+    leaves : list[int]
+        The member IDs in tree order
+    spans : dict[str, tuple[int, int]]
+        The offset and count of the member IDs below every node in <leaves>, by node name
+
+    Methods
+    -------
+    members(self, node: DataNode) -> list[int]
+        This method returns the member IDs below a node (in tree order).
+    receivers(schedule: list[list[Transmission]]) -> set[int]
+        This method returns every member receiving a message in a schedule.
+    plan(tree: BinaryTree, event: str, *args: int) -> list[list[Transmission]]
+        This method plans an exchange ('initial', 'join' or 'leave') from a tree.
+    share(tree: BinaryTree) -> Transmission
+        This method plans a joining member's first message: its blind key to the members below its sibling.
+    send(self, rnd: int, node: DataNode, sender: Optional[int]=None, exclude: tuple[Optional[int], ...]=()) -> Transmission
+        This method plans the message carrying the blind key of a node to the members below its sibling.
+    initial(self) -> list[list[Transmission]]
+        This method plans the initial key exchange level by level.
+    rekey(self, spon_id: int, nodes: list[DataNode], exclude: tuple[Optional[int], ...]) -> list[list[Transmission]]
+        This method plans the sponsor sending the blind keys of some nodes, one per round.
+    join(self, spon_id: int, new_id: int) -> list[list[Transmission]]
+        This method plans the key exchange after a join.
+    leave(self, spon_id: int) -> list[list[Transmission]]
+        This method plans the key exchange after a leave.
+    '''
+
+    # constructor
+    #
+    def __init__(self, tree: BinaryTree) -> None:
+        '''This is the constructor.'''
+
+        # the members below a node are contiguous in post-order, starting with those below its first child
+        #
+        self.tree = tree
+        self.leaves = []
+        self.spans = {}
+        for node in tree.walk_post_order(tree.root):
+            if node.is_leaf:
+                self.spans[node.name] = (len(self.leaves), 1)
+                self.leaves.append(node.mid)
+            else:
+                offset = self.spans[node.children[0].name][0]
+                self.spans[node.name] = (offset, len(self.leaves)-offset)
+    #
+    # end constructor
+
+    # method: members
+    #
+    def members(self, node: DataNode) -> list[int]:
+        '''This method returns the member IDs below a node (in tree order).'''
+
+        offset, count = self.spans[node.name]
+        return self.leaves[offset:offset+count]
+    #
+    # end method: members
+
+    # method: receivers
+    #
+    @staticmethod
+    def receivers(schedule: list[list[Transmission]]) -> set[int]:
+        '''This method returns every member receiving a message in a schedule.'''
+
+        return {mid for transmissions in schedule for message in transmissions for mid in message.receivers}
+    #
+    # end method: receivers
+
+    # method: plan
+    #
+    @classmethod
+    def plan(cls, tree: BinaryTree, event: str, *args: int) -> list[list[Transmission]]:
+        '''This method plans an exchange ('initial', 'join' or 'leave') from a tree.'''
+
+        # the sponsor's key path after a join at the top of a skinny tree is itself, the old root and the new
+        # root: the old root's sibling is the new member, so nobody needs a rekey message
+        #
+        if event == 'join' and tree.layout == 'str':
+            return []
+        return getattr(cls(tree), event)(*args)
+    #
+    # end method: plan
+
+    # method: share
+    #
+    @staticmethod
+    def share(tree: BinaryTree) -> Transmission:
+        '''This method plans a joining member's first message: its blind key to the members below its sibling.'''
+
+        # the sibling is the sponsor's leaf in a balanced tree and the old root in a skinny tree
+        #
+        sibling = tree.my_node.get_sibling()
+        receivers = [node.mid for node in tree.walk_post_order(sibling) if node.is_leaf]
+        return Transmission(0, tree.uid, receivers, tree.my_node)
+    #
+    # end method: share
+
+    # method: send
+    #
+    def send(self, rnd: int, node: DataNode, sender: Optional[int]=None, exclude: tuple[Optional[int], ...]=()) -> Transmission:
+        '''This method plans the message carrying the blind key of a node to the members below its sibling.'''
+
+        # by default the first member below the node sends it
+        #
+        if sender is None:
+            sender = self.leaves[self.spans[node.name][0]]
+        receivers = [mid for mid in self.members(node.get_sibling()) if mid not in exclude]
+        return Transmission(rnd, sender, receivers, node)
+    #
+    # end method: send
+
+    # method: initial
+    #
+    def initial(self) -> list[list[Transmission]]:
+        '''This method plans the initial key exchange level by level.'''
+
+        height = self.tree.root.height
+        schedule = [[] for _ in range(height)]
+        for node in self.tree.walk_post_order(self.tree.root):
+            if node.parent is not None:
+                schedule[height-node.l].append(self.send(height-node.l, node))
+        return schedule
+    #
+    # end method: initial
+
+    # method: rekey
+    #
+    def rekey(self, spon_id: int, nodes: list[DataNode], exclude: tuple[Optional[int], ...]) -> list[list[Transmission]]:
+        '''This method plans the sponsor sending the blind keys of some nodes, one per round.'''
+
+        # a node nobody needs (its sibling is the excluded new member) costs no round
+        #
+        nodes = [node for node in nodes if any(mid not in exclude for mid in self.members(node.get_sibling()))]
+        return [[self.send(rnd, node, spon_id, exclude)] for rnd, node in enumerate(nodes)]
+    #
+    # end method: rekey
+
+    # method: join
+    #
+    def join(self, spon_id: int, new_id: int) -> list[list[Transmission]]:
+        '''This method plans the key exchange after a join.'''
+
+        key_path = self.tree.find_node(spon_id, True).get_key_path()
+        return self.rekey(spon_id, key_path[1:-1], (spon_id, new_id))
+    #
+    # end method: join
+
+    # method: leave
+    #
+    def leave(self, spon_id: int) -> list[list[Transmission]]:
+        '''This method plans the key exchange after a leave.'''
+
+        key_path = self.tree.find_node(spon_id, True).get_key_path()
+        return self.rekey(spon_id, key_path[:-1], (spon_id,))
+    #
+    # end method: leave
+#
+# end class: SchedulePlanner
+#
+# end file: schedule_planner.py
@@ -0,0 +1,215 @@
+# file: shm_transport.py
+#
+'''This file contains the SharedKeyTable class.'''
+
+# import modules
+#
+import time
+import struct
+from typing import Optional
+from multiprocessing import shared_memory
+from tgdhstruct.data_node import DataNode
+
+# class: SharedKeyTable
+#
+class SharedKeyTable:
+    '''
+    Description
+    -----------
+    This class is a blind-key table in shared memory for members running on the same host.
+    The node <l,v> owns the record at position (2^l)-1+v: an 8-byte epoch stamp followed by the blind key
+    (fixed width, big-endian). A writer stamps what it writes with the current epoch, so a reader pulls only
+    the co-path keys refreshed in this epoch, straight out of the shared block and without a socket round trip.
+    The block cannot grow once other processes attached to it: it is sized for the largest group up front
+    (see levels_for).
+
+    The header carries a sequence word used as a seqlock: a writer makes it odd while it writes and even when
+    done, and a reader retries if the word was odd or changed while it read. Writers must not overlap (the
+    MemberAgent protocols call them one at a time).
+
+    Attributes
+    ----------
+    shm : shared_memory.SharedMemory
+        The shared memory block
+    name : str
+        The name other processes attach with
+    levels : int
+        The number of tree levels the table has room for
+    key_size : int
+        The width of a blind key in bytes
+    capacity : int
+        The number of node positions
+    owner : bool
+        Whether this process created (and will unlink) the block
+
+    Methods
+    -------
+    levels_for(max_size: int) -> int
+        This method returns the number of levels a balanced tree of up to <max_size> members can reach.
+    get_sequence(self) -> int
+        This method returns the sequence word.
+    get_epoch(self) -> int
+        This method returns the current epoch.
+    advance(self) -> int
+        This method starts a new epoch and returns it.
+    position(name: str) -> int
+        This method returns the position of a node from its name <l,v>.
+    write(self, bkeys: dict[str, int]) -> None
+        This method stores blind keys by node name, stamped with the current epoch.
+    read(self, names: list[str], since: Optional[int]=None) -> dict[str, int]
+        This method returns the named blind keys that were written in the current epoch (or since an epoch).
+    close(self) -> None
+        This method detaches from the block (and removes it if this process created it).
+    '''
+
+    # define the header layout: sequence, epoch, levels, key size
+    #
+    HEADER = struct.Struct('<QQII')
+    HEADER_SIZE = 32
+
+    # constructor
+    #
+    def __init__(self, levels: Optional[int]=None, name: Optional[str]=None) -> None:
+        '''This is the constructor (an existing table is attached when a name is given).'''
+
+        if name is None:
+            self.levels = levels
+            self.key_size = (DataNode.p.bit_length()+7)//8
+            size = SharedKeyTable.HEADER_SIZE + ((2**levels)-1)*(8+self.key_size)
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            SharedKeyTable.HEADER.pack_into(self.shm.buf, 0, 0, 0, self.levels, self.key_size)
+            self.owner = True
+        else:
+            # only the creator may remove the block (forked agents share the creator's resource tracker;
+            # where supported, attaching does not register the block at all)
+            #
+            try:
+                self.shm = shared_memory.SharedMemory(name=name, track=False)
+            except TypeError:
+                self.shm = shared_memory.SharedMemory(name=name)
+            _, _, self.levels, self.key_size = SharedKeyTable.HEADER.unpack_from(self.shm.buf, 0)
+            self.owner = False
+        self.name = self.shm.name
+        self.capacity = (2**self.levels)-1
+    #
+    # end constructor
+
+    # method: levels_for
+    #
+    @staticmethod
+    def levels_for(max_size: int) -> int:
+        '''This method returns the number of levels a balanced tree of up to <max_size> members can reach.'''
+
+        # a join splits the shallowest leaf, which is at most floor(log2(n)) deep in a tree of n leaves, and no
+        # other event makes a node deeper: the deepest node of a group of at most N members is at level
+        # ceil(log2(N))
+        #
+        return max(max_size-1, 1).bit_length()+1
+    #
+    # end method: levels_for
+
+    # method: get_sequence
+    #
+    def get_sequence(self) -> int:
+        '''This method returns the sequence word.'''
+
+        return struct.unpack_from('<Q', self.shm.buf, 0)[0]
+    #
+    # end method: get_sequence
+
+    # method: get_epoch
+    #
+    def get_epoch(self) -> int:
+        '''This method returns the current epoch.'''
+
+        return struct.unpack_from('<Q', self.shm.buf, 8)[0]
+    #
+    # end method: get_epoch
+
+    # method: advance
+    #
+    def advance(self) -> int:
+        '''This method starts a new epoch and returns it.'''
+
+        epoch = self.get_epoch()+1
+        struct.pack_into('<Q', self.shm.buf, 8, epoch)
+        return epoch
+    #
+    # end method: advance
+
+    # method: position
+    #
+    @staticmethod
+    def position(name: str) -> int:
+        '''This method returns the position of a node from its name <l,v>.'''
+
+        l, v = (int(index) for index in name.strip('<>').split(','))
+        return (1 << l)-1+v
+    #
+    # end method: position
+
+    # method: write
+    #
+    def write(self, bkeys: dict[str, int]) -> None:
+        '''This method stores blind keys by node name, stamped with the current epoch.'''
+
+        buf = self.shm.buf
+        epoch = self.get_epoch()
+        stamp = epoch.to_bytes(8, 'little')
+        record = 8+self.key_size
+        seq = self.get_sequence()
+        struct.pack_into('<Q', buf, 0, seq+1)
+        try:
+            for name, b_key in bkeys.items():
+                pos = SharedKeyTable.position(name)
+                if pos >= self.capacity:
+                    raise ValueError(f"The key table has no room for node {name}")
+                start = SharedKeyTable.HEADER_SIZE+record*pos
+                buf[start+8:start+record] = int(b_key).to_bytes(self.key_size, 'big')
+                buf[start:start+8] = stamp
+        finally:
+            struct.pack_into('<Q', buf, 0, seq+2)
+    #
+    # end method: write
+
+    # method: read
+    #
+    def read(self, names: list[str], since: Optional[int]=None) -> dict[str, int]:
+        '''This method returns the named blind keys that were written in the current epoch (or since an epoch).'''
+
+        buf = self.shm.buf
+        record = 8+self.key_size
+        while True:
+            seq = self.get_sequence()
+            if seq % 2:
+                time.sleep(0)
+                continue
+            epoch = self.get_epoch()
+            first = epoch if since is None else since
+            bkeys = {}
+            for name in names:
+                pos = SharedKeyTable.position(name)
+                if pos >= self.capacity:
+                    continue
+                start = SharedKeyTable.HEADER_SIZE+record*pos
+                if first <= int.from_bytes(buf[start:start+8], 'little') <= epoch:
+                    bkeys[name] = int.from_bytes(buf[start+8:start+record], 'big')
+            if self.get_sequence() == seq:
+                return bkeys
+    #
+    # end method: read
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method detaches from the block (and removes it if this process created it).'''
+
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+    #
+    # end method: close
+#
+# end class: SharedKeyTable
+#
+# end file: shm_transport.py
@@ -0,0 +1,251 @@
+# file: trace_replay.py
+#
+'''This file contains the TraceReplay class and the trace replay command-line entry point.'''
+
+# import modules
+#
+import sys
+import json
+import time
+import hashlib
+import argparse
+import contextlib
+from typing import Iterable, Optional, TextIO, Union
+from tgdhstruct.binary_tree import BinaryTree
+
+# class: TraceReplay
+#
+class TraceReplay:
+    '''
+    Description
+    -----------
+    This class streams a JSONL trace of membership events through a TGDH group and reports, for every event,
+    a fingerprint of the resulting group key and the time the event took.
+
+    Trace events (one JSON object per line):
+        {"event": "join"}
+        {"event": "leave", "member": <member ID>}
+        {"event": "merge", "size": <number of members>}  (replayed as that many joins)
+
+    With the 'tree' backend a single BinaryTree holds the keys of every member, so each event costs one
+    sponsor key-path computation; with the 'agent' backend the events run through the MemberAgent protocols.
+
+    Attributes
+    ----------
+    backend : str
+        The group implementation: 'tree' or 'agent'
+    tree : BinaryTree
+        The tree holding every member's keys (tree backend)
+    group : MemberAgent
+        The multi-agent group (agent backend)
+    epoch : int
+        The number of events applied so far
+
+    Methods
+    -------
+    start(self, size: int) -> None
+        This method creates the initial group and computes its group key.
+    join(self) -> int
+        This method adds a member to the group and returns its member ID.
+    leave(self, eid: int) -> None
+        This method removes a member from the group.
+    members(self) -> list[int]
+        This method returns the member IDs currently in the group.
+    fingerprint(self) -> str
+        This method returns a short fingerprint of the current group key.
+    apply(self, event: Union[dict, str]) -> dict
+        This method applies one trace event (or parses and applies one trace line) and returns its result record.
+    replay(self, lines: Iterable[str], out: TextIO) -> int
+        This method replays a trace line by line, writing one result record per event.
+    close(self) -> None
+        This method shuts down the agent backend.
+    '''
+
+    # constructor
+    #
+    def __init__(self, backend: str='tree') -> None:
+        '''This is the constructor.'''
+
+        if backend not in ('tree', 'agent'):
+            raise ValueError(f"Unknown backend: {backend}")
+        self.backend = backend
+        self.tree = None
+        self.group = None
+        self.epoch = 0
+    #
+    # end constructor
+
+    # method: start
+    #
+    def start(self, size: int) -> None:
+        '''This method creates the initial group and computes its group key.'''
+
+        if self.backend == 'tree':
+            self.tree = BinaryTree(size, 1, verbose=False)
+            self.tree.seed_group_key()
+        else:
+            from tgdhstruct.member_agent import MemberAgent
+            self.group = MemberAgent(size, broadcast=True)
+    #
+    # end method: start
+
+    # method: join
+    #
+    def join(self) -> int:
+        '''This method adds a member to the group and returns its member ID.'''
+
+        if self.backend == 'agent':
+            self.group.join_protocol()
+            return self.group.new_id
+        return self.tree.simulate_join()
+    #
+    # end method: join
+
+    # method: leave
+    #
+    def leave(self, eid: int) -> None:
+        '''This method removes a member from the group.'''
+
+        if eid not in self.members():
+            raise ValueError(f"Member {eid} is not in the group")
+        if len(self.members()) <= 2:
+            raise ValueError("The group would be left with a single member")
+        if self.backend == 'agent':
+            self.group.leave_protocol(eid)
+        else:
+            self.tree.simulate_leave(eid)
+    #
+    # end method: leave
+
+    # method: members
+    #
+    def members(self) -> list[int]:
+        '''This method returns the member IDs currently in the group.'''
+
+        if self.backend == 'agent':
+            return list(self.group.agents)
+        return [node.mid for node in self.tree.get_leaves()]
+    #
+    # end method: members
+
+    # method: fingerprint
+    #
+    def fingerprint(self) -> str:
+        '''This method returns a short fingerprint of the current group key.'''
+
+        if self.backend == 'agent':
+            key = next(iter(self.group.agents.values())).tree_summary()['key']
+        else:
+            key = self.tree.root.key
+        return hashlib.sha256(str(key).encode()).hexdigest()[:16]
+    #
+    # end method: fingerprint
+
+    # method: apply
+    #
+    def apply(self, event: Union[dict, str]) -> dict:
+        '''This method applies one trace event (or parses and applies one trace line) and returns its result record.'''
+
+        record = {'event': None}
+        start = time.perf_counter()
+        try:
+            # a malformed line or event gets an error record like an event that cannot be applied (a line that
+            # is not JSON raises json.JSONDecodeError, which is a ValueError; a null member raises a TypeError)
+            #
+            if isinstance(event, str):
+                event = json.loads(event)
+            if not isinstance(event, dict):
+                raise ValueError(f"An event must be a JSON object: {json.dumps(event)}")
+            kind = record['event'] = event.get('event')
+            if kind == 'join':
+                record['member'] = self.join()
+            elif kind == 'leave':
+                record['member'] = int(event['member'])
+                self.leave(record['member'])
+            elif kind == 'merge':
+                size = int(event['size'])
+                if size < 1:
+                    raise ValueError(f"A merge must add at least one member: {size}")
+                record['members'] = [self.join() for _ in range(size)]
+            else:
+                raise ValueError(f"Unknown event: {kind}")
+        except (KeyError, TypeError, ValueError) as err:
+            record['error'] = str(err)
+        else:
+            self.epoch = self.epoch+1
+        record['ms'] = round((time.perf_counter()-start)*1000, 3)
+        record['epoch'] = self.epoch
+        record['size'] = len(self.members())
+        record['fingerprint'] = self.fingerprint()
+        return record
+    #
+    # end method: apply
+
+    # method: replay
+    #
+    def replay(self, lines: Iterable[str], out: TextIO) -> int:
+        '''This method replays a trace line by line, writing one result record per event.'''
+
+        count = 0
+        for line in lines:
+            line = line.strip()
+            if not line:
+                continue
+
+            # keep protocol output off the record stream
+            #
+            with contextlib.redirect_stdout(sys.stderr):
+                record = self.apply(line)
+            record['seq'] = count
+            out.write(json.dumps(record) + '\n')
+            count = count+1
+        return count
+    #
+    # end method: replay
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method shuts down the agent backend.'''
+
+        if self.group is not None:
+            with contextlib.redirect_stdout(sys.stderr):
+                self.group.close()
+    #
+    # end method: close
+#
+# end class: TraceReplay
+
+# function: main
+#
+def main(argv: Optional[list[str]]=None) -> None:
+    '''This is the main function.'''
+
+    parser = argparse.ArgumentParser(description='Replay a JSONL trace of join/leave/merge events through a TGDH group.')
+    parser.add_argument('trace', help="path of the JSONL trace ('-' for standard input)")
+    parser.add_argument('--size', type=int, required=True, help='number of members in the initial group')
+    parser.add_argument('--backend', choices=('tree', 'agent'), default='tree', help='group implementation to replay through')
+    parser.add_argument('-o', '--output', default='-', help="path of the JSONL result stream ('-' for standard output)")
+    args = parser.parse_args(argv)
+
+    # stream the trace through the group
+    #
+    engine = TraceReplay(args.backend)
+    with contextlib.redirect_stdout(sys.stderr):
+        engine.start(args.size)
+    with contextlib.ExitStack() as stack:
+        trace = sys.stdin if args.trace == '-' else stack.enter_context(open(args.trace, encoding='utf-8'))
+        out = sys.stdout if args.output == '-' else stack.enter_context(open(args.output, 'w', encoding='utf-8'))
+        try:
+            count = engine.replay(trace, out)
+        finally:
+            engine.close()
+    print(f"SYS: {count} events replayed.", file=sys.stderr)
+
+# begin gracefully
+#
+if __name__ == '__main__':
+    main()
+
+#
+# end file: trace_replay.py
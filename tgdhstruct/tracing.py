@@ -0,0 +1,253 @@
+# file: tracing.py
+#
+'''This file contains the Tracer class, the traced decorator and the TracedAgent proxy wrapper.'''
+
+# import modules
+#
+import os
+import json
+import time
+import threading
+import functools
+import contextlib
+from collections import deque
+from typing import Any, Callable, Iterator
+from tgdhstruct.data_node import DataNode
+
+# class: Tracer
+#
+class Tracer:
+    '''
+    Description
+    -----------
+    This class records timed spans of the protocol phases into a ring buffer and exports them in the Chrome
+    trace-event format (open the file in chrome://tracing or ui.perfetto.dev). Tracing is off until enabled;
+    a disabled span costs one attribute check. Every span is tagged with the exponentiations it performed
+    (in this process) and with the arguments it was opened with (member ID, level, epoch, ...).
+
+    Each process has its own tracer (see get_tracer); spans carry the process and thread IDs.
+
+    Attributes
+    ----------
+    enabled : bool
+        Whether spans are recorded
+    events : deque[dict]
+        The recorded trace events (the oldest are dropped once the buffer is full)
+    origin : float
+        The time the timestamps are relative to
+
+    Methods
+    -------
+    enable(self) -> None
+        This method starts recording.
+    disable(self) -> None
+        This method stops recording.
+    clear(self) -> None
+        This method drops all recorded events.
+    span(self, name: str, cat: str='tgdh', **args: Any) -> Iterator[None]
+        This method times the enclosed block as one complete event.
+    instant(self, name: str, cat: str='tgdh', **args: Any) -> None
+        This method records a point in time.
+    sleep(self, seconds: float, **args: Any) -> None
+        This method sleeps inside a span, so fixed waits show on the timeline.
+    export(self, path: str) -> int
+        This method writes the recorded events to a trace JSON file and returns their number.
+    '''
+
+    # constructor
+    #
+    def __init__(self, capacity: int=65536) -> None:
+        '''This is the constructor.'''
+
+        self.enabled = False
+        self.events = deque(maxlen=capacity)
+        self.origin = time.perf_counter()
+    #
+    # end constructor
+
+    # method: enable
+    #
+    def enable(self) -> None:
+        '''This method starts recording.'''
+
+        self.enabled = True
+    #
+    # end method: enable
+
+    # method: disable
+    #
+    def disable(self) -> None:
+        '''This method stops recording.'''
+
+        self.enabled = False
+    #
+    # end method: disable
+
+    # method: clear
+    #
+    def clear(self) -> None:
+        '''This method drops all recorded events.'''
+
+        self.events.clear()
+    #
+    # end method: clear
+
+    # method: span
+    #
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str='tgdh', **args: Any) -> Iterator[None]:
+        '''This method times the enclosed block as one complete event.'''
+
+        if not self.enabled:
+            yield
+            return
+        exps = DataNode.exps
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            args['exps'] = DataNode.exps-exps
+            self.events.append({
+                'name': name, 'cat': cat, 'ph': 'X',
+                'ts': round((start-self.origin)*1e6, 1), 'dur': round((end-start)*1e6, 1),
+                'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args,
+            })
+    #
+    # end method: span
+
+    # method: instant
+    #
+    def instant(self, name: str, cat: str='tgdh', **args: Any) -> None:
+        '''This method records a point in time.'''
+
+        if self.enabled:
+            self.events.append({
+                'name': name, 'cat': cat, 'ph': 'i', 's': 't',
+                'ts': round((time.perf_counter()-self.origin)*1e6, 1),
+                'pid': os.getpid(), 'tid': threading.get_ident(), 'args': args,
+            })
+    #
+    # end method: instant
+
+    # method: sleep
+    #
+    def sleep(self, seconds: float, **args: Any) -> None:
+        '''This method sleeps inside a span, so fixed waits show on the timeline.'''
+
+        with self.span('sleep', 'wait', **args):
+            time.sleep(seconds)
+    #
+    # end method: sleep
+
+    # method: export
+    #
+    def export(self, path: str) -> int:
+        '''This method writes the recorded events to a trace JSON file and returns their number.'''
+
+        events = list(self.events)
+        with open(path, 'w', encoding='utf-8') as out:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, out)
+        return len(events)
+    #
+    # end method: export
+#
+# end class: Tracer
+
+# the tracer of this process
+#
+_tracer = Tracer()
+
+# function: get_tracer
+#
+def get_tracer() -> Tracer:
+    '''This function returns the tracer of this process.'''
+
+    return _tracer
+#
+# end function: get_tracer
+
+# function: traced
+#
+def traced(name: str, cat: str='tree') -> Callable:
+    '''This function decorates a method with a span tagged with the member ID (or sponsor), level and epoch.'''
+
+    # function: decorate
+    #
+    def decorate(method: Callable) -> Callable:
+        '''This helper function wraps the method.'''
+
+        @functools.wraps(method)
+        def wrapper(self, *args: Any, **kwargs: Any) -> Any:
+            if not _tracer.enabled:
+                return method(self, *args, **kwargs)
+            tags = {}
+            if hasattr(self, 'uid'):
+                tags['member'] = self.uid
+            elif hasattr(self, 'spon_id'):
+                tags['sponsor'] = self.spon_id
+            if getattr(self, 'my_node', None) is not None:
+                tags['level'] = self.my_node.l
+            if hasattr(self, 'epoch'):
+                tags['epoch'] = self.epoch
+            with _tracer.span(name, cat, **tags):
+                return method(self, *args, **kwargs)
+        return wrapper
+    #
+    # end function: decorate
+
+    return decorate
+#
+# end function: traced
+
+# class: TracedAgent
+#
+class TracedAgent:
+    '''
+    Description
+    -----------
+    This class wraps an agent proxy so that every remote call (tree_join, tree_calculate, bind, send, ...)
+    is recorded as a span tagged with the member ID; everything else is passed through to the proxy.
+
+    Attributes
+    ----------
+    proxy : Proxy
+        The wrapped agent proxy
+    mid : int
+        The member ID of the agent
+
+    Methods
+    -------
+    __getattr__(self, name: str) -> Any
+        This method returns an attribute of the proxy (remote methods wrapped in spans).
+    '''
+
+    # constructor
+    #
+    def __init__(self, proxy: Any, mid: int) -> None:
+        '''This is the constructor.'''
+
+        self.proxy = proxy
+        self.mid = mid
+    #
+    # end constructor
+
+    # method: __getattr__
+    #
+    def __getattr__(self, name: str) -> Any:
+        '''This method returns an attribute of the proxy (remote methods wrapped in spans).'''
+
+        attr = getattr(self.proxy, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args: Any, **kwargs: Any) -> Any:
+            with _tracer.span(f'proxy.{name}', 'proxy', member=self.mid):
+                return attr(*args, **kwargs)
+        return call
+    #
+    # end method: __getattr__
+#
+# end class: TracedAgent
+#
+# end file: tracing.py
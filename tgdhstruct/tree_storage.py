@@ -0,0 +1,599 @@
+# file: tree_storage.py
+#
+'''This file contains the MappedKeyStore class.'''
+
+# import modules
+#
+import sys
+import mmap
+import math
+import struct
+from array import array
+from typing import Iterator, Optional
+from tgdhstruct.data_node import DataNode
+from tgdhstruct.binary_tree import BinaryTree
+
+# node types as stored in the type column (0 marks an empty position)
+#
+NODE_TYPES = {'root': 1, 'inter': 2, 'mem': 3}
+TYPE_NAMES = {1: 'root', 2: 'inter', 3: 'mem'}
+
+# class: MappedKeyStore
+#
+class MappedKeyStore:
+    '''
+    Description
+    -----------
+    This class keeps the public state of a TGDH tree (node types, member IDs and fixed-width blind keys) in a
+    memory-mapped file indexed by node position: the node <l,v> lives at position (2^l)-1+v. Private keys are
+    never stored; a member materializes only its key path and co-path as DataNodes (see BinaryTree with
+    storage=...), so the RAM a member needs grows with log(n) while the file holds all 2n-1 nodes.
+
+    Layout: a 64-byte header (magic, key size, levels, size, next member ID, epoch, index size), then a type
+    column (1 byte per position), a member ID column (8 bytes per position), a blind key column (<key_size>
+    bytes per position, big-endian, all zeros while unknown) and a member index (8 bytes per member ID: the
+    position of the member's leaf plus one, 0 if the member is not in the tree), so a member is found without
+    scanning the tree. The file is sparse on most file systems, so unused positions cost no disk space; when a
+    join needs a level the file does not have, the file doubles its positions (grow), and the index doubles
+    when the member IDs outrun it.
+
+    Attributes
+    ----------
+    path : str
+        The path of the backing file
+    key_size : int
+        The width of a stored blind key in bytes
+    levels : int
+        The number of tree levels the file has room for
+    capacity : int
+        The number of node positions the file has room for
+    index_capacity : int
+        The number of member IDs the member index has room for
+    size : int
+        The number of members in the initial group
+    nextmemb : int
+        The member ID of the next member to join
+    epoch : int
+        The number of join and leave events applied to the store
+    file : BinaryIO
+        The open backing file
+    mm : mmap.mmap
+        The memory map of the backing file
+
+    Methods
+    -------
+    slot(l: int, v: int) -> int
+        This method returns the position of the node <l,v>.
+    set_offsets(self) -> None
+        This method calculates the offsets of the columns from the capacities.
+    resize(self, length: int) -> None
+        This method changes the length of the backing file and maps it again.
+    clear(self, start: int, stop: int) -> None
+        This method zeroes a range of the file.
+    grow(self, levels: int) -> None
+        This method makes room for more levels, moving the columns to their new offsets.
+    grow_index(self, count: int) -> None
+        This method makes room for more member IDs in the member index.
+    set_index(self, mid: int, slot: Optional[int]) -> None
+        This method records the position of a member's leaf in the member index (None removes the member).
+    get_type(self, slot: int) -> Optional[str]
+        This method returns the node type at a position (None if the position is empty).
+    get_mid(self, slot: int) -> Optional[int]
+        This method returns the member ID at a position.
+    get_blind_key(self, slot: int) -> Optional[int]
+        This method returns the blind key at a position (None if unknown).
+    set_node(self, slot: int, ntype: Optional[str], mid: Optional[int]=None, b_key: Optional[int]=None) -> None
+        This method writes one node record.
+    build(self) -> None
+        This method writes the structure and member IDs of the initial tree.
+    seed_group_key(self) -> int
+        This method generates every leaf key, stores every blind key and returns the group key (simulation only).
+    find_member(self, mid: int) -> Optional[int]
+        This method returns the position of a member's leaf.
+    find_insertion(self) -> int
+        This method returns the position of the rightmost leaf on the shallowest level.
+    members(self) -> Iterator[int]
+        This method yields the member IDs of all leaves.
+    load_path(self, mid: int) -> tuple[DataNode, DataNode]
+        This method materializes a member's key path and co-path and returns the root and the member's node.
+    load_node(self, slot: int, pos: str, parent: DataNode) -> DataNode
+        This method materializes the node at a position as a child of a given node.
+    publish(self, bkeys: dict[str, int]) -> None
+        This method stores blind keys by node name.
+    move_subtree(self, src: int, dst: int) -> None
+        This method moves the subtree at one position to another (higher) position.
+    compare(self, tree: BinaryTree) -> list[int]
+        This method returns the positions where the store differs from an in-memory tree (type or member ID).
+    join(self) -> tuple[int, int]
+        This method inserts a new member and returns the IDs of the new member and the sponsor.
+    leave(self, eid: int) -> int
+        This method removes a member and returns the ID of the sponsor.
+    write_header(self) -> None
+        This method writes the header fields.
+    close(self) -> None
+        This method flushes and closes the backing file.
+    '''
+
+    # define the header layout
+    #
+    MAGIC = b'TGDHKEYS'
+    HEADER = struct.Struct('<8sIIQQQQ')
+    HEADER_SIZE = 64
+
+    # constructor
+    #
+    def __init__(self, path: str, size: Optional[int]=None, levels: Optional[int]=None) -> None:
+        '''This is the constructor (an existing store is opened when no size is given).'''
+
+        self.path = path
+        if size is None:
+            self.file = open(path, 'r+b')
+            self.mm = mmap.mmap(self.file.fileno(), 0)
+            magic, self.key_size, self.levels, self.size, self.nextmemb, self.epoch, self.index_capacity = \
+                MappedKeyStore.HEADER.unpack_from(self.mm, 0)
+            if magic != MappedKeyStore.MAGIC:
+                raise ValueError(f"{path} is not a key store")
+            if self.key_size != (DataNode.p.bit_length()+7)//8:
+                raise ValueError(f"{path} was created for a different modulus")
+        else:
+            if size < 2:
+                raise ValueError("A group needs at least two members")
+            height = math.floor(math.log((2*size)-1, 2))
+            self.key_size = (DataNode.p.bit_length()+7)//8
+            self.levels = levels if levels is not None else height+4
+            self.size = size
+            self.nextmemb = size+1
+            self.epoch = 0
+            self.index_capacity = 2*size
+            self.file = open(path, 'w+b')
+            self.file.truncate(MappedKeyStore.HEADER_SIZE + ((2**self.levels)-1)*(9+self.key_size) + 8*self.index_capacity)
+            self.mm = mmap.mmap(self.file.fileno(), 0)
+        self.capacity = (2**self.levels)-1
+        self.set_offsets()
+        if size is not None:
+            self.build()
+        elif self.index_capacity < self.nextmemb or len(self.mm) != self.index+8*self.index_capacity:
+            raise ValueError(f"{path} has a member index that does not match its header")
+    #
+    # end constructor
+
+    # method: slot
+    #
+    @staticmethod
+    def slot(l: int, v: int) -> int:
+        '''This method returns the position of the node <l,v>.'''
+
+        return (1 << l)-1+v
+    #
+    # end method: slot
+
+    # method: set_offsets
+    #
+    def set_offsets(self) -> None:
+        '''This method calculates the offsets of the columns from the capacities.'''
+
+        self.types = MappedKeyStore.HEADER_SIZE
+        self.mids = self.types+self.capacity
+        self.bkeys = self.mids+8*self.capacity
+        self.index = self.bkeys+self.key_size*self.capacity
+    #
+    # end method: set_offsets
+
+    # method: resize
+    #
+    def resize(self, length: int) -> None:
+        '''This method changes the length of the backing file and maps it again.'''
+
+        self.mm.flush()
+        self.mm.close()
+        self.file.truncate(length)
+        self.mm = mmap.mmap(self.file.fileno(), 0)
+    #
+    # end method: resize
+
+    # method: clear
+    #
+    def clear(self, start: int, stop: int) -> None:
+        '''This method zeroes a range of the file.'''
+
+        # in pieces, so that a large range does not need a buffer of its size
+        #
+        step = 1 << 24
+        for pos in range(start, stop, step):
+            end = min(pos+step, stop)
+            self.mm[pos:end] = bytes(end-pos)
+    #
+    # end method: clear
+
+    # method: grow
+    #
+    def grow(self, levels: int) -> None:
+        '''This method makes room for more levels, moving the columns to their new offsets.'''
+
+        # every column keeps its records at the front and grows at its end, so the columns move towards the
+        # end of the file: the last one first, each into space that is free by then. The ranges the columns
+        # leave behind are cleared
+        #
+        old = {'mids': self.mids, 'bkeys': self.bkeys, 'index': self.index}
+        count = self.capacity
+        self.levels = levels
+        self.capacity = (2**levels)-1
+        self.set_offsets()
+        self.resize(self.index+8*self.index_capacity)
+        self.mm.move(self.index, old['index'], 8*self.index_capacity)
+        self.mm.move(self.bkeys, old['bkeys'], self.key_size*count)
+        self.mm.move(self.mids, old['mids'], 8*count)
+        self.clear(self.types+count, self.mids)
+        self.clear(self.mids+8*count, self.bkeys)
+        self.clear(self.bkeys+self.key_size*count, self.index)
+        self.write_header()
+    #
+    # end method: grow
+
+    # method: grow_index
+    #
+    def grow_index(self, count: int) -> None:
+        '''This method makes room for more member IDs in the member index.'''
+
+        # the index is the last column, so it grows in place (the new entries are zeros)
+        #
+        self.index_capacity = max(count, 2*self.index_capacity)
+        self.resize(self.index+8*self.index_capacity)
+        self.write_header()
+    #
+    # end method: grow_index
+
+    # method: set_index
+    #
+    def set_index(self, mid: int, slot: Optional[int]) -> None:
+        '''This method records the position of a member's leaf in the member index (None removes the member).'''
+
+        if mid >= self.index_capacity:
+            self.grow_index(mid+1)
+        start = self.index+8*mid
+        self.mm[start:start+8] = (0 if slot is None else slot+1).to_bytes(8, 'little')
+    #
+    # end method: set_index
+
+    # method: get_type
+    #
+    def get_type(self, slot: int) -> Optional[str]:
+        '''This method returns the node type at a position (None if the position is empty).'''
+
+        if slot >= self.capacity:
+            return None
+        return TYPE_NAMES.get(self.mm[self.types+slot])
+    #
+    # end method: get_type
+
+    # method: get_mid
+    #
+    def get_mid(self, slot: int) -> Optional[int]:
+        '''This method returns the member ID at a position.'''
+
+        mid = int.from_bytes(self.mm[self.mids+8*slot:self.mids+8*slot+8], 'little')
+        return mid if mid else None
+    #
+    # end method: get_mid
+
+    # method: get_blind_key
+    #
+    def get_blind_key(self, slot: int) -> Optional[int]:
+        '''This method returns the blind key at a position (None if unknown).'''
+
+        start = self.bkeys+self.key_size*slot
+        b_key = int.from_bytes(self.mm[start:start+self.key_size], 'big')
+        return b_key if b_key else None
+    #
+    # end method: get_blind_key
+
+    # method: set_node
+    #
+    def set_node(self, slot: int, ntype: Optional[str], mid: Optional[int]=None, b_key: Optional[int]=None) -> None:
+        '''This method writes one node record.'''
+
+        if slot >= self.capacity:
+            self.grow(int(math.log2(slot+1))+1)
+        self.mm[self.types+slot] = NODE_TYPES[ntype] if ntype is not None else 0
+        self.mm[self.mids+8*slot:self.mids+8*slot+8] = (mid or 0).to_bytes(8, 'little')
+        start = self.bkeys+self.key_size*slot
+        self.mm[start:start+self.key_size] = (b_key or 0).to_bytes(self.key_size, 'big')
+        if mid is not None:
+            self.set_index(mid, slot)
+    #
+    # end method: set_node
+
+    # method: build
+    #
+    def build(self) -> None:
+        '''This method writes the structure and member IDs of the initial tree.'''
+
+        # the initial tree is complete down to level height-1; its rightmost <extra> nodes there have children
+        #
+        height = math.floor(math.log((2*self.size)-1, 2))
+        if height+1 > self.levels:
+            self.grow(height+1)
+        extra = self.size-2**(height-1)
+        for l in range(height-1):
+            self.mm[self.types+MappedKeyStore.slot(l, 0):self.types+MappedKeyStore.slot(l+1, 0)] = bytes([2])*(2**l)
+        first = MappedKeyStore.slot(height-1, 0)
+        shallow = 2**(height-1)-extra
+        self.mm[self.types+first:self.types+first+shallow] = bytes([3])*shallow
+        self.mm[self.types+first+shallow:self.types+first+2**(height-1)] = bytes([2])*extra
+        deep = MappedKeyStore.slot(height, 2*shallow)
+        self.mm[self.types+deep:self.types+deep+2*extra] = bytes([3])*(2*extra)
+        self.mm[self.types] = NODE_TYPES['root']
+
+        # member IDs from left to right: the shallow leaves, then the deep ones
+        #
+        mids = BinaryTree.member_ids(self.size, height)
+        ids = array('Q', mids)
+        if sys.byteorder == 'big':
+            ids.byteswap()
+        self.mm[self.mids+8*first:self.mids+8*(first+shallow)] = ids[:shallow].tobytes()
+        self.mm[self.mids+8*deep:self.mids+8*(deep+2*extra)] = ids[shallow:].tobytes()
+
+        # the member index, written in one piece
+        #
+        index = array('Q', bytes(8*self.index_capacity))
+        for i, mid in enumerate(mids):
+            index[mid] = (first+i if i < shallow else deep+i-shallow)+1
+        if sys.byteorder == 'big':
+            index.byteswap()
+        self.mm[self.index:self.index+8*self.index_capacity] = index.tobytes()
+        self.write_header()
+    #
+    # end method: build
+
+    # method: seed_group_key
+    #
+    def seed_group_key(self) -> int:
+        '''This method generates every leaf key, stores every blind key and returns the group key (simulation only).'''
+
+        # depth-first, so only the private keys along one path are held at a time
+        #
+        scratch = DataNode()
+
+        # function: seed
+        #
+        def seed(slot: int) -> int:
+            '''This helper function calculates the private key of a node and stores its blind key.'''
+
+            if self.get_type(slot) == 'mem':
+                scratch.gen_private_key()
+                key = scratch.key
+            else:
+                lkey = seed(2*slot+1)
+                seed(2*slot+2)
+                key = DataNode.exp(self.get_blind_key(2*slot+2), lkey)
+            if slot != 0:
+                scratch.key = key
+                scratch.gen_blind_key()
+                start = self.bkeys+self.key_size*slot
+                self.mm[start:start+self.key_size] = scratch.b_key.to_bytes(self.key_size, 'big')
+            return key
+        #
+        # end function: seed
+
+        return seed(0)
+    #
+    # end method: seed_group_key
+
+    # method: find_member
+    #
+    def find_member(self, mid: int) -> Optional[int]:
+        '''This method returns the position of a member's leaf.'''
+
+        if not 0 < mid < self.index_capacity:
+            return None
+        start = self.index+8*mid
+        slot = int.from_bytes(self.mm[start:start+8], 'little')
+        return slot-1 if slot else None
+    #
+    # end method: find_member
+
+    # method: find_insertion
+    #
+    def find_insertion(self) -> int:
+        '''This method returns the position of the rightmost leaf on the shallowest level.'''
+
+        for l in range(self.levels):
+            start = self.types+MappedKeyStore.slot(l, 0)
+            pos = self.mm.rfind(bytes([3]), start, start+2**l)
+            if pos >= 0:
+                return pos-self.types
+        raise ValueError("The key store holds no members")
+    #
+    # end method: find_insertion
+
+    # method: members
+    #
+    def members(self) -> Iterator[int]:
+        '''This method yields the member IDs of all leaves.'''
+
+        pos = self.mm.find(bytes([3]), self.types, self.mids)
+        while pos >= 0:
+            yield self.get_mid(pos-self.types)
+            pos = self.mm.find(bytes([3]), pos+1, self.mids)
+    #
+    # end method: members
+
+    # method: load_path
+    #
+    def load_path(self, mid: int) -> tuple[DataNode, DataNode]:
+        '''This method materializes a member's key path and co-path and returns the root and the member's node.'''
+
+        slot = self.find_member(mid)
+        if slot is None:
+            raise ValueError(f"Member {mid} is not in the key store")
+
+        # walk down from the root, creating the path node and its sibling at every level
+        #
+        path = []
+        while slot > 0:
+            path.append(slot)
+            slot = (slot-1)//2
+        root = DataNode()
+        node = root
+        for slot in reversed(path):
+            first = slot-1 if slot % 2 == 0 else slot
+            node.lchild = self.load_node(first, 'left', node)
+            node.rchild = self.load_node(first+1, 'right', node)
+            node = node.lchild if slot == first else node.rchild
+        return root, node
+    #
+    # end method: load_path
+
+    # method: load_node
+    #
+    def load_node(self, slot: int, pos: str, parent: DataNode) -> DataNode:
+        '''This method materializes the node at a position as a child of a given node.'''
+
+        node = DataNode(pos=pos, parent=parent, ntype=self.get_type(slot), mid=self.get_mid(slot))
+        node.b_key = self.get_blind_key(slot)
+        return node
+    #
+    # end method: load_node
+
+    # method: publish
+    #
+    def publish(self, bkeys: dict[str, int]) -> None:
+        '''This method stores blind keys by node name.'''
+
+        for name, b_key in bkeys.items():
+            l, v = (int(index) for index in name.strip('<>').split(','))
+            start = self.bkeys+self.key_size*MappedKeyStore.slot(l, v)
+            self.mm[start:start+self.key_size] = int(b_key).to_bytes(self.key_size, 'big')
+    #
+    # end method: publish
+
+    # method: move_subtree
+    #
+    def move_subtree(self, src: int, dst: int) -> None:
+        '''This method moves the subtree at one position to another (higher) position.'''
+
+        # a subtree occupies one contiguous range per level, so it moves level by level; every level is read
+        # before the next one overwrites it. The destination ranges are cleared below the moved subtree (also
+        # when the source runs past the last level), since they still hold the records of the old subtree
+        #
+        width = 1
+        while dst < self.capacity:
+            empty = src >= self.capacity or not self.mm[self.types+src:self.types+src+width].strip(b'\x00')
+            for base, size in ((self.types, 1), (self.mids, 8), (self.bkeys, self.key_size)):
+                if empty:
+                    self.mm[base+size*dst:base+size*(dst+width)] = bytes(size*width)
+                else:
+                    self.mm.move(base+size*dst, base+size*src, size*width)
+            if empty:
+                break
+
+            # the moved members are found at their new positions
+            #
+            mids = array('Q', self.mm[self.mids+8*dst:self.mids+8*(dst+width)])
+            if sys.byteorder == 'big':
+                mids.byteswap()
+            for i, mid in enumerate(mids):
+                if mid and self.mm[self.types+dst+i] == NODE_TYPES['mem']:
+                    self.set_index(mid, dst+i)
+            src = 2*src+1
+            dst = 2*dst+1
+            width = 2*width
+    #
+    # end method: move_subtree
+
+    # method: compare
+    #
+    def compare(self, tree: BinaryTree) -> list[int]:
+        '''This method returns the positions where the store differs from an in-memory tree (type or member ID).'''
+
+        expected = {}
+        for node in tree.walk_pre_order(tree.root):
+            ntype = 'mem' if node.is_leaf else ('root' if node.parent is None else 'inter')
+            expected[MappedKeyStore.slot(node.l, node.v)] = (ntype, node.mid if node.is_leaf else None)
+        stored = {slot: (self.get_type(slot), self.get_mid(slot)) for slot in range(self.capacity)
+            if self.get_type(slot) is not None}
+        differ = {slot for slot in expected.keys() | stored.keys() if expected.get(slot) != stored.get(slot)}
+
+        # the member index must point at every leaf
+        #
+        differ.update(slot for slot, (ntype, mid) in expected.items() if ntype == 'mem' and self.find_member(mid) != slot)
+        return sorted(differ)
+    #
+    # end method: compare
+
+    # method: join
+    #
+    def join(self) -> tuple[int, int]:
+        '''This method inserts a new member and returns the IDs of the new member and the sponsor.'''
+
+        # the insertion leaf becomes an intermediate node; the sponsor moves down to its left
+        #
+        slot = self.find_insertion()
+        sponsor = self.get_mid(slot)
+        self.set_node(2*slot+1, 'mem', sponsor, self.get_blind_key(slot))
+        self.set_node(2*slot+2, 'mem', self.nextmemb)
+        self.set_node(slot, 'root' if slot == 0 else 'inter')
+
+        mid = self.nextmemb
+        self.nextmemb = self.nextmemb+1
+        self.epoch = self.epoch+1
+        self.write_header()
+        return mid, sponsor
+    #
+    # end method: join
+
+    # method: leave
+    #
+    def leave(self, eid: int) -> int:
+        '''This method removes a member and returns the ID of the sponsor.'''
+
+        slot = self.find_member(eid)
+        if slot is None:
+            raise ValueError(f"Member {eid} is not in the key store")
+        parent = (slot-1)//2
+        sibling = slot+1 if slot % 2 else slot-1
+        if parent == 0 and self.get_type(1) == 'mem' and self.get_type(2) == 'mem':
+            raise ValueError("The group would be left with a single member")
+
+        # the sibling subtree takes the place of the parent
+        #
+        self.move_subtree(sibling, parent)
+        self.set_index(eid, None)
+        if parent == 0:
+            self.set_node(0, 'root')
+
+        # the sponsor is the rightmost leaf of the sibling subtree
+        #
+        slot = parent
+        while self.get_type(slot) != 'mem':
+            slot = 2*slot+2
+        self.epoch = self.epoch+1
+        self.write_header()
+        return self.get_mid(slot)
+    #
+    # end method: leave
+
+    # method: write_header
+    #
+    def write_header(self) -> None:
+        '''This method writes the header fields.'''
+
+        MappedKeyStore.HEADER.pack_into(self.mm, 0, MappedKeyStore.MAGIC, self.key_size, self.levels,
+            self.size, self.nextmemb, self.epoch, self.index_capacity)
+    #
+    # end method: write_header
+
+    # method: close
+    #
+    def close(self) -> None:
+        '''This method flushes and closes the backing file.'''
+
+        self.mm.flush()
+        self.mm.close()
+        self.file.close()
+    #
+    # end method: close
+#
+# end class: MappedKeyStore
+#
+# end file: tree_storage.py